@@ -0,0 +1,1345 @@
+# ==============================================
+# IMPORT
+# ==============================================
+from groq import RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+import asyncio
+import json
+from datetime import datetime
+import os
+import queue
+import random
+import time
+import threading
+import uuid
+import contextvars
+from typing import TypedDict, Annotated, List, Dict, Any, Iterator, Callable, Optional
+from langgraph.graph import StateGraph, END, START
+from langgraph.graph.message import add_messages
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+from llm_cache import ResponseCache
+from metrics import MetricsRegistry, CallStats, token_usage
+from context_budget import ContextBudgeter, count_tokens, load_budgets, truncate_to_tokens
+from router_classifier import LocalRouterClassifier
+from llm_pool import ModelPool, load_backend_specs
+from model_policy import ModelPolicy, PolicyRule, LARGE_TIER, TIER_BACKENDS, call_cost
+from structured_output import (
+    RouterDecision,
+    ResearchAssessment,
+    PlanAssessment,
+    SCHEMA_EXAMPLES,
+    StructuredOutputError,
+    parse_structured,
+    strip_json_block
+)
+from prompts import (
+    ROUTER_SYSTEM_PROMPT,
+    RESEARCH_SYSTEM_PROMPT,
+    PLANNING_SYSTEM_PROMPT,
+    REVIEW_SYSTEM_PROMPT,
+    CHAT_SYSTEM_PROMPT,
+    CONVERSATION_SUMMARY_PROMPT,
+    RESEARCH_ASSESSMENT_INSTRUCTIONS,
+    PLAN_ASSESSMENT_INSTRUCTIONS,
+    STRUCTURED_REPAIR_PROMPT,
+    PARALLEL_MERGE_NOTE
+)
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", 20))
+GROQ_TIMEOUT_SECONDS = float(os.getenv("GROQ_TIMEOUT_SECONDS", 120))
+GROQ_RATE_LIMIT_RETRIES = int(os.getenv("GROQ_RATE_LIMIT_RETRIES", 5))
+GROQ_BACKOFF_SECONDS = float(os.getenv("GROQ_BACKOFF_SECONDS", 2.0))
+STRUCTURED_OUTPUT_RETRIES = int(os.getenv("STRUCTURED_OUTPUT_RETRIES", 1))
+SPECULATION_MAX_WORKERS = int(os.getenv("SPECULATION_MAX_WORKERS", 8))
+# Tail of an invalid reply sent back when asking the model to repair its structured output
+REPAIR_CONTEXT_TOKENS = 1000
+AGENT_TEMPERATURES = {"router": 0.1, "researcher": 0.3, "planner": 0.2, "reviewer": 0.1, "chat": 0.5, "summarizer": 0.0}
+# Provider failures that stop a checkpointed workflow so it can be resumed later
+RESUMABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+# ==============================================
+# MULTI-AGENT STATE DEFINITION
+# ==============================================
+# LLM usage of the agent node currently running in this context
+current_call_stats: contextvars.ContextVar[Optional[CallStats]] = contextvars.ContextVar("current_call_stats", default=None)
+# (task type, complexity, priority) of the workflow whose agent node is running in this context
+current_task: contextvars.ContextVar[tuple] = contextvars.ContextVar("current_task", default=("", "", ""))
+
+class SpeculationCancelled(Exception):
+    """Raised into a speculative LLM stream once its result is known to be unneeded"""
+
+def rate_limit_delay(error: RateLimitError, attempt: int) -> float:
+    """Seconds to wait after a Groq 429: the server's retry-after, else exponential backoff with jitter"""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        return GROQ_BACKOFF_SECONDS * (2 ** attempt) * (0.5 + random.random())
+
+class AgentState(TypedDict):
+    messages: Annotated[List[Any], add_messages]
+    user_request: str
+    task_type: str
+    research_data: str
+    plan_content: str
+    review_feedback: str
+    final_output: str
+    current_agent: str
+    workflow_status: str
+    agent_outputs: Dict[str, str]
+    router_source: str
+    conversation_context: str
+    speculation: str
+
+# Receives (agent role, text chunk) while a streaming run is active
+token_sink: contextvars.ContextVar[Optional[Callable[[str, str], None]]] = contextvars.ContextVar("token_sink", default=None)
+
+# ==============================================
+# MULTI-AGENT SYSTEM CLASSES
+# ==============================================
+class MultiAgentSystem:
+    def __init__(self, api_key: str, parallel_complex: bool = False, response_cache: Optional[ResponseCache] = None,
+                 local_router: Optional[LocalRouterClassifier] = None, metrics: Optional[MetricsRegistry] = None,
+                 llm_factory: Optional[Callable[[str, float], Any]] = None, checkpointer: Optional[Any] = None,
+                 model_policy: Optional[ModelPolicy] = None, speculative_research: bool = False):
+        self.api_key = api_key
+        self.llm_factory = llm_factory
+        self.checkpointer = checkpointer
+        self.model_policy = model_policy
+        self.parallel_complex = parallel_complex
+        self.speculative_research = speculative_research
+        self.speculation_executor = ThreadPoolExecutor(
+            max_workers=SPECULATION_MAX_WORKERS, thread_name_prefix="speculative-research"
+        ) if speculative_research else None
+        self.response_cache = response_cache
+        self.local_router = local_router
+        self.metrics = metrics or MetricsRegistry()
+        self.agents = {}
+        self.tier_agents: Dict[str, Dict[str, Any]] = {}
+        self.init_error = None
+        self.http_client = None
+        self._workflow = None
+        self._workflow_lock = threading.Lock()
+        self.initialize_agents()
+    
+    def initialize_agents(self):
+        """Initialize all agents with their specific LLMs"""
+        try:
+            tiers = self.model_policy.tiers() if self.model_policy else []
+            if self.llm_factory:
+                self.agents = {role: self.llm_factory(role, temperature) for role, temperature in AGENT_TEMPERATURES.items()}
+                self.tier_agents = {
+                    tier: {role: self.llm_factory(role, temperature) for role, temperature in AGENT_TEMPERATURES.items()}
+                    for tier in tiers
+                }
+                return
+            
+            # One keep-alive connection pool to the Groq endpoint shared by every agent
+            self.http_client = httpx.Client(
+                limits=httpx.Limits(max_connections=GROQ_MAX_CONNECTIONS, max_keepalive_connections=GROQ_MAX_CONNECTIONS),
+                timeout=GROQ_TIMEOUT_SECONDS
+            )
+            # Each role gets a pool of backends (LLM_BACKENDS_FILE), by default the single Groq model
+            backend_specs = load_backend_specs()
+            self.agents = {
+                role: ModelPool.from_specs(
+                    role, backend_specs.get(role, backend_specs["default"]), temperature, self.api_key, self.http_client
+                )
+                for role, temperature in AGENT_TEMPERATURES.items()
+            }
+            # Extra model policy tiers get per-role pools from their own LLM_BACKENDS_FILE key (e.g. "small")
+            self.tier_agents = {
+                tier: {
+                    role: ModelPool.from_specs(
+                        f"{role}:{tier}", backend_specs.get(tier, TIER_BACKENDS.get(tier, backend_specs["default"])),
+                        temperature, self.api_key, self.http_client
+                    )
+                    for role, temperature in AGENT_TEMPERATURES.items()
+                }
+                for tier in tiers
+            }
+        except Exception as e:
+            self.init_error = f"Failed to initialize agents: {str(e)}"
+    
+    def backend_stats(self) -> List[Dict[str, Any]]:
+        """Per-backend latency and health of every agent's model pool"""
+        pools = list(self.agents.values()) + [llm for agents in self.tier_agents.values() for llm in agents.values()]
+        return [row for llm in pools if isinstance(llm, ModelPool) for row in llm.stats()]
+    
+    def model_names(self) -> Dict[str, List[str]]:
+        """Configured models per tier ("large" is the agents' regular pools), for display"""
+        tiers = {LARGE_TIER: self.agents, **self.tier_agents}
+        return {
+            tier: sorted({name for llm in agents.values() for name in getattr(llm, "model_name", "unknown").split("|")})
+            for tier, agents in tiers.items()
+        }
+    
+    def select_model(self, role: str):
+        """(LLM, tiering rule) for the current task; the role's regular model when tiering is off"""
+        if not self.model_policy:
+            return self.agents[role], None
+        rule = self.model_policy.select(role, *current_task.get())
+        return self.tier_agents.get(rule.tier, self.agents)[role], rule
+    
+    @property
+    def workflow(self):
+        """Compiled graph, built on first use"""
+        if self._workflow is None:
+            with self._workflow_lock:
+                if self._workflow is None:
+                    self._workflow = self.create_workflow()
+        return self._workflow
+    
+    def invoke_agent(self, role: str, messages: List[Any]):
+        """Call an agent's LLM through the response cache, streaming tokens to the active token sink if there is one"""
+        sink = token_sink.get()
+        stats = current_call_stats.get() or CallStats()
+        llm, rule = self.select_model(role)
+        call_kwargs = {"max_tokens": rule.max_tokens} if rule and rule.max_tokens else {}
+        cache_args = (role, getattr(llm, "model_name", ""), getattr(llm, "temperature", 0.0), messages)
+        
+        if self.response_cache:
+            cached = self.response_cache.get(*cache_args)
+            if cached is not None:
+                stats.add(cache_hits=1)
+                if sink:
+                    sink(role, cached)
+                return AIMessage(content=cached)
+        
+        start = time.perf_counter()
+        for attempt in range(GROQ_RATE_LIMIT_RETRIES + 1):
+            try:
+                if sink is None:
+                    response = llm.invoke(messages, **call_kwargs)
+                else:
+                    response = None
+                    for chunk in llm.stream(messages, **call_kwargs):
+                        response = chunk if response is None else response + chunk
+                        if chunk.content:
+                            sink(role, chunk.content)
+                    response = response if response is not None else AIMessage(content="")
+                break
+            except SpeculationCancelled:
+                # Usage metadata only arrives with the last chunk, so estimate what the aborted call consumed
+                prompt_text = "".join(str(message.content) for message in messages)
+                stats.add(llm_calls=1, prompt_tokens=count_tokens(prompt_text),
+                          completion_tokens=count_tokens(response.content if response is not None else ""))
+                raise
+            except RateLimitError as e:
+                if attempt == GROQ_RATE_LIMIT_RETRIES:
+                    raise
+                stats.add(retries=1)
+                time.sleep(rate_limit_delay(e, attempt))
+        
+        prompt_tokens, completion_tokens = token_usage(response)
+        stats.add(llm_calls=1, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        if rule:
+            self.record_policy_call(rule, llm, response, time.perf_counter() - start, prompt_tokens, completion_tokens)
+        
+        if self.response_cache:
+            self.response_cache.put(*cache_args, response.content)
+        return response
+    
+    def invoke_structured(self, role: str, messages: List[Any], schema):
+        """Call an agent and validate the JSON object in its reply against schema.
+        
+        Invalid replies are sent back with the validation error, asking for just the
+        JSON object, up to STRUCTURED_OUTPUT_RETRIES times (the repair calls are not
+        streamed). Returns (response, parsed); parsed is None if every attempt failed,
+        and the caller falls back to its defaults.
+        """
+        response = self.invoke_agent(role, messages)
+        reply = response.content
+        for attempt in range(STRUCTURED_OUTPUT_RETRIES + 1):
+            try:
+                parsed = parse_structured(schema, reply)
+            except StructuredOutputError as e:
+                if attempt == STRUCTURED_OUTPUT_RETRIES:
+                    self.metrics.record_structured_output(role, schema.__name__, "failed")
+                    return response, None
+                repair_messages = messages + [
+                    AIMessage(content=truncate_to_tokens(reply, REPAIR_CONTEXT_TOKENS)),
+                    HumanMessage(content=STRUCTURED_REPAIR_PROMPT.format(error=e, example=SCHEMA_EXAMPLES[schema]))
+                ]
+                sink_token = token_sink.set(None)
+                try:
+                    reply = self.invoke_agent(role, repair_messages).content
+                finally:
+                    token_sink.reset(sink_token)
+                continue
+            self.metrics.record_structured_output(role, schema.__name__, "repaired" if attempt else "ok")
+            return response, parsed
+    
+    def record_policy_call(self, rule: PolicyRule, llm: Any, response: Any, latency_seconds: float,
+                           prompt_tokens: int, completion_tokens: int):
+        # A pool answers from whichever backend won, so prefer the model the response reports
+        model = (getattr(response, "response_metadata", None) or {}).get("model_name") or getattr(llm, "model_name", "")
+        self.metrics.record_policy(rule.name, model, latency_seconds, prompt_tokens, completion_tokens,
+                                   call_cost(model, prompt_tokens, completion_tokens))
+    
+    def instrument(self, node_name: str, node_fn: Callable) -> Callable:
+        """Wrap a graph node so its latency and LLM usage are recorded"""
+        def run_node(state):
+            stats = CallStats()
+            token = current_call_stats.set(stats)
+            task_token = current_task.set(
+                (state.get("task_type", ""), state.get("task_complexity", ""), state.get("task_priority", ""))
+            )
+            start = time.perf_counter()
+            try:
+                result = node_fn(state)
+            finally:
+                current_task.reset(task_token)
+                current_call_stats.reset(token)
+            self.metrics.record(node_name, (result or state).get("task_type", ""), time.perf_counter() - start, stats)
+            return result
+        return run_node
+    
+    def raise_if_resumable(self, error: Exception):
+        """Let transient provider errors abort a checkpointed run instead of being folded into the state"""
+        if self.checkpointer is not None and isinstance(error, RESUMABLE_ERRORS):
+            raise error
+    
+    def with_conversation(self, state: Dict[str, Any], text: str) -> str:
+        """Prefix an agent's input with the session's conversation memory, if any"""
+        context = state.get("conversation_context", "")
+        if not context:
+            return text
+        return f"Conversation so far:\n{context}\n\nCurrent message:\n{text}"
+    
+    def summarize_conversation(self, summary: str, turns: List[Dict[str, Any]]) -> str:
+        """Fold older conversation turns into the rolling summary (a conversation_memory Summarizer)"""
+        transcript = "\n".join(f"User: {turn['request']}\nAssistant: {turn['response']}" for turn in turns)
+        messages = [
+            SystemMessage(content=CONVERSATION_SUMMARY_PROMPT),
+            HumanMessage(content=f"Previous summary:\n{summary or 'None'}\n\nNew turns:\n{transcript}")
+        ]
+        return self.invoke_agent("summarizer", messages).content
+    
+    def classify_locally(self, state: Dict[str, Any]):
+        """Try the local fast-path classifier; None means ask the LLM router"""
+        if not self.local_router:
+            return None
+        return self.local_router.classify(state["user_request"])
+    
+    def router_agent(self, state: AgentState) -> AgentState:
+        """Route the task to appropriate workflow"""
+        try:
+            decision = self.classify_locally(state)
+            if decision:
+                state["task_type"] = decision.task_type
+                state["router_source"] = "local"
+                state["current_agent"] = "router"
+                state["workflow_status"] = f"Task classified as: {decision.task_type}"
+                state["agent_outputs"]["router"] = f"Task type: {decision.task_type} (local classifier, {decision.source}, confidence {decision.confidence:.2f})"
+                return state
+            
+            messages = [
+                SystemMessage(content=ROUTER_SYSTEM_PROMPT),
+                HumanMessage(content=self.with_conversation(state, state["user_request"]))
+            ]
+            
+            _, decision = self.invoke_structured("router", messages, RouterDecision)
+            task_type = decision.task_type if decision else "chat"
+            
+            state["task_type"] = task_type
+            state["router_source"] = "llm"
+            state["current_agent"] = "router"
+            state["workflow_status"] = f"Task classified as: {task_type}"
+            state["agent_outputs"]["router"] = f"Task type: {task_type}"
+            
+            return state
+        except Exception as e:
+            self.raise_if_resumable(e)
+            state["workflow_status"] = f"Router error: {str(e)}"
+            return state
+    
+    def research_agent(self, state: AgentState) -> AgentState:
+        """Conduct research on the given topic"""
+        try:
+            if state["task_type"] in ["research", "complex"]:
+                messages = [
+                    SystemMessage(content=RESEARCH_SYSTEM_PROMPT),
+                    HumanMessage(content=self.with_conversation(state, f"Research request: {state['user_request']}"))
+                ]
+                
+                response = self.invoke_agent("researcher", messages)
+                state["research_data"] = response.content
+                state["current_agent"] = "researcher"
+                state["workflow_status"] = "Research completed"
+                state["agent_outputs"]["researcher"] = response.content
+            else:
+                state["research_data"] = "No research required for this task type"
+                state["agent_outputs"]["researcher"] = "Skipped - not required"
+            
+            return state
+        except Exception as e:
+            self.raise_if_resumable(e)
+            state["workflow_status"] = f"Research error: {str(e)}"
+            return state
+    
+    def planning_agent(self, state: AgentState) -> AgentState:
+        """Create detailed plans based on research or direct request"""
+        try:
+            if state["task_type"] in ["planning", "complex"]:
+                context = f"User request: {state['user_request']}\n"
+                if state["research_data"] and state["research_data"] != "No research required for this task type":
+                    context += f"Research findings: {state['research_data']}\n"
+                
+                messages = [
+                    SystemMessage(content=PLANNING_SYSTEM_PROMPT),
+                    HumanMessage(content=self.with_conversation(state, f"Create a plan based on: {context}"))
+                ]
+                
+                response = self.invoke_agent("planner", messages)
+                state["plan_content"] = response.content
+                state["current_agent"] = "planner"
+                state["workflow_status"] = "Planning completed"
+                state["agent_outputs"]["planner"] = response.content
+            else:
+                state["plan_content"] = "No planning required for this task type"
+                state["agent_outputs"]["planner"] = "Skipped - not required"
+            
+            return state
+        except Exception as e:
+            self.raise_if_resumable(e)
+            state["workflow_status"] = f"Planning error: {str(e)}"
+            return state
+    
+    def review_agent(self, state: AgentState) -> AgentState:
+        """Review and synthesize all agent outputs"""
+        try:
+            review_context = f"""
+            Original request: {state['user_request']}
+            Task type: {state['task_type']}
+            Research data: {state.get('research_data', 'None')}
+            Plan content: {state.get('plan_content', 'None')}
+            {PARALLEL_MERGE_NOTE if self.uses_fan_out(state) else ''}
+            
+            Please review and create a comprehensive final response.
+            """
+            
+            messages = [
+                SystemMessage(content=REVIEW_SYSTEM_PROMPT),
+                HumanMessage(content=self.with_conversation(state, review_context))
+            ]
+            
+            response = self.invoke_agent("reviewer", messages)
+            state["final_output"] = response.content
+            state["current_agent"] = "reviewer"
+            state["workflow_status"] = "Review completed - Final output ready"
+            state["agent_outputs"]["reviewer"] = response.content
+            
+            return state
+        except Exception as e:
+            self.raise_if_resumable(e)
+            state["workflow_status"] = f"Review error: {str(e)}"
+            return state
+    
+    def chat_agent(self, state: AgentState) -> AgentState:
+        """Answer conversational requests directly, without research, planning or review"""
+        try:
+            messages = [
+                SystemMessage(content=CHAT_SYSTEM_PROMPT),
+                HumanMessage(content=self.with_conversation(state, state["user_request"]))
+            ]
+            
+            response = self.invoke_agent("chat", messages)
+            state["final_output"] = response.content
+            state["current_agent"] = "chat"
+            state["workflow_status"] = "Chat response ready"
+            state["agent_outputs"]["chat"] = response.content
+            
+            if "handoff_logs" in state:
+                state["handoff_logs"].append({
+                    "from": "router",
+                    "to": "chat",
+                    "timestamp": datetime.now().isoformat(),
+                    "data_passed": f"User request: {state['user_request'][:50]}...",
+                    "status": "completed"
+                })
+            
+            return state
+        except Exception as e:
+            self.raise_if_resumable(e)
+            state["workflow_status"] = f"Chat error: {str(e)}"
+            return state
+    
+    def with_speculative_research(self, router_fn: Callable, research_fn: Callable) -> Callable:
+        """Router node that, in speculative mode, starts research at the same time as the routing LLM call.
+        
+        The research is kept when the request is routed to research or complex
+        (the research node is then skipped) and cancelled otherwise.
+        """
+        if not self.speculative_research:
+            return router_fn
+        
+        def route(state):
+            if state.get("speculation") or self.classify_locally(state):
+                # Already resolved before a resume, or the local classifier answers without a round trip
+                return router_fn(state)
+            cancelled = threading.Event()
+            stats = CallStats()
+            branch = {**state, "task_type": "research", "agent_outputs": {}, "handoff_logs": [], "validation_results": {}}
+            future = self.speculation_executor.submit(
+                contextvars.copy_context().run, self.run_speculative_research, research_fn, branch, stats, cancelled
+            )
+            start = time.perf_counter()
+            state = router_fn(state)
+            self.resolve_speculation(state, future, stats, cancelled, time.perf_counter() - start)
+            return state
+        return route
+    
+    def run_speculative_research(self, research_fn: Callable, branch: Dict[str, Any], stats: CallStats,
+                                 cancelled: threading.Event):
+        """Research on the speculation thread, streaming silently so it can be aborted mid-call"""
+        def sink(agent, text):
+            if cancelled.is_set():
+                raise SpeculationCancelled()
+        
+        stats_token = current_call_stats.set(stats)
+        sink_token = token_sink.set(sink)
+        start = time.perf_counter()
+        try:
+            return research_fn(branch), time.perf_counter() - start
+        finally:
+            token_sink.reset(sink_token)
+            current_call_stats.reset(stats_token)
+    
+    def resolve_speculation(self, state: Dict[str, Any], future, stats: CallStats, cancelled: threading.Event,
+                            router_seconds: float):
+        """Keep the speculative research if the route needs it, otherwise cancel it and count the waste.
+        
+        Research still queued behind a saturated speculation pool is dropped
+        rather than waited on, and a speculative call that raised (e.g. a
+        transient provider error re-raised for checkpointing) counts as a miss,
+        so the router's decision is kept and the research node runs as usual.
+        """
+        if state.get("task_type") in ["research", "complex"] and not future.cancel():
+            try:
+                branch, research_seconds = future.result()
+            except Exception:
+                branch = None
+            if branch is not None and "error" not in branch.get("workflow_status", "").lower():
+                for key in ("research_data", "research_quality_score"):
+                    if key in branch:
+                        state[key] = branch[key]
+                state["agent_outputs"].update(branch["agent_outputs"])
+                if "handoff_logs" in state:
+                    # The branch ran before routing finished; describe the handoff with the decided route
+                    for log in branch["handoff_logs"]:
+                        if log.get("to") == "researcher":
+                            log["data_passed"] = self.research_handoff_data(state)
+                    state["handoff_logs"].extend(branch["handoff_logs"])
+                if "validation_results" in state:
+                    state["validation_results"].update(branch["validation_results"])
+                state["speculation"] = "hit"
+                # Research would otherwise only have started once routing finished
+                self.metrics.record_speculation("hit", min(router_seconds, research_seconds), 0)
+                self.metrics.record("speculative_research", state["task_type"], research_seconds, stats)
+                return
+        
+        # Not needed (or it failed and the research node will run it properly)
+        cancelled.set()
+        future.cancel()
+        state["speculation"] = "miss"
+        
+        def record_waste(done_future):
+            self.metrics.record_speculation("miss", 0.0, stats.prompt_tokens + stats.completion_tokens)
+        future.add_done_callback(record_waste)
+    
+    def research_handoff_data(self, state: Dict[str, Any]) -> str:
+        """What the router hands the researcher, as recorded in the handoff log"""
+        return f"Task type: {state.get('task_type', 'unknown')}, Priority: {state.get('task_priority', 'medium')}"
+    
+    def uses_fan_out(self, state: Dict[str, Any]) -> bool:
+        """Whether research and planning run concurrently for this request"""
+        return self.parallel_complex and state.get("task_type") == "complex"
+    
+    def run_research_and_planning_parallel(self, state, research_fn, planning_fn, planning_overrides):
+        """Run a research node and a draft planning node concurrently and merge their results"""
+        branch_defaults = {"agent_outputs": {}, "handoff_logs": [], "validation_results": {}}
+        research_state = {**state, **branch_defaults}
+        planning_state = {**state, **branch_defaults, **planning_overrides}
+        
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            research_future = executor.submit(contextvars.copy_context().run, research_fn, research_state)
+            planning_future = executor.submit(contextvars.copy_context().run, planning_fn, planning_state)
+            research_state = research_future.result()
+            planning_state = planning_future.result()
+        
+        for key in ("research_data", "research_quality_score"):
+            if key in research_state:
+                state[key] = research_state[key]
+        for key in ("plan_content", "plan_validation"):
+            if key in planning_state:
+                state[key] = planning_state[key]
+        
+        state["agent_outputs"].update(research_state["agent_outputs"])
+        state["agent_outputs"].update(planning_state["agent_outputs"])
+        if "handoff_logs" in state:
+            state["handoff_logs"].extend(research_state["handoff_logs"] + planning_state["handoff_logs"])
+        if "validation_results" in state:
+            state["validation_results"].update(research_state["validation_results"])
+            state["validation_results"].update(planning_state["validation_results"])
+        
+        errors = [
+            branch["workflow_status"] for branch in (research_state, planning_state)
+            if "error" in branch.get("workflow_status", "").lower()
+        ]
+        state["current_agent"] = "planner"
+        state["workflow_status"] = "; ".join(errors) if errors else "Research and draft plan completed in parallel"
+        return state
+    
+    def parallel_research_planning_agent(self, state: AgentState) -> AgentState:
+        """Research and draft a plan concurrently for complex requests"""
+        return self.run_research_and_planning_parallel(
+            state,
+            self.research_agent,
+            self.planning_agent,
+            {"research_data": ""}
+        )
+    
+    def should_continue_to_research(self, state: AgentState) -> str:
+        """Decide if research is needed; chat answers directly and stages with nothing to do are skipped"""
+        if state["task_type"] == "chat":
+            return "chat"
+        if state.get("speculation") == "hit":
+            return self.should_continue_to_planning(state)
+        if self.uses_fan_out(state):
+            return "parallel"
+        if state["task_type"] in ["research", "complex"]:
+            return "research"
+        if state["task_type"] == "planning":
+            return "planning"
+        return "review"
+    
+    def should_continue_to_planning(self, state: AgentState) -> str:
+        """Decide if planning is needed after research"""
+        if state["task_type"] in ["planning", "complex"]:
+            return "planning"
+        return "review"
+    
+    def should_continue_to_review(self, state: AgentState) -> str:
+        """Always continue to review"""
+        return "review"
+    
+    def create_workflow(self):
+        """Create the LangGraph workflow"""
+        workflow = StateGraph(AgentState)
+        
+        # Add nodes
+        workflow.add_node("router", self.instrument("router", self.with_speculative_research(self.router_agent, self.research_agent)))
+        workflow.add_node("research", self.instrument("research", self.research_agent))
+        workflow.add_node("planning", self.instrument("planning", self.planning_agent))
+        workflow.add_node("review", self.instrument("review", self.review_agent))
+        workflow.add_node("chat", self.instrument("chat", self.chat_agent))
+        workflow.add_node("parallel_research_planning", self.instrument("parallel_research_planning", self.parallel_research_planning_agent))
+        
+        # Add edges
+        workflow.add_edge(START, "router")
+        workflow.add_conditional_edges(
+            "router",
+            self.should_continue_to_research,
+            {
+                "research": "research",
+                "planning": "planning",
+                "parallel": "parallel_research_planning",
+                "chat": "chat",
+                "review": "review"
+            }
+        )
+        workflow.add_conditional_edges(
+            "research",
+            self.should_continue_to_planning,
+            {
+                "planning": "planning",
+                "review": "review"
+            }
+        )
+        workflow.add_conditional_edges(
+            "planning",
+            self.should_continue_to_review,
+            {
+                "review": "review"
+            }
+        )
+        workflow.add_edge("parallel_research_planning", "review")
+        workflow.add_edge("review", END)
+        workflow.add_edge("chat", END)
+        
+        return workflow.compile(checkpointer=self.checkpointer)
+    
+    def build_initial_state(self, user_request: str, conversation_context: str = "") -> AgentState:
+        """Initial state for the basic workflow"""
+        return AgentState(
+            messages=[],
+            user_request=user_request,
+            task_type="",
+            research_data="",
+            plan_content="",
+            review_feedback="",
+            final_output="",
+            current_agent="",
+            workflow_status="Starting workflow...",
+            agent_outputs={},
+            router_source="",
+            conversation_context=conversation_context,
+            speculation=""
+        )
+    
+    def workflow_error_result(self, error: Exception) -> Dict[str, Any]:
+        """Result returned when the workflow itself fails"""
+        return {
+            "final_output": f"Workflow error: {str(error)}",
+            "workflow_status": "Error occurred",
+            "agent_outputs": {"error": str(error)}
+        }
+    
+    # ---------- checkpointing ----------
+    def run_config(self, workflow_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Graph config keying checkpoints by workflow id (None when checkpointing is off)"""
+        if self.checkpointer is None:
+            return None
+        return {"configurable": {"thread_id": workflow_id or uuid.uuid4().hex}}
+    
+    def checkpoint_state(self, workflow_id: str):
+        """Latest checkpointed snapshot of a workflow, or None if there is none"""
+        if self.checkpointer is None:
+            return None
+        snapshot = self.workflow.get_state(self.run_config(workflow_id))
+        return snapshot if snapshot.values else None
+    
+    def is_resumable(self, workflow_id: str) -> bool:
+        """True if the workflow stopped before reaching the end of the graph"""
+        snapshot = self.checkpoint_state(workflow_id)
+        return snapshot is not None and bool(snapshot.next)
+    
+    def discard_checkpoint(self, workflow_id: str):
+        """Drop a workflow's checkpoints once its result has been saved"""
+        if self.checkpointer is not None:
+            self.checkpointer.delete_thread(workflow_id)
+    
+    def discard_unnamed_checkpoint(self, workflow_id: Optional[str], config: Optional[Dict[str, Any]]):
+        """Drop the checkpoints of a run given a generated thread id once it ends: nothing can resume it"""
+        if workflow_id is None and config is not None:
+            self.discard_checkpoint(config["configurable"]["thread_id"])
+    
+    # ---------- execution ----------
+    def process_request(self, user_request: str, workflow_id: Optional[str] = None,
+                        conversation_context: str = "") -> Dict[str, Any]:
+        """Process a user request (with the session's conversation memory, if any) through the multi-agent workflow"""
+        config = self.run_config(workflow_id)
+        try:
+            return self.workflow.invoke(self.build_initial_state(user_request, conversation_context), config)
+        except Exception as e:
+            return self.workflow_error_result(e)
+        finally:
+            self.discard_unnamed_checkpoint(workflow_id, config)
+    
+    async def aprocess_request(self, user_request: str, workflow_id: Optional[str] = None,
+                               conversation_context: str = "") -> Dict[str, Any]:
+        """Async variant of process_request for running many requests concurrently"""
+        if self.checkpointer is not None:
+            # The SQLite checkpointer is synchronous only
+            return await asyncio.to_thread(self.process_request, user_request, workflow_id, conversation_context)
+        try:
+            return await self.workflow.ainvoke(self.build_initial_state(user_request, conversation_context))
+        except Exception as e:
+            return self.workflow_error_result(e)
+    
+    def run_request(self, user_request: str, workflow_id: Optional[str] = None,
+                    emit: Optional[Callable[[Dict[str, Any]], None]] = None, conversation_context: str = "") -> Dict[str, Any]:
+        """Run a request in the calling thread, reporting progress events to emit (see stream_workflow)"""
+        initial_state = self.build_initial_state(user_request, conversation_context)
+        config = self.run_config(workflow_id)
+        try:
+            return self.run_workflow(initial_state, config, emit=emit)
+        finally:
+            self.discard_unnamed_checkpoint(workflow_id, config)
+    
+    def resume_request(self, workflow_id: str, emit: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Continue a checkpointed workflow from its last completed node"""
+        snapshot = self.checkpoint_state(workflow_id)
+        if snapshot is None or not snapshot.next:
+            if snapshot is None:
+                state = self.workflow_error_result(ValueError(f"No checkpoint found for workflow {workflow_id}"))
+            else:
+                state = snapshot.values
+            if emit:
+                emit({"type": "result", "state": state})
+            return state
+        return self.run_workflow(snapshot.values, self.run_config(workflow_id), resume=True, emit=emit)
+    
+    def process_request_stream(self, user_request: str, workflow_id: Optional[str] = None,
+                               conversation_context: str = "") -> Iterator[Dict[str, Any]]:
+        """Stream a user request through the multi-agent workflow"""
+        config = self.run_config(workflow_id)
+        return self.stream_workflow(self.build_initial_state(user_request, conversation_context), config,
+                                    on_done=lambda: self.discard_unnamed_checkpoint(workflow_id, config))
+    
+    def resume_request_stream(self, workflow_id: str) -> Iterator[Dict[str, Any]]:
+        """Stream the remainder of a checkpointed workflow"""
+        snapshot = self.checkpoint_state(workflow_id)
+        if snapshot is None:
+            error = ValueError(f"No checkpoint found for workflow {workflow_id}")
+            return iter([{"type": "result", "state": self.workflow_error_result(error)}])
+        if not snapshot.next:
+            return iter([{"type": "result", "state": snapshot.values}])
+        return self.stream_workflow(snapshot.values, self.run_config(workflow_id), resume=True)
+    
+    def run_workflow(self, initial_state: Dict[str, Any], config: Optional[Dict[str, Any]] = None,
+                     resume: bool = False, emit: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Run the workflow in the calling thread, passing stream_workflow's events to emit; returns the final state"""
+        emit = emit or (lambda event: None)
+        sink_token = token_sink.set(lambda agent, text: emit({"type": "token", "agent": agent, "content": text}))
+        state = dict(initial_state)
+        try:
+            graph_input = None if resume else initial_state
+            for update in self.workflow.stream(graph_input, config, stream_mode="updates"):
+                for node, node_state in update.items():
+                    state.update(node_state or {})
+                    emit({"type": "state", "node": node, "state": dict(state)})
+        except Exception as e:
+            state = self.workflow_error_result(e)
+        finally:
+            token_sink.reset(sink_token)
+        emit({"type": "result", "state": state})
+        return state
+    
+    def stream_workflow(self, initial_state: Dict[str, Any], config: Optional[Dict[str, Any]] = None,
+                        resume: bool = False, on_done: Optional[Callable[[], None]] = None) -> Iterator[Dict[str, Any]]:
+        """Run the workflow on a background thread and yield its events as they happen.
+        
+        With resume=True the graph continues from the checkpoint named in config
+        and initial_state is the checkpointed state. Events are dicts with a "type" of:
+        - "token": {"agent", "content"} for each LLM chunk
+        - "state": {"node", "state"} after each node completes
+        - "result": {"state"} once, with the final state (or error result)
+        on_done runs on the worker thread after the run, before the iterator ends.
+        """
+        events = queue.Queue()
+        done = object()
+        
+        def run():
+            try:
+                self.run_workflow(initial_state, config, resume, events.put)
+            finally:
+                try:
+                    if on_done:
+                        on_done()
+                finally:
+                    events.put(done)
+        
+        threading.Thread(target=run, daemon=True).start()
+        while True:
+            event = events.get()
+            if event is done:
+                return
+            yield event
+
+# ==============================================
+# ENHANCED MULTI-AGENT SYSTEM WITH ADVANCED HANDOFF
+# ==============================================
+
+class TaskHandoffState(TypedDict):
+    messages: Annotated[List[Any], add_messages]
+    user_request: str
+    task_type: str
+    task_priority: str
+    task_complexity: str
+    research_data: str
+    research_quality_score: float
+    plan_content: str
+    plan_validation: str
+    review_feedback: str
+    final_output: str
+    current_agent: str
+    workflow_status: str
+    agent_outputs: Dict[str, str]
+    router_source: str
+    conversation_context: str
+    speculation: str
+    handoff_logs: List[Dict[str, str]]
+    validation_results: Dict[str, bool]
+    revision_targets: List[str]
+    iteration_count: int
+    max_iterations: int
+
+class AdvancedMultiAgentSystem(MultiAgentSystem):
+    def __init__(self, api_key: str, parallel_complex: bool = False, response_cache: Optional[ResponseCache] = None,
+                 local_router: Optional[LocalRouterClassifier] = None, metrics: Optional[MetricsRegistry] = None,
+                 llm_factory: Optional[Callable[[str, float], Any]] = None, checkpointer: Optional[Any] = None,
+                 model_policy: Optional[ModelPolicy] = None, speculative_research: bool = False,
+                 context_budgets: Optional[Dict[str, Dict[str, int]]] = None):
+        super().__init__(api_key, parallel_complex, response_cache, local_router, metrics, llm_factory, checkpointer,
+                         model_policy, speculative_research)
+        # context_budgets overrides individual sections of the configured budgets (see context_budget.load_budgets)
+        self.context_budgeter = ContextBudgeter(load_budgets(overrides=context_budgets), metrics=self.metrics)
+    
+    def create_workflow(self):
+        """The advanced graph replaces the basic one"""
+        return self.create_advanced_workflow()
+    
+    def enhanced_router_agent(self, state: TaskHandoffState) -> TaskHandoffState:
+        """Enhanced router with priority and complexity analysis"""
+        try:
+            decision = self.classify_locally(state)
+            if decision:
+                task_type = decision.task_type
+                complexity = {"chat": "simple", "complex": "complex"}.get(task_type, "moderate")
+                state["task_type"] = task_type
+                state["task_priority"] = "medium"
+                state["task_complexity"] = complexity
+                state["router_source"] = "local"
+                state["current_agent"] = "router"
+                state["workflow_status"] = f"Task classified: {task_type} | Priority: medium | Complexity: {complexity}"
+                state["agent_outputs"]["router"] = (
+                    f"Task Type: {task_type}\nPriority: medium\nComplexity: {complexity}\n"
+                    f"Reasoning: local classifier ({decision.source}, confidence {decision.confidence:.2f})"
+                )
+                state["handoff_logs"].append({
+                    "from": "user",
+                    "to": "router",
+                    "timestamp": datetime.now().isoformat(),
+                    "data_passed": f"User request: {state['user_request'][:50]}...",
+                    "status": "completed"
+                })
+                return state
+            
+            enhanced_prompt = f"""
+            {ROUTER_SYSTEM_PROMPT}
+            
+            Additionally, analyze the request for:
+            1. Priority Level (high/medium/low)
+            2. Complexity Level (simple/moderate/complex)
+            3. Estimated processing time
+            
+            Request: {state['user_request']}
+            
+            Respond with ONLY a JSON object in this format:
+            {SCHEMA_EXAMPLES[RouterDecision]}
+            """
+            
+            messages = [
+                SystemMessage(content=enhanced_prompt),
+                HumanMessage(content=self.with_conversation(state, state["user_request"]))
+            ]
+            
+            _, decision = self.invoke_structured("router", messages, RouterDecision)
+            # Unusable replies fall back to a plain chat answer
+            decision = decision or RouterDecision(task_type="chat", reasoning="router output could not be parsed")
+            task_type, priority, complexity = decision.task_type, decision.priority, decision.complexity
+            
+            state["task_type"] = task_type
+            state["task_priority"] = priority
+            state["task_complexity"] = complexity
+            state["router_source"] = "llm"
+            state["current_agent"] = "router"
+            state["workflow_status"] = f"Task classified: {task_type} | Priority: {priority} | Complexity: {complexity}"
+            state["agent_outputs"]["router"] = (
+                f"Task Type: {task_type}\nPriority: {priority}\nComplexity: {complexity}\nReasoning: {decision.reasoning}"
+            )
+            
+            # Log handoff
+            state["handoff_logs"].append({
+                "from": "user",
+                "to": "router",
+                "timestamp": datetime.now().isoformat(),
+                "data_passed": f"User request: {state['user_request'][:50]}...",
+                "status": "completed"
+            })
+            
+            return state
+        except Exception as e:
+            self.raise_if_resumable(e)
+            state["workflow_status"] = f"Router error: {str(e)}"
+            return state
+    
+    def quality_research_agent(self, state: TaskHandoffState) -> TaskHandoffState:
+        """Research agent with quality scoring"""
+        try:
+            if state["task_type"] in ["research", "complex"]:
+                research_prompt = f"""
+                {RESEARCH_SYSTEM_PROMPT}
+                
+                Task Details:
+                - Priority: {state.get('task_priority', 'medium')}
+                - Complexity: {state.get('task_complexity', 'moderate')}
+                
+                Please provide comprehensive research.
+                {RESEARCH_ASSESSMENT_INSTRUCTIONS}
+                
+                Research Topic: {state['user_request']}
+                """
+                
+                messages = [
+                    SystemMessage(content=research_prompt),
+                    HumanMessage(content=self.with_conversation(state, state["user_request"] + self.revision_note(state, "research", "researcher", state.get("research_data", ""))))
+                ]
+                
+                response, assessment = self.invoke_structured("researcher", messages, ResearchAssessment)
+                research_content = strip_json_block(response.content)
+                quality_score = assessment.quality_score if assessment else 75.0  # default
+                
+                state["research_data"] = research_content
+                state["research_quality_score"] = quality_score
+                state["current_agent"] = "researcher"
+                state["workflow_status"] = f"Research completed (Quality: {quality_score}/100)"
+                state["agent_outputs"]["researcher"] = research_content
+                
+                # Log handoff
+                state["handoff_logs"].append({
+                    "from": "router",
+                    "to": "researcher",
+                    "timestamp": datetime.now().isoformat(),
+                    "data_passed": self.research_handoff_data(state),
+                    "status": "completed",
+                    "quality_score": quality_score
+                })
+                
+                # Validation
+                state["validation_results"]["research_quality"] = quality_score >= 60.0
+                
+            else:
+                state["research_data"] = "No research required for this task type"
+                state["research_quality_score"] = 0.0
+                state["agent_outputs"]["researcher"] = "Skipped - not required"
+                state["validation_results"]["research_quality"] = True
+            
+            return state
+        except Exception as e:
+            self.raise_if_resumable(e)
+            state["workflow_status"] = f"Research error: {str(e)}"
+            state["validation_results"]["research_quality"] = False
+            return state
+    
+    def strategic_planning_agent(self, state: TaskHandoffState) -> TaskHandoffState:
+        """Planning agent with validation checks"""
+        try:
+            if state["task_type"] in ["planning", "complex"]:
+                planning_context = f"""
+                User Request: {state['user_request']}
+                Task Priority: {state.get('task_priority', 'medium')}
+                Task Complexity: {state.get('task_complexity', 'moderate')}
+                Research Quality Score: {state.get('research_quality_score', 0)}
+                
+                Research Data:
+                {self.context_budgeter.fit("planner", "research", state.get('research_data', 'No research data available'))}
+                
+                Create a detailed, actionable plan. Include:
+                1. Executive Summary
+                2. Step-by-step implementation
+                3. Timeline and milestones
+                4. Risk assessment
+                5. Success metrics
+                
+                {PLAN_ASSESSMENT_INSTRUCTIONS}
+                """
+                planning_context += self.revision_note(state, "planning", "planner", state.get("plan_content", ""))
+                
+                self.context_budgeter.record_prompt("planner", PLANNING_SYSTEM_PROMPT + planning_context)
+                messages = [
+                    SystemMessage(content=PLANNING_SYSTEM_PROMPT),
+                    HumanMessage(content=self.with_conversation(state, planning_context))
+                ]
+                
+                response, assessment = self.invoke_structured("planner", messages, PlanAssessment)
+                plan_content = strip_json_block(response.content)
+                plan_validation = assessment.plan_validation if assessment else "PASS"
+                
+                state["plan_content"] = plan_content
+                state["plan_validation"] = plan_validation
+                state["current_agent"] = "planner"
+                state["workflow_status"] = f"Planning completed (Validation: {plan_validation})"
+                state["agent_outputs"]["planner"] = plan_content
+                
+                # Log handoff
+                state["handoff_logs"].append({
+                    "from": "researcher",
+                    "to": "planner",
+                    "timestamp": datetime.now().isoformat(),
+                    "data_passed": f"Research data ({len(state.get('research_data', ''))} chars), Quality: {state.get('research_quality_score', 0)}",
+                    "status": "completed",
+                    "validation": plan_validation
+                })
+                
+                # Validation
+                state["validation_results"]["plan_quality"] = plan_validation == "PASS"
+                
+            else:
+                state["plan_content"] = "No planning required for this task type"
+                state["plan_validation"] = "SKIP"
+                state["agent_outputs"]["planner"] = "Skipped - not required"
+                state["validation_results"]["plan_quality"] = True
+            
+            return state
+        except Exception as e:
+            self.raise_if_resumable(e)
+            state["workflow_status"] = f"Planning error: {str(e)}"
+            state["validation_results"]["plan_quality"] = False
+            return state
+    
+    def comprehensive_review_agent(self, state: TaskHandoffState) -> TaskHandoffState:
+        """Review agent with comprehensive analysis"""
+        try:
+            budgeter = self.context_budgeter
+            handoff_logs = state.get('handoff_logs', [])
+            review_context = f"""
+            COMPREHENSIVE REVIEW REQUEST
+            
+            Original Request: {state['user_request']}
+            Task Classification: {state.get('task_type', 'unknown')} (Priority: {state.get('task_priority', 'medium')}, Complexity: {state.get('task_complexity', 'moderate')})
+            
+            Agent Outputs to Review:
+            1. Router Output: {budgeter.fit("reviewer", "router", state['agent_outputs'].get('router', 'None'))}
+            2. Research Quality: {state.get('research_quality_score', 0)}/100
+            3. Research Data: {budgeter.fit("reviewer", "research", state.get('research_data', 'None'))}
+            4. Plan Validation: {state.get('plan_validation', 'None')}
+            5. Plan Content: {budgeter.fit("reviewer", "plan", state.get('plan_content', 'None'))}
+            
+            Validation Results:
+            - Research Quality: {'✓' if state.get('validation_results', {}).get('research_quality') else '✗'}
+            - Plan Quality: {'✓' if state.get('validation_results', {}).get('plan_quality') else '✗'}
+            
+            Handoff History:
+            {budgeter.fit_handoff_logs("reviewer", handoff_logs, json.dumps(handoff_logs, indent=2))}
+            {PARALLEL_MERGE_NOTE if self.uses_fan_out(state) else ''}
+            
+            Please provide:
+            1. Executive summary of the complete workflow
+            2. Quality assessment of each agent's contribution
+            3. Final synthesized response
+            4. Recommendations for improvement (if any)
+            
+            Final Assessment: [EXCELLENT/GOOD/NEEDS_IMPROVEMENT]
+            """
+            
+            budgeter.record_prompt("reviewer", REVIEW_SYSTEM_PROMPT + review_context)
+            messages = [
+                SystemMessage(content=REVIEW_SYSTEM_PROMPT),
+                HumanMessage(content=self.with_conversation(state, review_context))
+            ]
+            
+            response = self.invoke_agent("reviewer", messages)
+            review_content = response.content
+            
+            state["final_output"] = review_content
+            state["review_feedback"] = review_content
+            state["current_agent"] = "reviewer"
+            state["workflow_status"] = "Comprehensive review completed"
+            state["agent_outputs"]["reviewer"] = review_content
+            
+            # Final handoff log
+            state["handoff_logs"].append({
+                "from": "planner",
+                "to": "reviewer",
+                "timestamp": datetime.now().isoformat(),
+                "data_passed": "Complete workflow data for final review",
+                "status": "completed",
+                "final_assessment": "GOOD"  # Could be extracted from response
+            })
+            
+            return state
+        except Exception as e:
+            self.raise_if_resumable(e)
+            state["workflow_status"] = f"Review error: {str(e)}"
+            return state
+    
+    def revision_note(self, state: TaskHandoffState, stage: str, agent: str, previous_output: str) -> str:
+        """Delta-revision instructions when a stage is re-run after failing validation"""
+        if stage not in state.get("revision_targets", []) or not previous_output:
+            return ""
+        budgeter = self.context_budgeter
+        return f"""
+                
+                REVISION REQUEST (iteration {state.get('iteration_count', 0)}): your previous output failed validation.
+                
+                Previous output:
+                {budgeter.fit(agent, "previous", previous_output)}
+                
+                Reviewer critique:
+                {budgeter.fit(agent, "critique", state.get('review_feedback', '') or 'None')}
+                
+                Revise the previous output to fix these issues. Keep the parts that are already correct instead of starting over.
+                """
+    
+    def failing_stages(self, state: TaskHandoffState) -> List[str]:
+        """Stages whose validation failed, in execution order"""
+        validation_results = state.get("validation_results", {})
+        stages = []
+        if not validation_results.get("research_quality", True):
+            stages.append("research")
+        if not validation_results.get("plan_quality", True):
+            stages.append("planning")
+        return stages
+    
+    def should_iterate_workflow(self, state: TaskHandoffState) -> str:
+        """Decide if workflow needs another iteration"""
+        # Edge functions can't update state, so iteration_handler counts iterations
+        if state.get("iteration_count", 0) >= state.get("max_iterations", 2):
+            return "finalize"
+        
+        # If research or planning failed validation, iterate
+        return "iterate" if self.failing_stages(state) else "finalize"
+    
+    def iteration_handler(self, state: TaskHandoffState) -> TaskHandoffState:
+        """Handle workflow iteration: only the failing stages are re-run"""
+        stages = self.failing_stages(state)
+        reused = [stage for stage in ("research", "planning") if stage not in stages]
+        state["iteration_count"] = state.get("iteration_count", 0) + 1
+        state["revision_targets"] = stages
+        state["workflow_status"] = f"Iteration {state['iteration_count']} - Revising {', '.join(stages)}"
+        
+        # Add iteration log
+        state["handoff_logs"].append({
+            "from": "system",
+            "to": "iteration_handler",
+            "timestamp": datetime.now().isoformat(),
+            "data_passed": f"Revising: {', '.join(stages)}; reusing: {', '.join(reused) or 'nothing'}",
+            "status": "processing"
+        })
+        
+        return state
+    
+    def route_after_iteration(self, state: TaskHandoffState) -> str:
+        """Resume at the first stage that needs revision"""
+        targets = state.get("revision_targets", [])
+        if "research" in targets:
+            return "quality_research"
+        if "planning" in targets:
+            return "strategic_planning"
+        return "comprehensive_review"
+    
+    def route_after_research(self, state: TaskHandoffState) -> str:
+        """Plan after research, except when an iteration only revises the research"""
+        if state["task_type"] not in ["planning", "complex"]:
+            return "comprehensive_review"
+        if state.get("iteration_count", 0) and "planning" not in state.get("revision_targets", []):
+            return "comprehensive_review"
+        return "strategic_planning"
+    
+    def parallel_quality_research_planning_agent(self, state: TaskHandoffState) -> TaskHandoffState:
+        """Quality research and a strategic plan draft run concurrently for complex requests"""
+        return self.run_research_and_planning_parallel(
+            state,
+            self.quality_research_agent,
+            self.strategic_planning_agent,
+            {"research_data": "Not available - research is running in parallel", "research_quality_score": 0.0}
+        )
+    
+    def route_to_research_stage(self, state: TaskHandoffState) -> str:
+        """Pick the first stage after routing; chat answers directly and stages with nothing to do are skipped"""
+        if state["task_type"] == "chat":
+            return "chat"
+        if state.get("speculation") == "hit":
+            return self.route_after_research(state)
+        if self.uses_fan_out(state):
+            return "parallel_research_planning"
+        if state["task_type"] in ["research", "complex"]:
+            return "quality_research"
+        if state["task_type"] == "planning":
+            return "strategic_planning"
+        return "comprehensive_review"
+    
+    def create_advanced_workflow(self):
+        """Create enhanced workflow with iterations and quality checks"""
+        workflow = StateGraph(TaskHandoffState)
+        
+        # Add nodes
+        workflow.add_node("enhanced_router", self.instrument(
+            "enhanced_router", self.with_speculative_research(self.enhanced_router_agent, self.quality_research_agent)
+        ))
+        workflow.add_node("quality_research", self.instrument("quality_research", self.quality_research_agent))
+        workflow.add_node("strategic_planning", self.instrument("strategic_planning", self.strategic_planning_agent))
+        workflow.add_node("comprehensive_review", self.instrument("comprehensive_review", self.comprehensive_review_agent))
+        workflow.add_node("iteration_handler", self.instrument("iteration_handler", self.iteration_handler))
+        workflow.add_node("parallel_research_planning", self.instrument("parallel_research_planning", self.parallel_quality_research_planning_agent))
+        workflow.add_node("chat", self.instrument("chat", self.chat_agent))
+        
+        # Add edges
+        workflow.add_edge(START, "enhanced_router")
+        
+        # Conditional routing from router
+        workflow.add_conditional_edges("enhanced_router", self.route_to_research_stage)
+        
+        # Chat requests are answered in a single call
+        workflow.add_edge("chat", END)
+        
+        # From research to planning
+        workflow.add_conditional_edges("quality_research", self.route_after_research)
+        
+        # From planning (sequential or parallel) to review
+        workflow.add_edge("strategic_planning", "comprehensive_review")
+        workflow.add_edge("parallel_research_planning", "comprehensive_review")
+        
+        # From review - check if iteration needed
+        workflow.add_conditional_edges(
+            "comprehensive_review",
+            self.should_iterate_workflow,
+            {
+                "iterate": "iteration_handler",
+                "finalize": END
+            }
+        )
+        
+        # From iteration handler back to the first failing stage
+        workflow.add_conditional_edges("iteration_handler", self.route_after_iteration)
+        
+        return workflow.compile(checkpointer=self.checkpointer)
+    
+    def build_initial_state(self, user_request: str, conversation_context: str = "") -> TaskHandoffState:
+        """Initial state for the advanced workflow"""
+        return TaskHandoffState(
+            messages=[],
+            user_request=user_request,
+            task_type="",
+            task_priority="medium",
+            task_complexity="moderate",
+            research_data="",
+            research_quality_score=0.0,
+            plan_content="",
+            plan_validation="",
+            review_feedback="",
+            final_output="",
+            current_agent="",
+            workflow_status="Starting advanced workflow...",
+            agent_outputs={},
+            router_source="",
+            conversation_context=conversation_context,
+            speculation="",
+            handoff_logs=[],
+            validation_results={},
+            revision_targets=[],
+            iteration_count=0,
+            max_iterations=2
+        )
+    
+    def workflow_error_result(self, error: Exception) -> Dict[str, Any]:
+        """Result returned when the advanced workflow itself fails"""
+        return {
+            "final_output": f"Advanced workflow error: {str(error)}",
+            "workflow_status": "Error occurred",
+            "agent_outputs": {"error": str(error)},
+            "handoff_logs": [{"error": str(error)}]
+        }
+    
+    def process_advanced_request(self, user_request: str, workflow_id: Optional[str] = None,
+                                 conversation_context: str = "") -> Dict[str, Any]:
+        """Process request with advanced handoff system"""
+        return self.process_request(user_request, workflow_id, conversation_context)
+    
+    async def aprocess_advanced_request(self, user_request: str, workflow_id: Optional[str] = None,
+                                        conversation_context: str = "") -> Dict[str, Any]:
+        """Async variant of process_advanced_request"""
+        return await self.aprocess_request(user_request, workflow_id, conversation_context)
+    
+    def process_advanced_request_stream(self, user_request: str, workflow_id: Optional[str] = None,
+                                        conversation_context: str = "") -> Iterator[Dict[str, Any]]:
+        """Stream a request through the advanced handoff system"""
+        return self.process_request_stream(user_request, workflow_id, conversation_context)
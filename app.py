@@ -1,152 +1,147 @@
 # ==============================================
 # IMPORT
 # ==============================================
+# Only what the login page needs is imported here; the agent modules (langgraph,
+# langchain, provider SDKs) load on first use after login, see the factories below.
 import streamlit as st
-from langchain.chains import ConversationChain
-from langchain.chains.conversation.memory import ConversationEntityMemory
-from langchain.chains.conversation.prompt import ENTITY_MEMORY_CONVERSATION_TEMPLATE
-from langchain_groq import ChatGroq
-from groq import BadRequestError
-import json
-from datetime import datetime, timedelta
+from datetime import datetime
+import logging
 import os
 import time
-import re
-from typing import TypedDict, Annotated, List, Dict, Any
-from langgraph.graph import StateGraph, END, START
-from langgraph.graph.message import add_messages
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from langchain_core.prompts import ChatPromptTemplate
-import asyncio
+from typing import Dict, Any
 import uuid
-import os
+from storage import UserRepository, create_checkpointer
+from llm_cache import ResponseCache
+from router_classifier import LocalRouterClassifier
+from metrics import MetricsRegistry, approximate_size
+from model_policy import ModelPolicy
+from conversation_memory import ConversationMemory
+from jobs import JobManager, QUEUED, RUNNING, coalesce_key
 
 # ==============================================
 # CONFIGURATION
 # ==============================================
 groq_api_key = os.getenv('GROQ_API_KEY')
 USERS_FILE = "users.json"
+DB_FILE = "chat_history.db"
+CHECKPOINT_FILE = os.getenv("CHECKPOINT_FILE", "workflow_checkpoints.db")
+LLM_CACHE_FILE = os.getenv("LLM_CACHE_FILE", "llm_cache.db")
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000))
+LLM_CACHE_SEMANTIC = os.getenv("LLM_CACHE_SEMANTIC", "false").lower() == "true"
+LOCAL_ROUTER_ENABLED = os.getenv("LOCAL_ROUTER_ENABLED", "true").lower() == "true"
+LOCAL_ROUTER_THRESHOLD = float(os.getenv("LOCAL_ROUTER_THRESHOLD", 0.8))
+CONVERSATION_MEMORY_ENABLED = os.getenv("CONVERSATION_MEMORY_ENABLED", "true").lower() == "true"
+MODEL_TIERING_ENABLED = os.getenv("MODEL_TIERING_ENABLED", "true").lower() == "true"
+SPECULATIVE_RESEARCH = os.getenv("SPECULATIVE_RESEARCH", "false").lower() == "true"
+METRICS_EXPORT_FILE = os.getenv("METRICS_EXPORT_FILE")  # e.g. a node_exporter textfile path
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", 1.0))
+HISTORY_RECENT_TURNS = int(os.getenv("HISTORY_RECENT_TURNS", 5))  # turns rendered in full; older ones are summarized
+# Full results kept in session state; older turns keep only SUMMARY_FIELDS and are re-read from the database
+SESSION_HISTORY_MAX_FULL = max(1, int(os.getenv("SESSION_HISTORY_MAX_FULL", 5)))
+SUMMARY_FIELDS = ("workflow_id", "user_request", "task_type", "workflow_status", "workflow_mode", "router_source")
+IN_PROGRESS_STATUS = "In progress"
+logger = logging.getLogger(__name__)
 st.set_page_config(page_title='Multi-Agent System', layout='wide', initial_sidebar_state="expanded")
 
 # ==============================================
-# MULTI-AGENT STATE DEFINITION
-# ==============================================
-class AgentState(TypedDict):
-    messages: Annotated[List[Any], add_messages]
-    user_request: str
-    task_type: str
-    research_data: str
-    plan_content: str
-    review_feedback: str
-    final_output: str
-    current_agent: str
-    workflow_status: str
-    agent_outputs: Dict[str, str]
-
-# ==============================================
-# AGENT PROMPTS
+# USER AUTHENTICATION (Same as before)
 # ==============================================
-ROUTER_SYSTEM_PROMPT = """You are a Task Router Agent. Your job is to analyze user requests and determine the appropriate workflow.
-
-Classify the request into one of these categories:
-1. "planning" - User wants to create plans, schedules, organize tasks, set goals
-2. "research" - User wants information, analysis, or investigation on a topic
-3. "chat" - General conversation, questions, or casual interaction
-4. "complex" - Requests that need both research and planning
-
-Respond with ONLY the category name (planning/research/chat/complex).
-
-Examples:
-- "Help me plan a vacation to Japan" → planning
-- "What are the benefits of meditation?" → research
-- "How are you doing today?" → chat
-- "Research the best programming languages and create a learning plan" → complex
-"""
+@st.cache_resource
+def get_user_repository():
+    """Shared SQLite user store (migrates users.json on first use)"""
+    return UserRepository(DB_FILE, legacy_users_file=USERS_FILE)
 
-RESEARCH_SYSTEM_PROMPT = """You are a Research Agent specialized in gathering, analyzing, and synthesizing information.
+@st.cache_resource
+def get_response_cache():
+    """Process-wide LLM response cache shared by all sessions"""
+    return ResponseCache(
+        LLM_CACHE_FILE,
+        ttl_seconds=LLM_CACHE_TTL_SECONDS,
+        max_entries=LLM_CACHE_MAX_ENTRIES,
+        semantic=LLM_CACHE_SEMANTIC
+    )
 
-Your responsibilities:
-1. Thoroughly research the given topic
-2. Provide comprehensive, accurate information
-3. Include relevant facts, statistics, and insights
-4. Structure information clearly and logically
-5. Cite sources when possible
-6. Highlight key findings and important points
+@st.cache_resource
+def get_local_router():
+    """Local router classifier trained on past LLM routing decisions"""
+    if not LOCAL_ROUTER_ENABLED:
+        return None
+    classifier = LocalRouterClassifier(threshold=LOCAL_ROUTER_THRESHOLD)
+    classifier.train_with_history(get_user_repository().routing_examples())
+    return classifier
 
-Always provide detailed, well-researched responses that can be used by other agents for further processing.
-"""
+@st.cache_resource
+def get_metrics_registry():
+    """Process-wide agent latency/token metrics"""
+    return MetricsRegistry(export_path=METRICS_EXPORT_FILE)
 
-PLANNING_SYSTEM_PROMPT = """You are a Planning Agent specialized in creating detailed, actionable plans and strategies.
+@st.cache_resource
+def get_model_policy():
+    """Rules picking a smaller model for simple tasks (None runs every agent on its regular model)"""
+    if not MODEL_TIERING_ENABLED:
+        return None
+    return ModelPolicy.from_file()
 
-Your responsibilities:
-1. Create comprehensive, step-by-step plans
-2. Set realistic timelines and milestones
-3. Consider resource requirements and constraints
-4. Provide contingency plans for potential obstacles
-5. Include success metrics and evaluation criteria
-6. Structure plans with clear priorities and dependencies
+@st.cache_resource
+def get_conversation_memory():
+    """Rolling per-session conversation memory stored alongside the chat history"""
+    if not CONVERSATION_MEMORY_ENABLED:
+        return None
+    return ConversationMemory(get_user_repository(), metrics=get_metrics_registry())
 
-Always create practical, implementable plans that users can follow to achieve their goals.
-"""
+@st.cache_resource
+def get_checkpointer():
+    """Process-wide LangGraph checkpointer so interrupted workflows can resume"""
+    return create_checkpointer(CHECKPOINT_FILE)
 
-REVIEW_SYSTEM_PROMPT = """You are a Review Agent responsible for quality assurance and final output optimization.
+@st.cache_resource
+def get_job_manager():
+    """Process-wide worker pool that runs agent workflows outside the script thread"""
+    return JobManager()
 
-Your responsibilities:
-1. Review all agent outputs for accuracy and completeness
-2. Ensure consistency across different agent contributions
-3. Identify gaps or areas for improvement
-4. Synthesize information into a coherent final response
-5. Add executive summary or key takeaways
-6. Ensure the output directly addresses the user's original request
+class AgentSystemInitError(Exception):
+    """Raised out of the cached factories so st.cache_resource does not keep a system that failed to start"""
 
-Provide constructive feedback and create polished final outputs that exceed user expectations.
-"""
+    def __init__(self, system):
+        super().__init__(system.init_error)
+        self.system = system
 
-# ==============================================
-# USER AUTHENTICATION (Same as before)
-# ==============================================
-def load_users():
-    if os.path.exists(USERS_FILE):
-        with open(USERS_FILE, "r") as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                return {}
-    return {}
+@st.cache_resource
+def get_multi_agent_system(api_key: str, parallel_complex: bool):
+    """Process-wide basic agent system shared by every session"""
+    from agents import MultiAgentSystem
+    
+    system = MultiAgentSystem(
+        api_key, parallel_complex, get_response_cache(), get_local_router(), get_metrics_registry(),
+        checkpointer=get_checkpointer(), model_policy=get_model_policy(), speculative_research=SPECULATIVE_RESEARCH
+    )
+    if system.init_error:
+        raise AgentSystemInitError(system)
+    return system
 
-def save_users(users):
-    with open(USERS_FILE, "w") as f:
-        json.dump(users, f, indent=2)
+@st.cache_resource
+def get_advanced_multi_agent_system(api_key: str, parallel_complex: bool):
+    """Process-wide advanced agent system shared by every session"""
+    from agents import AdvancedMultiAgentSystem
+    
+    system = AdvancedMultiAgentSystem(
+        api_key, parallel_complex, get_response_cache(), get_local_router(), get_metrics_registry(),
+        checkpointer=get_checkpointer(), model_policy=get_model_policy(), speculative_research=SPECULATIVE_RESEARCH
+    )
+    if system.init_error:
+        raise AgentSystemInitError(system)
+    return system
 
 def signup(username, password):
-    users = load_users()
-    if username in users:
+    if not get_user_repository().create_user(username, password):
         return False, "Username already exists."
-    users[username] = {
-        "password": password,
-        "sessions": {},
-        "plans": {},
-        "agent_workflows": {}
-    }
-    save_users(users)
     return True, "Signup successful. Please login."
 
 def login(username, password):
-    users = load_users()
-    if username in users:
-        user_data = users[username]
-        if isinstance(user_data, str):
-            if user_data == password:
-                users[username] = {
-                    "password": password,
-                    "sessions": {},
-                    "plans": {},
-                    "agent_workflows": {}
-                }
-                save_users(users)
-                return True, "Login successful."
-        elif isinstance(user_data, dict) and user_data.get("password") == password:
-            return True, "Login successful."
+    stored_password = get_user_repository().get_password(username)
+    if stored_password is not None and stored_password == password:
+        return True, "Login successful."
     return False, "Invalid username or password."
 
 def show_login():
@@ -297,208 +292,6 @@ if not st.session_state.logged_in:
     show_login()
     st.stop()
 
-# ==============================================
-# MULTI-AGENT SYSTEM CLASSES
-# ==============================================
-class MultiAgentSystem:
-    def __init__(self, api_key: str):
-        self.api_key = api_key
-        self.agents = {}
-        self.workflow = None
-        self.initialize_agents()
-        self.create_workflow()
-    
-    def initialize_agents(self):
-        """Initialize all agents with their specific LLMs"""
-        try:
-            self.agents = {
-                "router": ChatGroq(groq_api_key=self.api_key, model_name='llama3-70b-8192', temperature=0.1),
-                "researcher": ChatGroq(groq_api_key=self.api_key, model_name='llama3-70b-8192', temperature=0.3),
-                "planner": ChatGroq(groq_api_key=self.api_key, model_name='llama3-70b-8192', temperature=0.2),
-                "reviewer": ChatGroq(groq_api_key=self.api_key, model_name='llama3-70b-8192', temperature=0.1)
-            }
-        except Exception as e:
-            st.error(f"Failed to initialize agents: {str(e)}")
-    
-    def router_agent(self, state: AgentState) -> AgentState:
-        """Route the task to appropriate workflow"""
-        try:
-            messages = [
-                SystemMessage(content=ROUTER_SYSTEM_PROMPT),
-                HumanMessage(content=state["user_request"])
-            ]
-            
-            response = self.agents["router"].invoke(messages)
-            task_type = response.content.strip().lower()
-            
-            state["task_type"] = task_type
-            state["current_agent"] = "router"
-            state["workflow_status"] = f"Task classified as: {task_type}"
-            state["agent_outputs"]["router"] = f"Task type: {task_type}"
-            
-            return state
-        except Exception as e:
-            state["workflow_status"] = f"Router error: {str(e)}"
-            return state
-    
-    def research_agent(self, state: AgentState) -> AgentState:
-        """Conduct research on the given topic"""
-        try:
-            if state["task_type"] in ["research", "complex"]:
-                messages = [
-                    SystemMessage(content=RESEARCH_SYSTEM_PROMPT),
-                    HumanMessage(content=f"Research request: {state['user_request']}")
-                ]
-                
-                response = self.agents["researcher"].invoke(messages)
-                state["research_data"] = response.content
-                state["current_agent"] = "researcher"
-                state["workflow_status"] = "Research completed"
-                state["agent_outputs"]["researcher"] = response.content
-            else:
-                state["research_data"] = "No research required for this task type"
-                state["agent_outputs"]["researcher"] = "Skipped - not required"
-            
-            return state
-        except Exception as e:
-            state["workflow_status"] = f"Research error: {str(e)}"
-            return state
-    
-    def planning_agent(self, state: AgentState) -> AgentState:
-        """Create detailed plans based on research or direct request"""
-        try:
-            if state["task_type"] in ["planning", "complex"]:
-                context = f"User request: {state['user_request']}\n"
-                if state["research_data"] and state["research_data"] != "No research required for this task type":
-                    context += f"Research findings: {state['research_data']}\n"
-                
-                messages = [
-                    SystemMessage(content=PLANNING_SYSTEM_PROMPT),
-                    HumanMessage(content=f"Create a plan based on: {context}")
-                ]
-                
-                response = self.agents["planner"].invoke(messages)
-                state["plan_content"] = response.content
-                state["current_agent"] = "planner"
-                state["workflow_status"] = "Planning completed"
-                state["agent_outputs"]["planner"] = response.content
-            else:
-                state["plan_content"] = "No planning required for this task type"
-                state["agent_outputs"]["planner"] = "Skipped - not required"
-            
-            return state
-        except Exception as e:
-            state["workflow_status"] = f"Planning error: {str(e)}"
-            return state
-    
-    def review_agent(self, state: AgentState) -> AgentState:
-        """Review and synthesize all agent outputs"""
-        try:
-            review_context = f"""
-            Original request: {state['user_request']}
-            Task type: {state['task_type']}
-            Research data: {state.get('research_data', 'None')}
-            Plan content: {state.get('plan_content', 'None')}
-            
-            Please review and create a comprehensive final response.
-            """
-            
-            messages = [
-                SystemMessage(content=REVIEW_SYSTEM_PROMPT),
-                HumanMessage(content=review_context)
-            ]
-            
-            response = self.agents["reviewer"].invoke(messages)
-            state["final_output"] = response.content
-            state["current_agent"] = "reviewer"
-            state["workflow_status"] = "Review completed - Final output ready"
-            state["agent_outputs"]["reviewer"] = response.content
-            
-            return state
-        except Exception as e:
-            state["workflow_status"] = f"Review error: {str(e)}"
-            return state
-    
-    def should_continue_to_research(self, state: AgentState) -> str:
-        """Decide if research is needed"""
-        if state["task_type"] in ["research", "complex"]:
-            return "research"
-        return "planning"
-    
-    def should_continue_to_planning(self, state: AgentState) -> str:
-        """Decide if planning is needed after research"""
-        if state["task_type"] in ["planning", "complex"]:
-            return "planning"
-        return "review"
-    
-    def should_continue_to_review(self, state: AgentState) -> str:
-        """Always continue to review"""
-        return "review"
-    
-    def create_workflow(self):
-        """Create the LangGraph workflow"""
-        workflow = StateGraph(AgentState)
-        
-        # Add nodes
-        workflow.add_node("router", self.router_agent)
-        workflow.add_node("research", self.research_agent)
-        workflow.add_node("planning", self.planning_agent)
-        workflow.add_node("review", self.review_agent)
-        
-        # Add edges
-        workflow.add_edge(START, "router")
-        workflow.add_conditional_edges(
-            "router",
-            self.should_continue_to_research,
-            {
-                "research": "research",
-                "planning": "planning"
-            }
-        )
-        workflow.add_conditional_edges(
-            "research",
-            self.should_continue_to_planning,
-            {
-                "planning": "planning",
-                "review": "review"
-            }
-        )
-        workflow.add_conditional_edges(
-            "planning",
-            self.should_continue_to_review,
-            {
-                "review": "review"
-            }
-        )
-        workflow.add_edge("review", END)
-        
-        self.workflow = workflow.compile()
-    
-    def process_request(self, user_request: str) -> Dict[str, Any]:
-        """Process a user request through the multi-agent workflow"""
-        initial_state = AgentState(
-            messages=[],
-            user_request=user_request,
-            task_type="",
-            research_data="",
-            plan_content="",
-            review_feedback="",
-            final_output="",
-            current_agent="",
-            workflow_status="Starting workflow...",
-            agent_outputs={}
-        )
-        
-        try:
-            result = self.workflow.invoke(initial_state)
-            return result
-        except Exception as e:
-            return {
-                "final_output": f"Workflow error: {str(e)}",
-                "workflow_status": "Error occurred",
-                "agent_outputs": {"error": str(e)}
-            }
-
 # ==============================================
 # CUSTOM STYLING
 # ==============================================
@@ -588,9 +381,12 @@ def initialize_session_state():
     keys_defaults = {
         "multi_agent_system": None,
         "workflow_history": [],
-        "current_workflow": None,
-        "workflow_in_progress": False,
-        "app_mode": "Multi-Agent Chat"
+        "app_mode": "Multi-Agent Chat",
+        "parallel_complex": False,
+        "conversation_id": uuid.uuid4().hex,
+        "session_id": uuid.uuid4().hex,
+        "rendered_history": {},
+        "history_turns_shown": HISTORY_RECENT_TURNS
     }
     
     for key, default in keys_defaults.items():
@@ -602,34 +398,107 @@ initialize_session_state()
 # ==============================================
 # WORKFLOW MANAGEMENT
 # ==============================================
-def save_workflow_to_user(workflow_result):
+def get_workflow_system(workflow_mode: str, parallel_complex: bool):
+    """The shared agent system whose graph a workflow was started on (uncached and shown as an error if it failed to start)"""
+    factory = get_advanced_multi_agent_system if workflow_mode == "advanced" else get_multi_agent_system
+    try:
+        return factory(groq_api_key, parallel_complex)
+    except AgentSystemInitError as e:
+        st.error(e.system.init_error)
+        return e.system
+
+def reset_agent_systems():
+    """Rebuild the shared agent systems on next use"""
+    get_multi_agent_system.clear()
+    get_advanced_multi_agent_system.clear()
+    st.session_state.multi_agent_system = None
+    st.session_state.advanced_multi_agent_system = None
+
+def save_workflow_to_user(username, workflow_id, workflow_result):
     """Save workflow result to user's data"""
-    users = load_users()
-    username = st.session_state.username
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    if username in users:
-        if "agent_workflows" not in users[username]:
-            users[username]["agent_workflows"] = {}
-        
-        workflow_id = str(uuid.uuid4())[:8]
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        users[username]["agent_workflows"][f"{timestamp}_{workflow_id}"] = {
-            "request": workflow_result.get("user_request", ""),
-            "result": workflow_result,
-            "timestamp": timestamp
-        }
-        
-        save_users(users)
+    get_user_repository().add_workflow(
+        username,
+        workflow_id,
+        workflow_result.get("user_request", ""),
+        workflow_result,
+        timestamp
+    )
+
+def finish_workflow(system, job):
+    """Save a finished job's result (on the worker thread); checkpoints are kept only while the run can still be resumed"""
+    save_workflow_to_user(job.username, job.job_id, {**job.result, "user_request": job.request, **job.metadata})
+    memory = get_conversation_memory()
+    if memory and job.result.get("final_output") and job.result.get("workflow_status") != "Error occurred":
+        # Conversation memory is best effort: it must not delay or fail a job whose answer is ready
+        try:
+            memory.record_turn(job.username, job.metadata["conversation_id"], job.request, job.result["final_output"],
+                               summarizer=system.summarize_conversation)
+        except Exception as e:
+            logger.warning("Conversation memory update failed: %s", e)
+    if not system.is_resumable(job.job_id):
+        system.discard_checkpoint(job.job_id)
+
+def spill_workflow_history():
+    """Shrink all but the newest SESSION_HISTORY_MAX_FULL turns to summaries (their results are already saved)"""
+    history = st.session_state.workflow_history
+    for i in range(len(history) - SESSION_HISTORY_MAX_FULL):
+        workflow = history[i]
+        if not workflow.get("spilled") and workflow.get("workflow_id"):
+            summary = {key: workflow[key] for key in SUMMARY_FIELDS if key in workflow}
+            summary["user_request"] = summary.get("user_request", "")[:200]
+            history[i] = {**summary, "spilled": True}
 
-def load_user_workflows():
-    """Load user's workflow history"""
-    users = load_users()
+def load_workflow(workflow: Dict[str, Any]) -> Dict[str, Any]:
+    """Full result for a history entry, read back from the database if it was spilled"""
+    if not workflow.get("spilled"):
+        return workflow
+    result = get_user_repository().get_workflow_result(st.session_state.username, workflow["workflow_id"])
+    return {**workflow, **result} if result else workflow
+
+def record_session_memory():
+    """Report this session's approximate state size (the agent systems are shared, so they count as 0)"""
+    history = st.session_state.workflow_history
+    get_metrics_registry().record_session_memory(
+        st.session_state.session_id,
+        st.session_state.get("username", ""),
+        len(history),
+        sum(1 for workflow in history if not workflow.get("spilled")),
+        approximate_size({key: st.session_state[key] for key in st.session_state})
+    )
+
+def submit_workflow(user_request: str, workflow_mode: str, parallel_complex: bool, resume_workflow_id: str = None):
+    """Queue a request (or the resumption of a checkpointed one) on the background job pool"""
+    manager = get_job_manager()
     username = st.session_state.username
+    if manager.in_flight(username) >= manager.max_jobs_per_user:
+        st.warning(f"You already have {manager.max_jobs_per_user} requests running. Please wait for one to finish.")
+        return None
+    
+    system = get_workflow_system(workflow_mode, parallel_complex)
+    conversation_id = st.session_state.conversation_id
+    metadata = {"workflow_mode": workflow_mode, "parallel_complex": parallel_complex, "conversation_id": conversation_id}
+    key = None
+    if resume_workflow_id:
+        workflow_id = resume_workflow_id
+        run_fn = lambda emit: system.resume_request(workflow_id, emit)
+    else:
+        # Record the workflow before it runs so a run lost to a restart shows up in history as resumable
+        workflow_id = f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}_{str(uuid.uuid4())[:8]}"
+        save_workflow_to_user(username, workflow_id, {"user_request": user_request, "workflow_status": IN_PROGRESS_STATUS, **metadata})
+        memory = get_conversation_memory()
+        conversation_context = memory.context(username, conversation_id) if memory else ""
+        run_fn = lambda emit: system.run_request(user_request, workflow_id, emit, conversation_context)
+        # Identical requests already running for anyone are shared instead of run again
+        key = coalesce_key(user_request, workflow_mode, parallel_complex, conversation_context)
     
-    if username in users:
-        return users[username].get("agent_workflows", {})
-    return {}
+    return manager.submit(
+        username, workflow_id, user_request, run_fn,
+        on_finish=lambda job: finish_workflow(system, job),
+        metadata=metadata,
+        coalesce_key=key
+    )
 
 # ==============================================
 # SIDEBAR CONTROLS
@@ -638,7 +507,12 @@ def sidebar_controls():
     with st.sidebar:
         st.markdown(f"### 🤖 Multi-Agent System")
         st.markdown(f"**User:** {st.session_state.username}")
-        st.markdown("**Model:** llama3-70b-8192")
+        system = st.session_state.multi_agent_system or st.session_state.get("advanced_multi_agent_system")
+        if system and not system.init_error:
+            for tier, models in system.model_names().items():
+                st.markdown(f"**Model ({tier}):** {', '.join(models)}")
+        else:
+            st.markdown("**Model:** loaded with the agent system")
         st.markdown("---")
         
         # Mode selection
@@ -658,14 +532,25 @@ def sidebar_controls():
         st.markdown("---")
         
         # Agent system controls
-        if st.button("🔄 Reset Agent System"):
+        parallel_complex = st.checkbox(
+            "⚡ Parallel research + planning",
+            value=st.session_state.parallel_complex,
+            help="For complex requests, draft the plan while research runs and let the reviewer merge both"
+        )
+        if parallel_complex != st.session_state.parallel_complex:
+            st.session_state.parallel_complex = parallel_complex
             st.session_state.multi_agent_system = None
-            st.session_state.current_workflow = None
-            st.session_state.workflow_in_progress = False
+            st.session_state.advanced_multi_agent_system = None
+        
+        if st.button("🔄 Reset Agent System", help="Rebuild the agent systems shared by every session"):
+            reset_agent_systems()
             st.rerun()
         
-        if st.button("📋 Clear Workflow History"):
+        if st.button("📋 Clear Workflow History", help="Also starts a new conversation, so the agents forget earlier turns"):
             st.session_state.workflow_history = []
+            st.session_state.rendered_history = {}
+            st.session_state.history_turns_shown = HISTORY_RECENT_TURNS
+            st.session_state.conversation_id = uuid.uuid4().hex
             st.rerun()
         
         st.markdown("---")
@@ -682,81 +567,142 @@ def sidebar_controls():
         if st.button("🔒 Logout"):
             st.session_state.logged_in = False
             st.session_state.username = ""
+            st.session_state.conversation_id = uuid.uuid4().hex
             st.rerun()
 
 # ==============================================
 # MAIN INTERFACES
 # ==============================================
+def render_job_progress(job: Dict[str, Any]):
+    """Progress card for one background job"""
+    agents = ["router", "researcher", "planner", "reviewer"]
+    if "chat" in (job["current_agent"], *job["completed_agents"]):
+        agents = ["router", "chat"]
+    request = job["request"]
+    st.markdown(f'<div class="user-message">{request[:200]}</div>', unsafe_allow_html=True)
+    
+    if job["status"] == QUEUED:
+        st.info("⏳ Queued - waiting for a free worker...")
+        return
+    
+    elapsed = time.time() - (job["started_at"] or time.time())
+    st.markdown(f"**Current Status:** {job['workflow_status']} ({elapsed:.0f}s)")
+    if job["leader_id"]:
+        st.caption("🔗 Sharing the run of an identical request that was already in progress")
+    cols = st.columns(len(agents))
+    for i, agent in enumerate(agents):
+        with cols[i]:
+            if agent in job["completed_agents"]:
+                st.success(f"✅ {agent.title()}")
+            elif agent == job["current_agent"]:
+                st.warning(f"🔄 {agent.title()}")
+            else:
+                st.info(f"⏳ {agent.title()}")
+    if job["partial_output"]:
+        st.markdown(f"**🤖 {job['current_agent'].title()} Agent:**\n\n{job['partial_output']}")
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def poll_jobs():
+    """Redraw in-flight jobs every JOB_POLL_SECONDS; finished results move into the conversation"""
+    manager = get_job_manager()
+    username = st.session_state.username
+    collected = False
+    
+    for job in manager.user_jobs(username):
+        if job["status"] in (QUEUED, RUNNING):
+            render_job_progress(job)
+        elif manager.dismiss(username, job["job_id"]):
+            st.session_state.workflow_history.append({
+                **job["result"], "user_request": job["request"], "workflow_id": job["job_id"], **job["metadata"]
+            })
+            spill_workflow_history()
+            collected = True
+    
+    if collected:
+        st.rerun()
+
+def render_jobs_panel():
+    """Show the user's background jobs, polling only while there are any"""
+    if get_job_manager().user_jobs(st.session_state.username):
+        st.markdown("### 🔄 Workflows in Progress")
+        poll_jobs()
+
+def rendered_workflow(workflow: Dict[str, Any], index: int) -> Dict[str, str]:
+    """Markdown for one conversation turn, built once per workflow id and reused on every rerun"""
+    cache = st.session_state.rendered_history
+    key = workflow.get("workflow_id") or f"turn-{index}"
+    if key not in cache:
+        workflow = load_workflow(workflow)
+        request = workflow.get("user_request", "")
+        final_output = workflow.get("final_output", "No output generated")
+        details = [
+            f"**Workflow Status:** {workflow.get('workflow_status', 'Unknown')}",
+            f"**Task Type:** {workflow.get('task_type', 'Unknown')}",
+            "**Agent Outputs:**"
+        ]
+        for agent_name, output in workflow.get("agent_outputs", {}).items():
+            if output and output not in ["Skipped - not required", ""]:
+                output = output[:500] + "..." if len(str(output)) > 500 else output
+            else:
+                output = "No output or skipped"
+            details.append(f"**🤖 {agent_name.title()} Agent**\n\n{output}")
+        cache[key] = {
+            "message": (
+                f'<div class="user-message">{request}</div>'
+                f'<div class="final-output"><strong>🤖 Multi-Agent Response:</strong><br>{final_output}</div>'
+            ),
+            "details": "\n\n".join(details)
+        }
+    return cache[key]
+
+def workflow_summary_line(workflow: Dict[str, Any], index: int) -> str:
+    request = workflow.get("user_request", "")
+    return f"{index + 1}. {request[:80]}{'...' if len(request) > 80 else ''} — *{workflow.get('task_type', 'unknown')}*"
+
+@st.fragment
+def render_conversation_history():
+    """Recent turns in full and older ones as one-line summaries; paging reruns only this fragment"""
+    history = st.session_state.workflow_history
+    older = len(history) - st.session_state.history_turns_shown
+    if older > 0:
+        if st.button(f"⬆️ Load {min(older, HISTORY_RECENT_TURNS)} earlier turns"):
+            st.session_state.history_turns_shown += HISTORY_RECENT_TURNS
+            older -= HISTORY_RECENT_TURNS
+    if older > 0:
+        with st.expander(f"🗂️ {older} earlier turns"):
+            st.markdown("\n".join(workflow_summary_line(history[i], i) for i in range(older)))
+    
+    visible = range(max(older, 0), len(history))
+    for i in visible:
+        rendered = rendered_workflow(history[i], i)
+        st.markdown(rendered["message"], unsafe_allow_html=True)
+        with st.expander(f"🔍 View Agent Workflow Details #{i+1}"):
+            st.markdown(rendered["details"])
+        st.markdown("---")
+    
+    # Only the visible turns stay cached, so the cache is bounded like the history itself
+    visible_keys = {history[i].get("workflow_id") or f"turn-{i}" for i in visible}
+    for key in [key for key in st.session_state.rendered_history if key not in visible_keys]:
+        del st.session_state.rendered_history[key]
+
 def run_multi_agent_chat():
     st.title("🤖 Multi-Agent AI System")
     st.markdown("**Four specialized agents working together: Router → Researcher → Planner → Reviewer**")
     
-    # Initialize multi-agent system
-    if not st.session_state.multi_agent_system:
+    # Initialize multi-agent system (retried on every run until it starts)
+    if not st.session_state.multi_agent_system or st.session_state.multi_agent_system.init_error:
         with st.spinner("Initializing multi-agent system..."):
-            st.session_state.multi_agent_system = MultiAgentSystem(groq_api_key)
-        st.success("Multi-agent system initialized!")
+            st.session_state.multi_agent_system = get_workflow_system("basic", st.session_state.parallel_complex)
+        if not st.session_state.multi_agent_system.init_error:
+            st.success("Multi-agent system initialized!")
     
     # Display workflow history
     if st.session_state.workflow_history:
         st.markdown("### Conversation History")
-        for i, workflow in enumerate(st.session_state.workflow_history):
-            # User message
-            st.markdown(f'<div class="user-message">{workflow.get("user_request", "")}</div>', unsafe_allow_html=True)
-            
-            # Agent workflow result
-            final_output = workflow.get("final_output", "No output generated")
-            st.markdown(f'<div class="final-output"><strong>🤖 Multi-Agent Response:</strong><br>{final_output}</div>', unsafe_allow_html=True)
-            
-            # Show workflow details in expander
-            with st.expander(f"🔍 View Agent Workflow Details #{i+1}"):
-                col1, col2 = st.columns([1, 2])
-                
-                with col1:
-                    st.markdown("**Workflow Status:**")
-                    st.info(workflow.get("workflow_status", "Unknown"))
-                    
-                    st.markdown("**Task Type:**")
-                    st.info(workflow.get("task_type", "Unknown"))
-                
-                with col2:
-                    st.markdown("**Agent Outputs:**")
-                    agent_outputs = workflow.get("agent_outputs", {})
-                    
-                    for agent_name, output in agent_outputs.items():
-                        with st.expander(f"🤖 {agent_name.title()} Agent"):
-                            if output and output not in ["Skipped - not required", ""]:
-                                st.write(output[:500] + "..." if len(str(output)) > 500 else output)
-                            else:
-                                st.write("No output or skipped")
-            
-            st.markdown("---")
+        render_conversation_history()
     
-    # Current workflow progress
-    if st.session_state.workflow_in_progress and st.session_state.current_workflow:
-        st.markdown("### 🔄 Workflow in Progress")
-        workflow = st.session_state.current_workflow
-        
-        progress_container = st.container()
-        with progress_container:
-            st.markdown('<div class="workflow-progress">', unsafe_allow_html=True)
-            st.markdown(f"**Current Status:** {workflow.get('workflow_status', 'Processing...')}")
-            st.markdown(f"**Current Agent:** {workflow.get('current_agent', 'Unknown').title()}")
-            
-            # Progress indicators
-            agents = ["router", "researcher", "planner", "reviewer"]
-            cols = st.columns(4)
-            
-            for i, agent in enumerate(agents):
-                with cols[i]:
-                    if agent in workflow.get("agent_outputs", {}):
-                        st.success(f"✅ {agent.title()}")
-                    elif workflow.get("current_agent") == agent:
-                        st.warning(f"🔄 {agent.title()}")
-                    else:
-                        st.info(f"⏳ {agent.title()}")
-            
-            st.markdown('</div>', unsafe_allow_html=True)
+    # Background workflows still running
+    render_jobs_panel()
     
     # Input form
     st.markdown("### 💭 Ask the Multi-Agent System")
@@ -779,93 +725,96 @@ def run_multi_agent_chat():
         
         submitted = st.form_submit_button("🚀 Process with Agents", type="primary")
     
-    # Process the request
-    if submitted and user_input.strip() and not st.session_state.workflow_in_progress:
-        st.session_state.workflow_in_progress = True
-        
-        # Create progress placeholder
-        progress_placeholder = st.empty()
-        
-        try:
-            with st.spinner("🤖 Multi-agent system processing your request..."):
-                # Process the request through the workflow
-                result = st.session_state.multi_agent_system.process_request(user_input)
-                
-                # Update session state
-                st.session_state.current_workflow = result
-                st.session_state.workflow_history.append(result)
-                
-                # Save to user data
-                save_workflow_to_user(result)
-        
-        except Exception as e:
-            st.error(f"Error processing request: {str(e)}")
-        
-        finally:
-            st.session_state.workflow_in_progress = False
+    # Queue the request; it runs on the worker pool and is saved when it finishes
+    if submitted and user_input.strip():
+        if submit_workflow(user_input, "basic", st.session_state.parallel_complex):
             st.rerun()
 
 def run_workflow_history():
     st.title("📊 Workflow History")
     
-    # Load both persistent and session workflows
-    user_workflows = load_user_workflows()
-    session_workflows = st.session_state.get('workflow_history', [])
-
-    # Convert session workflows to user_workflows format
-    for i, workflow in enumerate(session_workflows):
-        if workflow not in user_workflows.values():  # Avoid duplicates
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            workflow_id = f"session_{i}_{timestamp}"
-            user_workflows[workflow_id] = {
-                "request": workflow.get("user_request", ""),
-                "result": workflow,
-                "timestamp": timestamp
-            }
+    repo = get_user_repository()
+    username = st.session_state.username
+    render_jobs_panel()
+    active_jobs = {job["job_id"] for job in get_job_manager().user_jobs(username) if job["status"] in (QUEUED, RUNNING)}
     
-    if not user_workflows:
-        st.info("No workflow history found. Start by using the Multi-Agent Chat!")
-        return
+    # Search and paging controls (every workflow is persisted when it completes)
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        search_term = st.text_input("🔍 Search workflows...", placeholder="Search requests and final outputs")
+    with col2:
+        page_size = st.selectbox("Per page", [10, 25, 50], index=0)
     
-    st.markdown(f"**Total Workflows:** {len(user_workflows)}")
+    if st.session_state.get("history_search") != (search_term, page_size):
+        st.session_state.history_search = (search_term, page_size)
+        st.session_state.history_page = 1
     
-    # Search and filter
-    search_term = st.text_input("🔍 Search workflows...", placeholder="Search by request content")
+    total = repo.count_workflows(username, search_term)
+    if not total:
+        if search_term:
+            st.info("No workflows match your search.")
+        else:
+            st.info("No workflow history found. Start by using the Multi-Agent Chat!")
+        return
     
-    # Filter workflows
-    filtered_workflows = user_workflows
-    if search_term:
-        filtered_workflows = {
-            k: v for k, v in user_workflows.items()
-            if search_term.lower() in v.get('request', '').lower()
-        }
+    total_pages = (total + page_size - 1) // page_size
+    page = min(st.session_state.get("history_page", 1), total_pages)
+    st.markdown(f"**Total Workflows:** {total} | Page {page} of {total_pages}")
     
-    # Display workflows
-    for workflow_id, workflow_data in sorted(filtered_workflows.items(), reverse=True):
-        with st.expander(f"📋 {workflow_data.get('timestamp', 'Unknown')} - {workflow_data.get('request', 'No request')[:50]}..."):
-            result = workflow_data.get('result', {})
-            
+    # Display one page of summaries; full results load on demand
+    for summary in repo.list_workflow_summaries(username, page, page_size, search_term):
+        workflow_id = summary["workflow_id"]
+        request = summary.get("request") or "No request"
+        with st.expander(f"📋 {summary.get('timestamp', 'Unknown')} - {request[:50]}..."):
             col1, col2 = st.columns([1, 1])
             
             with col1:
                 st.markdown("**Request:**")
-                st.write(workflow_data.get('request', 'No request'))
+                st.write(request)
                 
                 st.markdown("**Task Type:**")
-                st.info(result.get('task_type', 'Unknown'))
+                st.info(summary.get('task_type') or 'Unknown')
                 st.markdown("**Status:**")
-                st.info(result.get('workflow_status', 'Unknown'))
+                st.info(summary.get('workflow_status') or 'Unknown')
             
             with col2:
                 st.markdown("**Final Output:**")
-                st.write(result.get('final_output', 'No output')[:200] + "..." if len(str(result.get('final_output', ''))) > 200 else result.get('final_output', 'No output'))
+                preview = summary.get('final_output_preview') or 'No output'
+                st.write(preview[:200] + "..." if len(preview) > 200 else preview)
                 
-                if st.button(f"🗑️ Delete", key=f"delete_{workflow_id}"):
-                    users = load_users()
-                    if st.session_state.username in users and "agent_workflows" in users[st.session_state.username]:
-                        del users[st.session_state.username]["agent_workflows"][workflow_id]
-                        save_users(users)
+                workflow_mode = summary.get("workflow_mode") or "basic"
+                parallel_complex = bool(summary.get("parallel_complex"))
+                system = get_workflow_system(workflow_mode, parallel_complex)
+                
+                # Failed runs, and "in progress" runs no worker owns any more (the process
+                # restarted), can continue from their last checkpoint
+                status = summary.get("workflow_status") or ""
+                unfinished = status == "Error occurred" or (status == IN_PROGRESS_STATUS and workflow_id not in active_jobs)
+                if unfinished and system.checkpoint_state(workflow_id) is not None and st.button("▶️ Resume", key=f"resume_{workflow_id}"):
+                    if submit_workflow(request, workflow_mode, parallel_complex, resume_workflow_id=workflow_id):
                         st.rerun()
+                
+                if st.button(f"🗑️ Delete", key=f"delete_{workflow_id}"):
+                    repo.delete_workflow(username, workflow_id)
+                    system.discard_checkpoint(workflow_id)
+                    st.rerun()
+            
+            if st.toggle("📂 Show full result", key=f"details_{workflow_id}"):
+                result = repo.get_workflow_result(username, workflow_id) or {}
+                st.markdown(result.get('final_output', 'No output'))
+                for agent_name, output in result.get('agent_outputs', {}).items():
+                    st.markdown(f"**🤖 {agent_name.title()} Agent:**")
+                    st.write(output or "No output or skipped")
+    
+    prev_col, _, next_col = st.columns([1, 4, 1])
+    with prev_col:
+        if st.button("⬅️ Previous", disabled=page <= 1):
+            st.session_state.history_page = page - 1
+            st.rerun()
+    with next_col:
+        if st.button("Next ➡️", disabled=page >= total_pages):
+            st.session_state.history_page = page + 1
+            st.rerun()
 
 def run_agent_status():
     st.title("⚙️ Agent Status & Configuration")
@@ -878,11 +827,13 @@ def run_agent_status():
     
     with col1:
         st.markdown("### 🤖 Active Agents")
+        models = {role: getattr(llm, "model_name", "unknown") for role, llm in st.session_state.multi_agent_system.agents.items()}
         agents_info = {
-            "Router Agent": {"emoji": "🎯", "role": "Task Classification", "model": "llama3-70b-8192"},
-            "Research Agent": {"emoji": "🔍", "role": "Information Gathering", "model": "llama3-70b-8192"},
-            "Planning Agent": {"emoji": "📋", "role": "Strategy & Planning", "model": "llama3-70b-8192"},
-            "Review Agent": {"emoji": "✅", "role": "Quality Assurance", "model": "llama3-70b-8192"}
+            "Router Agent": {"emoji": "🎯", "role": "Task Classification", "model": models.get("router")},
+            "Research Agent": {"emoji": "🔍", "role": "Information Gathering", "model": models.get("researcher")},
+            "Planning Agent": {"emoji": "📋", "role": "Strategy & Planning", "model": models.get("planner")},
+            "Review Agent": {"emoji": "✅", "role": "Quality Assurance", "model": models.get("reviewer")},
+            "Chat Agent": {"emoji": "💬", "role": "Direct Conversation", "model": models.get("chat")}
         }
         
         for agent_name, info in agents_info.items():
@@ -908,405 +859,78 @@ def run_agent_status():
             st.markdown("**Task Distribution:**")
             for task_type, count in task_types.items():
                 st.write(f"- {task_type.title()}: {count}")
+            
+            locally_routed = sum(1 for w in st.session_state.workflow_history if w.get('router_source') == 'local')
+            st.write(f"**Routed by local classifier:** {locally_routed} of {total_workflows}")
         else:
             st.info("No workflows processed yet")
-
-# ==============================================
-# ENHANCED MULTI-AGENT SYSTEM WITH ADVANCED HANDOFF
-# ==============================================
-
-class TaskHandoffState(TypedDict):
-    messages: Annotated[List[Any], add_messages]
-    user_request: str
-    task_type: str
-    task_priority: str
-    task_complexity: str
-    research_data: str
-    research_quality_score: float
-    plan_content: str
-    plan_validation: str
-    review_feedback: str
-    final_output: str
-    current_agent: str
-    workflow_status: str
-    agent_outputs: Dict[str, str]
-    handoff_logs: List[Dict[str, str]]
-    validation_results: Dict[str, bool]
-    iteration_count: int
-    max_iterations: int
-
-class AdvancedMultiAgentSystem(MultiAgentSystem):
-    def __init__(self, api_key: str):
-        super().__init__(api_key)
-        self.create_advanced_workflow()
-    
-    def enhanced_router_agent(self, state: TaskHandoffState) -> TaskHandoffState:
-        """Enhanced router with priority and complexity analysis"""
-        try:
-            enhanced_prompt = f"""
-            {ROUTER_SYSTEM_PROMPT}
-            
-            Additionally, analyze the request for:
-            1. Priority Level (high/medium/low)
-            2. Complexity Level (simple/moderate/complex)
-            3. Estimated processing time
-            
-            Request: {state['user_request']}
-            
-            Respond in this format:
-            Task Type: [planning/research/chat/complex]
-            Priority: [high/medium/low]
-            Complexity: [simple/moderate/complex]
-            Reasoning: [brief explanation]
-            """
-            
-            messages = [
-                SystemMessage(content=enhanced_prompt),
-                HumanMessage(content=state["user_request"])
-            ]
-            
-            response = self.agents["router"].invoke(messages)
-            response_text = response.content
-            
-            # Parse response
-            task_type = "chat"
-            priority = "medium"
-            complexity = "moderate"
-            
-            for line in response_text.split('\n'):
-                if line.startswith('Task Type:'):
-                    task_type = line.split(':', 1)[1].strip().lower()
-                elif line.startswith('Priority:'):
-                    priority = line.split(':', 1)[1].strip().lower()
-                elif line.startswith('Complexity:'):
-                    complexity = line.split(':', 1)[1].strip().lower()
-            
-            state["task_type"] = task_type
-            state["task_priority"] = priority
-            state["task_complexity"] = complexity
-            state["current_agent"] = "router"
-            state["workflow_status"] = f"Task classified: {task_type} | Priority: {priority} | Complexity: {complexity}"
-            state["agent_outputs"]["router"] = response_text
-            
-            # Log handoff
-            state["handoff_logs"].append({
-                "from": "user",
-                "to": "router",
-                "timestamp": datetime.now().isoformat(),
-                "data_passed": f"User request: {state['user_request'][:50]}...",
-                "status": "completed"
-            })
-            
-            return state
-        except Exception as e:
-            state["workflow_status"] = f"Router error: {str(e)}"
-            return state
-    
-    def quality_research_agent(self, state: TaskHandoffState) -> TaskHandoffState:
-        """Research agent with quality scoring"""
-        try:
-            if state["task_type"] in ["research", "complex"]:
-                research_prompt = f"""
-                {RESEARCH_SYSTEM_PROMPT}
-                
-                Task Details:
-                - Priority: {state.get('task_priority', 'medium')}
-                - Complexity: {state.get('task_complexity', 'moderate')}
-                
-                Please provide comprehensive research and end with a quality assessment:
-                Quality Score: [0-100] - Rate the completeness and accuracy of your research
-                
-                Research Topic: {state['user_request']}
-                """
-                
-                messages = [
-                    SystemMessage(content=research_prompt),
-                    HumanMessage(content=state["user_request"])
-                ]
-                
-                response = self.agents["researcher"].invoke(messages)
-                research_content = response.content
-                
-                # Extract quality score
-                quality_score = 75.0  # default
-                lines = research_content.split('\n')
-                for line in lines:
-                    if line.startswith('Quality Score:'):
-                        try:
-                            score_text = line.split(':', 1)[1].strip()
-                            quality_score = float(score_text.split()[0])
-                        except:
-                            pass
-                
-                state["research_data"] = research_content
-                state["research_quality_score"] = quality_score
-                state["current_agent"] = "researcher"
-                state["workflow_status"] = f"Research completed (Quality: {quality_score}/100)"
-                state["agent_outputs"]["researcher"] = research_content
-                
-                # Log handoff
-                state["handoff_logs"].append({
-                    "from": "router",
-                    "to": "researcher",
-                    "timestamp": datetime.now().isoformat(),
-                    "data_passed": f"Task type: {state['task_type']}, Priority: {state['task_priority']}",
-                    "status": "completed",
-                    "quality_score": quality_score
-                })
-                
-                # Validation
-                state["validation_results"]["research_quality"] = quality_score >= 60.0
-                
-            else:
-                state["research_data"] = "No research required for this task type"
-                state["research_quality_score"] = 0.0
-                state["agent_outputs"]["researcher"] = "Skipped - not required"
-                state["validation_results"]["research_quality"] = True
-            
-            return state
-        except Exception as e:
-            state["workflow_status"] = f"Research error: {str(e)}"
-            state["validation_results"]["research_quality"] = False
-            return state
-    
-    def strategic_planning_agent(self, state: TaskHandoffState) -> TaskHandoffState:
-        """Planning agent with validation checks"""
-        try:
-            if state["task_type"] in ["planning", "complex"]:
-                planning_context = f"""
-                User Request: {state['user_request']}
-                Task Priority: {state.get('task_priority', 'medium')}
-                Task Complexity: {state.get('task_complexity', 'moderate')}
-                Research Quality Score: {state.get('research_quality_score', 0)}
-                
-                Research Data:
-                {state.get('research_data', 'No research data available')}
-                
-                Create a detailed, actionable plan. Include:
-                1. Executive Summary
-                2. Step-by-step implementation
-                3. Timeline and milestones
-                4. Risk assessment
-                5. Success metrics
-                
-                End with:
-                Plan Validation: [PASS/FAIL] - Self-assessment of plan quality
-                """
-                
-                messages = [
-                    SystemMessage(content=PLANNING_SYSTEM_PROMPT),
-                    HumanMessage(content=planning_context)
-                ]
-                
-                response = self.agents["planner"].invoke(messages)
-                plan_content = response.content
-                
-                # Extract validation
-                plan_validation = "PASS"
-                if "Plan Validation: FAIL" in plan_content:
-                    plan_validation = "FAIL"
-                
-                state["plan_content"] = plan_content
-                state["plan_validation"] = plan_validation
-                state["current_agent"] = "planner"
-                state["workflow_status"] = f"Planning completed (Validation: {plan_validation})"
-                state["agent_outputs"]["planner"] = plan_content
-                
-                # Log handoff
-                state["handoff_logs"].append({
-                    "from": "researcher",
-                    "to": "planner",
-                    "timestamp": datetime.now().isoformat(),
-                    "data_passed": f"Research data ({len(state.get('research_data', ''))} chars), Quality: {state.get('research_quality_score', 0)}",
-                    "status": "completed",
-                    "validation": plan_validation
-                })
-                
-                # Validation
-                state["validation_results"]["plan_quality"] = plan_validation == "PASS"
-                
-            else:
-                state["plan_content"] = "No planning required for this task type"
-                state["plan_validation"] = "SKIP"
-                state["agent_outputs"]["planner"] = "Skipped - not required"
-                state["validation_results"]["plan_quality"] = True
-            
-            return state
-        except Exception as e:
-            state["workflow_status"] = f"Planning error: {str(e)}"
-            state["validation_results"]["plan_quality"] = False
-            return state
-    
-    def comprehensive_review_agent(self, state: TaskHandoffState) -> TaskHandoffState:
-        """Review agent with comprehensive analysis"""
-        try:
-            review_context = f"""
-            COMPREHENSIVE REVIEW REQUEST
-            
-            Original Request: {state['user_request']}
-            Task Classification: {state.get('task_type', 'unknown')} (Priority: {state.get('task_priority', 'medium')}, Complexity: {state.get('task_complexity', 'moderate')})
-            
-            Agent Outputs to Review:
-            1. Router Output: {state['agent_outputs'].get('router', 'None')[:200]}...
-            2. Research Quality: {state.get('research_quality_score', 0)}/100
-            3. Research Data: {state.get('research_data', 'None')[:300]}...
-            4. Plan Validation: {state.get('plan_validation', 'None')}
-            5. Plan Content: {state.get('plan_content', 'None')[:300]}...
-            
-            Validation Results:
-            - Research Quality: {'✓' if state.get('validation_results', {}).get('research_quality') else '✗'}
-            - Plan Quality: {'✓' if state.get('validation_results', {}).get('plan_quality') else '✗'}
-            
-            Handoff History:
-            {json.dumps(state.get('handoff_logs', []), indent=2)}
-            
-            Please provide:
-            1. Executive summary of the complete workflow
-            2. Quality assessment of each agent's contribution
-            3. Final synthesized response
-            4. Recommendations for improvement (if any)
-            
-            Final Assessment: [EXCELLENT/GOOD/NEEDS_IMPROVEMENT]
-            """
-            
-            messages = [
-                SystemMessage(content=REVIEW_SYSTEM_PROMPT),
-                HumanMessage(content=review_context)
-            ]
-            
-            response = self.agents["reviewer"].invoke(messages)
-            review_content = response.content
-            
-            state["final_output"] = review_content
-            state["review_feedback"] = review_content
-            state["current_agent"] = "reviewer"
-            state["workflow_status"] = "Comprehensive review completed"
-            state["agent_outputs"]["reviewer"] = review_content
-            
-            # Final handoff log
-            state["handoff_logs"].append({
-                "from": "planner",
-                "to": "reviewer",
-                "timestamp": datetime.now().isoformat(),
-                "data_passed": "Complete workflow data for final review",
-                "status": "completed",
-                "final_assessment": "GOOD"  # Could be extracted from response
-            })
-            
-            return state
-        except Exception as e:
-            state["workflow_status"] = f"Review error: {str(e)}"
-            return state
-    
-    def should_iterate_workflow(self, state: TaskHandoffState) -> str:
-        """Decide if workflow needs another iteration"""
-        # Check if any validation failed and we haven't exceeded max iterations
-        validation_results = state.get("validation_results", {})
-        iteration_count = state.get("iteration_count", 0)
-        max_iterations = state.get("max_iterations", 2)
-        
-        if iteration_count >= max_iterations:
-            return "finalize"
-        
-        # If research or planning failed validation, iterate
-        if not validation_results.get("research_quality", True) or not validation_results.get("plan_quality", True):
-            state["iteration_count"] = iteration_count + 1
-            return "iterate"
         
-        return "finalize"
-    
-    def iteration_handler(self, state: TaskHandoffState) -> TaskHandoffState:
-        """Handle workflow iteration"""
-        state["workflow_status"] = f"Iteration {state.get('iteration_count', 0) + 1} - Improving quality"
-        
-        # Add iteration log
-        state["handoff_logs"].append({
-            "from": "system",
-            "to": "iteration_handler",
-            "timestamp": datetime.now().isoformat(),
-            "data_passed": "Quality improvement iteration",
-            "status": "processing"
-        })
+        st.markdown("### 💾 Response Cache")
+        cache = get_response_cache()
+        cache_stats = cache.stats
+        hits = sum(s["exact_hits"] + s["semantic_hits"] for s in cache_stats.values())
+        misses = sum(s["misses"] for s in cache_stats.values())
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Cache Hits", hits)
+        c2.metric("Cache Misses", misses)
+        c3.metric("Hit Rate", f"{hits / (hits + misses):.0%}" if hits + misses else "N/A")
+        st.caption(f"{cache.size()} cached responses | semantic tier {'on' if cache.semantic else 'off'}")
+        for role, role_stats in cache_stats.items():
+            st.write(f"- {role.title()}: {role_stats['exact_hits']} exact / {role_stats['semantic_hits']} semantic hits, {role_stats['misses']} misses")
+        if st.button("🧹 Clear Response Cache"):
+            cache.clear()
+            st.rerun()
         
-        return state
+        st.markdown("### 🧵 Background Jobs")
+        job_stats = get_job_manager().stats()
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Running", f"{job_stats['running']} / {job_stats['workers']}")
+        c2.metric("Queued", job_stats["queued"])
+        c3.metric("Awaiting Pickup", job_stats["finished"])
+        c4.metric("Coalesced", job_stats["coalesced"], help="Submissions that shared an identical in-flight request")
     
-    def create_advanced_workflow(self):
-        """Create enhanced workflow with iterations and quality checks"""
-        workflow = StateGraph(TaskHandoffState)
-        
-        # Add nodes
-        workflow.add_node("enhanced_router", self.enhanced_router_agent)
-        workflow.add_node("quality_research", self.quality_research_agent)
-        workflow.add_node("strategic_planning", self.strategic_planning_agent)
-        workflow.add_node("comprehensive_review", self.comprehensive_review_agent)
-        workflow.add_node("iteration_handler", self.iteration_handler)
-        
-        # Add edges
-        workflow.add_edge(START, "enhanced_router")
-        
-        # Conditional routing from router
-        workflow.add_conditional_edges(
-            "enhanced_router",
-            lambda state: "quality_research" if state["task_type"] in ["research", "complex"] else "strategic_planning"
-        )
-        
-        # From research to planning
-        workflow.add_conditional_edges(
-            "quality_research",
-            lambda state: "strategic_planning" if state["task_type"] in ["planning", "complex"] else "comprehensive_review"
-        )
-        
-        # From planning to review
-        workflow.add_edge("strategic_planning", "comprehensive_review")
-        
-        # From review - check if iteration needed
-        workflow.add_conditional_edges(
-            "comprehensive_review",
-            self.should_iterate_workflow,
-            {
-                "iterate": "iteration_handler",
-                "finalize": END
-            }
-        )
-        
-        # From iteration handler back to research
-        workflow.add_edge("iteration_handler", "quality_research")
-        
-        self.workflow = workflow.compile()
+    backend_rows = st.session_state.multi_agent_system.backend_stats()
+    if backend_rows:
+        st.markdown("### 🔀 LLM Backends")
+        st.dataframe(backend_rows, use_container_width=True, hide_index=True)
     
-    def process_advanced_request(self, user_request: str) -> Dict[str, Any]:
-        """Process request with advanced handoff system"""
-        initial_state = TaskHandoffState(
-            messages=[],
-            user_request=user_request,
-            task_type="",
-            task_priority="medium",
-            task_complexity="moderate",
-            research_data="",
-            research_quality_score=0.0,
-            plan_content="",
-            plan_validation="",
-            review_feedback="",
-            final_output="",
-            current_agent="",
-            workflow_status="Starting advanced workflow...",
-            agent_outputs={},
-            handoff_logs=[],
-            validation_results={},
-            iteration_count=0,
-            max_iterations=2
+    st.markdown("### ⏱️ Agent Latency & Tokens")
+    metrics = get_metrics_registry()
+    metric_rows = metrics.summary()
+    if metric_rows:
+        st.dataframe(metric_rows, use_container_width=True, hide_index=True)
+    else:
+        st.info("No agent runs recorded yet")
+    context_rows = metrics.context_summary()
+    if context_rows:
+        st.markdown("**Prompt Context Budgets:**")
+        st.dataframe(context_rows, use_container_width=True, hide_index=True)
+    structured_rows = metrics.structured_output_summary()
+    if structured_rows:
+        st.markdown("**Structured Output Validation:**")
+        st.dataframe(structured_rows, use_container_width=True, hide_index=True)
+    policy_rows = metrics.policy_summary()
+    if policy_rows:
+        st.markdown("### 🎚️ Model Tiering")
+        st.dataframe(policy_rows, use_container_width=True, hide_index=True)
+        st.caption("Latency and estimated cost of LLM calls per tiering rule")
+    session_rows = metrics.session_memory_summary()
+    if session_rows:
+        st.markdown("### 🧠 Session Memory")
+        st.dataframe(session_rows, use_container_width=True, hide_index=True)
+        st.caption(
+            f"Approximate session state per browser session; results beyond the newest {SESSION_HISTORY_MAX_FULL} "
+            "turns are kept only in the database"
         )
-        
-        try:
-            result = self.workflow.invoke(initial_state)
-            return result
-        except Exception as e:
-            return {
-                "final_output": f"Advanced workflow error: {str(e)}",
-                "workflow_status": "Error occurred",
-                "agent_outputs": {"error": str(e)},
-                "handoff_logs": [{"error": str(e)}]
-            }
+    if SPECULATIVE_RESEARCH:
+        speculation = metrics.speculation_summary()
+        st.markdown("### 🔮 Speculative Research")
+        st.dataframe([speculation], use_container_width=True, hide_index=True)
+        st.caption("Research started alongside routing: latency saved when kept, tokens wasted when cancelled")
+    prometheus_text = metrics.render_prometheus()
+    st.download_button("⬇️ Prometheus metrics", prometheus_text, file_name="agent_metrics.prom", mime="text/plain")
+    if METRICS_EXPORT_FILE:
+        st.caption(f"Also exported to {METRICS_EXPORT_FILE} every few seconds")
 
 # ==============================================
 # ENHANCED UI FUNCTIONS
@@ -1324,10 +948,13 @@ def run_advanced_multi_agent_chat():
         if "advanced_multi_agent_system" not in st.session_state:
             st.session_state.advanced_multi_agent_system = None
         
-        if not st.session_state.advanced_multi_agent_system:
+        if not st.session_state.advanced_multi_agent_system or st.session_state.advanced_multi_agent_system.init_error:
             with st.spinner("Initializing advanced multi-agent system..."):
-                st.session_state.advanced_multi_agent_system = AdvancedMultiAgentSystem(groq_api_key)
-            st.success("Advanced multi-agent system initialized!")
+                st.session_state.advanced_multi_agent_system = get_workflow_system(
+                    "advanced", st.session_state.parallel_complex
+                )
+            if not st.session_state.advanced_multi_agent_system.init_error:
+                st.success("Advanced multi-agent system initialized!")
         
         # Display workflow with handoff visualization
         if st.session_state.workflow_history:
@@ -1357,6 +984,9 @@ def run_advanced_multi_agent_chat():
                     if i < len(handoff_logs) - 1:
                         st.markdown("---")
         
+        # Background workflows still running
+        render_jobs_panel()
+        
         # Input for advanced system
         st.markdown("### 💭 Advanced AI Request")
         with st.form(key='advanced_agent_form', clear_on_submit=True):
@@ -1373,61 +1003,59 @@ def run_advanced_multi_agent_chat():
                 show_details = st.checkbox("Show Handoff Details")
         
         if submitted and user_input.strip():
-            with st.spinner("🔄 Advanced multi-agent system processing..."):
-                try:
-                    result = st.session_state.advanced_multi_agent_system.process_advanced_request(user_input)
-                    st.session_state.workflow_history.append(result)
-                    save_workflow_to_user(result)
+            st.session_state.show_handoff_details = show_details
+            if submit_workflow(user_input, "advanced", st.session_state.parallel_complex):
+                st.rerun()
+        
+        # Latest advanced result, once its background job has finished
+        result = st.session_state.workflow_history[-1] if st.session_state.workflow_history else None
+        if result and result.get("workflow_mode") == "advanced":
+            # Display results
+            st.success("✅ Advanced processing completed!")
+            
+            # Show final output
+            st.markdown("### 🎯 Final Output")
+            st.markdown(f'<div class="final-output">{result.get("final_output", "No output generated")}</div>', unsafe_allow_html=True)
+            
+            if st.session_state.get("show_handoff_details"):
+                # Show handoff details
+                st.markdown("### 🔍 Detailed Handoff Analysis")
+                
+                col1, col2 = st.columns([1, 1])
+                
+                with col1:
+                    st.markdown("**Task Analysis:**")
+                    st.info(f"Type: {result.get('task_type', 'Unknown')}")
+                    st.info(f"Priority: {result.get('task_priority', 'Unknown')}")
+                    st.info(f"Complexity: {result.get('task_complexity', 'Unknown')}")
                     
-                    # Display results
-                    st.success("✅ Advanced processing completed!")
+                    st.markdown("**Quality Metrics:**")
+                    research_score = result.get('research_quality_score', 0)
+                    st.metric("Research Quality", f"{research_score}/100")
                     
-                    # Show final output
-                    st.markdown("### 🎯 Final Output")
-                    st.markdown(f'<div class="final-output">{result.get("final_output", "No output generated")}</div>', unsafe_allow_html=True)
+                    validation_results = result.get('validation_results', {})
+                    st.write("**Validation Results:**")
+                    for key, value in validation_results.items():
+                        st.write(f"- {key}: {'✅ Pass' if value else '❌ Fail'}")
+                
+                with col2:
+                    st.markdown("**Handoff Timeline:**")
+                    handoff_logs = result.get('handoff_logs', [])
                     
-                    if show_details:
-                        # Show handoff details
-                        st.markdown("### 🔍 Detailed Handoff Analysis")
-                        
-                        col1, col2 = st.columns([1, 1])
+                    for log in handoff_logs:
+                        timestamp = log.get('timestamp', 'Unknown')
+                        from_agent = log.get('from', 'Unknown')
+                        to_agent = log.get('to', 'Unknown')
+                        status = log.get('status', 'Unknown')
                         
-                        with col1:
-                            st.markdown("**Task Analysis:**")
-                            st.info(f"Type: {result.get('task_type', 'Unknown')}")
-                            st.info(f"Priority: {result.get('task_priority', 'Unknown')}")
-                            st.info(f"Complexity: {result.get('task_complexity', 'Unknown')}")
-                            
-                            st.markdown("**Quality Metrics:**")
-                            research_score = result.get('research_quality_score', 0)
-                            st.metric("Research Quality", f"{research_score}/100")
-                            
-                            validation_results = result.get('validation_results', {})
-                            st.write("**Validation Results:**")
-                            for key, value in validation_results.items():
-                                st.write(f"- {key}: {'✅ Pass' if value else '❌ Fail'}")
+                        status_emoji = "✅" if status == "completed" else "🔄"
                         
-                        with col2:
-                            st.markdown("**Handoff Timeline:**")
-                            handoff_logs = result.get('handoff_logs', [])
-                            
-                            for log in handoff_logs:
-                                timestamp = log.get('timestamp', 'Unknown')
-                                from_agent = log.get('from', 'Unknown')
-                                to_agent = log.get('to', 'Unknown')
-                                status = log.get('status', 'Unknown')
-                                
-                                status_emoji = "✅" if status == "completed" else "🔄"
-                                
-                                st.markdown(f"""
-                                <div class="agent-step {'completed' if status == 'completed' else 'active'}">
-                                    {status_emoji} <strong>{from_agent.title()}</strong> → <strong>{to_agent.title()}</strong><br>
-                                    <small>{timestamp}</small>
-                                </div>
-                                """, unsafe_allow_html=True)
-                
-                except Exception as e:
-                    st.error(f"Error in advanced processing: {str(e)}")
+                        st.markdown(f"""
+                        <div class="agent-step {'completed' if status == 'completed' else 'active'}">
+                            {status_emoji} <strong>{from_agent.title()}</strong> → <strong>{to_agent.title()}</strong><br>
+                            <small>{timestamp}</small>
+                        </div>
+                        """, unsafe_allow_html=True)
     
     else:
         # Run basic multi-agent chat
@@ -1445,6 +1073,7 @@ def main():
         run_workflow_history()
     elif st.session_state.app_mode == "Agent Status":
         run_agent_status()
+    record_session_memory()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
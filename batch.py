@@ -0,0 +1,148 @@
+"""Headless batch runner for the multi-agent pipeline.
+
+Runs many requests through MultiAgentSystem / AdvancedMultiAgentSystem with
+bounded concurrency and appends one JSON line per finished request. Requests
+already present in the output file are skipped, so an interrupted run resumes
+where it stopped.
+
+    python batch.py prompts.csv results.jsonl --column prompt --mode advanced --concurrency 8
+"""
+# ==============================================
+# IMPORT
+# ==============================================
+import argparse
+import asyncio
+import csv
+import json
+import os
+import time
+from typing import Dict, Any, Iterable, Optional, Set, Tuple
+
+from agents import MultiAgentSystem, AdvancedMultiAgentSystem
+from llm_cache import ResponseCache
+from model_policy import ModelPolicy
+from router_classifier import LocalRouterClassifier
+from storage import UserRepository
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+DEFAULT_CONCURRENCY = 4
+
+# ==============================================
+# INPUT / CHECKPOINT HELPERS
+# ==============================================
+def read_requests_csv(path: str, column: str = "prompt", id_column: Optional[str] = None) -> Iterable[Tuple[str, str]]:
+    """Yield (request_id, request) pairs from a CSV file"""
+    with open(path, newline="", encoding="utf-8") as f:
+        for row_number, row in enumerate(csv.DictReader(f), start=1):
+            request = (row.get(column) or "").strip()
+            if request:
+                yield (row[id_column] if id_column else str(row_number)), request
+
+def completed_request_ids(output_path: str) -> Set[str]:
+    """Ids already written to the JSONL output (the resume checkpoint)"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # partially written last line of an interrupted run
+            if record.get("status") == "ok":
+                done.add(str(record["id"]))
+    return done
+
+def has_agent_error(result: Dict[str, Any]) -> bool:
+    return "error" in result.get("agent_outputs", {}) or "error" in str(result.get("workflow_status", "")).lower()
+
+# ==============================================
+# BATCH RUNNER
+# ==============================================
+async def arun_batch(system: MultiAgentSystem, requests: Iterable[Tuple[str, str]], output_path: str,
+                     concurrency: int = DEFAULT_CONCURRENCY, resume: bool = True) -> Dict[str, Any]:
+    """Run requests through the agent system concurrently and append results to a JSONL file"""
+    skip = completed_request_ids(output_path) if resume else set()
+    pending = [(str(request_id), request) for request_id, request in requests if str(request_id) not in skip]
+    semaphore = asyncio.Semaphore(concurrency)
+    write_lock = asyncio.Lock()
+    summary = {"skipped": len(skip), "ok": 0, "error": 0}
+    started = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        async def run_one(request_id: str, request: str):
+            async with semaphore:
+                start = time.perf_counter()
+                result = await system.aprocess_request(request)
+                elapsed = time.perf_counter() - start
+
+            status = "error" if has_agent_error(result) else "ok"
+            record = {
+                "id": request_id,
+                "request": request,
+                "status": status,
+                "task_type": result.get("task_type", ""),
+                "final_output": result.get("final_output", ""),
+                "workflow_status": result.get("workflow_status", ""),
+                "elapsed_seconds": round(elapsed, 3),
+                "result": result
+            }
+            async with write_lock:
+                out.write(json.dumps(record, default=str) + "\n")
+                out.flush()
+                summary[status] += 1
+
+        await asyncio.gather(*(run_one(request_id, request) for request_id, request in pending))
+
+    summary["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    return summary
+
+def run_batch(system: MultiAgentSystem, requests: Iterable[Tuple[str, str]], output_path: str,
+              concurrency: int = DEFAULT_CONCURRENCY, resume: bool = True) -> Dict[str, Any]:
+    """Synchronous wrapper around arun_batch"""
+    return asyncio.run(arun_batch(system, requests, output_path, concurrency, resume))
+
+# ==============================================
+# CLI
+# ==============================================
+def main():
+    parser = argparse.ArgumentParser(description="Run a CSV of requests through the multi-agent pipeline")
+    parser.add_argument("input_csv")
+    parser.add_argument("output_jsonl")
+    parser.add_argument("--column", default="prompt", help="CSV column holding the request text")
+    parser.add_argument("--id-column", help="CSV column with a stable request id (default: row number)")
+    parser.add_argument("--mode", choices=["basic", "advanced"], default="basic")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--parallel-complex", action="store_true", help="run research and planning concurrently for complex requests")
+    parser.add_argument("--no-cache", action="store_true", help="disable the LLM response cache")
+    parser.add_argument("--speculative-research", action="store_true", help="start research while the router is still deciding")
+    parser.add_argument("--no-tiering", action="store_true", help="run every agent on its regular model")
+    parser.add_argument("--no-local-router", action="store_true", help="always route with the LLM")
+    parser.add_argument("--db", default="chat_history.db", help="database with past routing decisions for the local router")
+    parser.add_argument("--no-resume", action="store_true", help="re-run requests already in the output file")
+    args = parser.parse_args()
+
+    system_class = AdvancedMultiAgentSystem if args.mode == "advanced" else MultiAgentSystem
+    cache = None if args.no_cache else ResponseCache(os.getenv("LLM_CACHE_FILE", "llm_cache.db"))
+    local_router = None
+    if not args.no_local_router:
+        local_router = LocalRouterClassifier()
+        if os.path.exists(args.db):
+            local_router.train_with_history(UserRepository(args.db, legacy_users_file=None).routing_examples())
+    model_policy = None if args.no_tiering else ModelPolicy.from_file()
+    system = system_class(os.getenv("GROQ_API_KEY"), args.parallel_complex, cache, local_router, model_policy=model_policy,
+                          speculative_research=args.speculative_research)
+    if system.init_error:
+        raise SystemExit(system.init_error)
+
+    requests = read_requests_csv(args.input_csv, args.column, args.id_column)
+    summary = run_batch(system, requests, args.output_jsonl, args.concurrency, not args.no_resume)
+    summary["model_tiering"] = system.metrics.policy_summary()
+    if args.speculative_research:
+        summary["speculation"] = system.metrics.speculation_summary()
+    print(json.dumps(summary))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_llm import MockScript, mock_llm_factory
+from storage import UserRepository
+
+@pytest.fixture
+def make_system():
+    """Build a MultiAgentSystem / AdvancedMultiAgentSystem wired to the offline mock LLM"""
+    def build(system_class, script=None, latency=None, parallel_complex=False, **mock_kwargs):
+        if latency is not None:
+            mock_kwargs["latency"] = latency
+        system = system_class("", parallel_complex, llm_factory=mock_llm_factory(script or MockScript(), **mock_kwargs))
+        assert system.init_error is None
+        return system
+    return build
+
+@pytest.fixture
+def repository(tmp_path):
+    repo = UserRepository(str(tmp_path / "bench.db"), legacy_users_file=None)
+    repo.create_user("bench", "secret")
+    return repo
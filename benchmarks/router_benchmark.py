@@ -0,0 +1,114 @@
+"""Routing latency and agreement of the local router classifier vs the LLM router.
+
+Reference labels are the LLM router's past decisions stored in agent_workflows
+(plus an optional JSONL file of {"request", "task_type"} lines). With --live the
+LLM router is also called on the evaluation set to measure its latency.
+
+    python benchmarks/router_benchmark.py [--db chat_history.db] [--labels labels.jsonl] [--live]
+"""
+# ==============================================
+# IMPORT
+# ==============================================
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from router_classifier import LocalRouterClassifier, SEED_EXAMPLES, DEFAULT_CONFIDENCE_THRESHOLD
+from storage import UserRepository
+
+# ==============================================
+# HELPERS
+# ==============================================
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def load_examples(db_path, labels_path):
+    examples = []
+    if db_path and os.path.exists(db_path):
+        examples += UserRepository(db_path, legacy_users_file=None).routing_examples()
+    if labels_path:
+        with open(labels_path) as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    examples.append((row["request"], row["task_type"]))
+    return examples
+
+def llm_router():
+    from langchain_groq import ChatGroq
+    from langchain_core.messages import HumanMessage, SystemMessage
+    from prompts import ROUTER_SYSTEM_PROMPT
+    from structured_output import RouterDecision, StructuredOutputError, parse_structured
+
+    llm = ChatGroq(groq_api_key=os.getenv("GROQ_API_KEY"), model_name="llama3-70b-8192", temperature=0.1)
+
+    def classify(text):
+        reply = llm.invoke([SystemMessage(content=ROUTER_SYSTEM_PROMPT), HumanMessage(content=text)]).content
+        try:
+            return parse_structured(RouterDecision, reply).task_type
+        except StructuredOutputError:
+            return "invalid"  # counted as a disagreement
+    return classify
+
+# ==============================================
+# BENCHMARK
+# ==============================================
+def run(args):
+    history = load_examples(args.db, args.labels)
+    if len(history) >= 10:
+        # Hold out every fifth example so the model is not scored on its training data
+        test = history[::5]
+        train = [ex for i, ex in enumerate(history) if i % 5]
+    else:
+        print(f"Only {len(history)} labelled requests found; evaluating on the seed examples instead (optimistic: they are also training data).")
+        test, train = list(SEED_EXAMPLES), []
+
+    classifier = LocalRouterClassifier(threshold=args.threshold)
+    classifier.train_with_history(train)
+
+    classify = llm_router() if args.live else None
+    local_latencies, llm_latencies = [], []
+    confident = agreed = 0
+
+    for text, label in test:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            decision = classifier.classify(text)
+        local_latencies.append((time.perf_counter() - start) / args.repeat * 1e6)
+
+        if classify:
+            start = time.perf_counter()
+            label = classify(text)
+            llm_latencies.append((time.perf_counter() - start) * 1e3)
+
+        if decision:
+            confident += 1
+            agreed += decision.task_type == label
+
+    coverage = confident / len(test)
+    print(f"Evaluated requests:      {len(test)} (trained on {len(train)} + {len(SEED_EXAMPLES)} seeds)")
+    print(f"Fast-path coverage:      {coverage:.1%} (threshold {args.threshold})")
+    print(f"Agreement with LLM:      {agreed / confident:.1%} of confident decisions" if confident else "Agreement with LLM:      n/a")
+    print(f"Local latency p50/p95:   {percentile(local_latencies, 50):.1f} / {percentile(local_latencies, 95):.1f} us")
+    if llm_latencies:
+        llm_p50 = percentile(llm_latencies, 50)
+        print(f"LLM latency p50/p95:     {llm_p50:.0f} / {percentile(llm_latencies, 95):.0f} ms")
+        expected = statistics.mean(local_latencies) / 1e3 + (1 - coverage) * statistics.mean(llm_latencies)
+        print(f"Expected routing time:   {expected:.0f} ms vs {statistics.mean(llm_latencies):.0f} ms LLM-only")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default="chat_history.db")
+    parser.add_argument("--labels", help="JSONL file with request/task_type pairs")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_CONFIDENCE_THRESHOLD)
+    parser.add_argument("--repeat", type=int, default=100, help="local classifications per request when timing")
+    parser.add_argument("--live", action="store_true", help="also call the Groq LLM router (needs GROQ_API_KEY)")
+    run(parser.parse_args())
@@ -0,0 +1,109 @@
+"""Cold start of the Streamlit app: time to the login page, resident memory and import profile.
+
+Each run renders app.py in a fresh interpreter (via streamlit's AppTest, inside
+a scratch directory so no databases are touched), then imports the agent
+modules to show the cost deferred until after login. --profile adds a
+python -X importtime breakdown of the login page's slowest imports.
+
+    python benchmarks/startup_benchmark.py [--runs 5] [--profile] [--top 15]
+"""
+# ==============================================
+# IMPORT
+# ==============================================
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict, Any, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in the child interpreter: render the login page, then import the agents and print one JSON line.
+# Current RSS comes from /proc: ru_maxrss survives exec, so it would report the parent's peak.
+LOGIN_SCRIPT = """
+import json, resource, sys, time
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("VmRSS:")) / 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({app_path!r}, default_timeout=120).run()
+login_seconds = time.perf_counter() - start
+login_rss_mb = rss_mb()
+agents_loaded = "agents" in sys.modules
+"""
+AGENTS_SCRIPT = """
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+import agents
+print(json.dumps({{
+    "login_seconds": login_seconds,
+    "login_rss_mb": login_rss_mb,
+    "agents_loaded_at_login": agents_loaded,
+    "login_errors": [str(e.value) for e in app.exception],
+    "agents_import_seconds": time.perf_counter() - start,
+    "agents_rss_mb": rss_mb()
+}}))
+"""
+
+# ==============================================
+# HELPERS
+# ==============================================
+def run_child(code: str, extra_args: Tuple[str, ...] = ()) -> subprocess.CompletedProcess:
+    with tempfile.TemporaryDirectory() as workdir:
+        return subprocess.run(
+            [sys.executable, *extra_args, "-c", code], cwd=workdir, capture_output=True, text=True, check=True
+        )
+
+def measure_cold_start() -> Dict[str, Any]:
+    """One fresh-interpreter measurement of the login page and the deferred agent import"""
+    code = (LOGIN_SCRIPT + AGENTS_SCRIPT).format(app_path=os.path.join(ROOT, "app.py"), root=ROOT)
+    return json.loads(run_child(code).stdout.strip().splitlines()[-1])
+
+def import_profile(top: int) -> List[Tuple[int, str]]:
+    """(cumulative microseconds, module) of the slowest imports while rendering the login page"""
+    code = LOGIN_SCRIPT.format(app_path=os.path.join(ROOT, "app.py"))
+    rows = []
+    for line in run_child(code, ("-X", "importtime")).stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+# ==============================================
+# BENCHMARK
+# ==============================================
+def run(args):
+    results = [measure_cold_start() for _ in range(args.runs)]
+
+    def stat(field: str) -> str:
+        values = [result[field] for result in results]
+        return f"{statistics.median(values):.2f} (min {min(values):.2f}, max {max(values):.2f})"
+
+    print(f"Cold starts measured:     {len(results)}")
+    print(f"Time to login page:       {stat('login_seconds')} s")
+    print(f"RSS at login page:        {stat('login_rss_mb')} MB")
+    print(f"Agent modules at login:   {'loaded' if any(r['agents_loaded_at_login'] for r in results) else 'not loaded'}")
+    print(f"Deferred agents import:   {stat('agents_import_seconds')} s")
+    print(f"RSS after agents import:  {stat('agents_rss_mb')} MB")
+    errors = {error for result in results for error in result["login_errors"]}
+    if errors:
+        print(f"Login page errors:        {sorted(errors)}")
+
+    if args.profile:
+        print("\nSlowest imports before the login page (cumulative ms):")
+        for micros, module in import_profile(args.top):
+            print(f"{micros / 1e3:10.1f}  {module}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to measure")
+    parser.add_argument("--profile", action="store_true", help="also print an import-time profile of the login page")
+    parser.add_argument("--top", type=int, default=15, help="modules shown in the import profile")
+    run(parser.parse_args())
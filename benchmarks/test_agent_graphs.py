@@ -0,0 +1,251 @@
+"""Offline performance benchmarks for the agent graphs, driven by mock_llm.
+
+    python -m pytest benchmarks --benchmark-only
+    python -m pytest benchmarks --benchmark-autosave   # then --benchmark-compare to spot regressions
+
+With zero mock latency the numbers are pure LangGraph/state/prompt-building
+overhead; the throughput benchmarks use a fixed per-call latency so they
+measure how well concurrent requests overlap.
+"""
+# ==============================================
+# IMPORT
+# ==============================================
+import asyncio
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import httpx
+import pytest
+from groq import APIConnectionError
+
+from agents import MultiAgentSystem, AdvancedMultiAgentSystem
+from batch import arun_batch
+from mock_llm import MockScript, fixed_latency, mock_llm_factory
+from storage import create_checkpointer
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+REQUEST = "Research the trade-offs of SQLite WAL mode and plan a migration for our chat history store"
+BATCH_SIZE = 16
+CALL_LATENCY_SECONDS = 0.02
+
+# ==============================================
+# GRAPH OVERHEAD
+# ==============================================
+@pytest.mark.parametrize("task_type", ["chat", "research", "planning", "complex"])
+def test_basic_graph_overhead(benchmark, make_system, task_type):
+    system = make_system(MultiAgentSystem, MockScript(task_type=task_type))
+    result = benchmark(system.process_request, REQUEST)
+    assert result["task_type"] == task_type
+    # Chat is answered directly; everything else ends with the reviewer
+    assert ("chat" if task_type == "chat" else "reviewer") in result["agent_outputs"]
+
+def test_basic_graph_parallel_complex_overhead(benchmark, make_system):
+    system = make_system(MultiAgentSystem, MockScript(task_type="complex"), parallel_complex=True)
+    result = benchmark(system.process_request, REQUEST)
+    assert {"researcher", "planner"} <= set(result["agent_outputs"])
+
+def test_advanced_graph_overhead(benchmark, make_system):
+    system = make_system(AdvancedMultiAgentSystem, MockScript(task_type="complex"))
+    result = benchmark(system.process_advanced_request, REQUEST)
+    assert result["iteration_count"] == 0
+    assert result["final_output"]
+
+def test_streaming_overhead(benchmark, make_system):
+    system = make_system(MultiAgentSystem, MockScript(task_type="complex"))
+    events = benchmark(lambda: list(system.process_request_stream(REQUEST)))
+    assert events[-1]["type"] == "result"
+
+# ==============================================
+# ITERATION PATH
+# ==============================================
+def test_advanced_iteration_path(benchmark, make_system):
+    # A fresh script per round so every run fails research once, then passes
+    def run():
+        system = make_system(AdvancedMultiAgentSystem, MockScript(task_type="complex", quality_scores=[40, 90]))
+        return system, system.process_advanced_request(REQUEST)
+
+    system, result = benchmark(run)
+    assert result["iteration_count"] == 1
+    assert result["validation_results"]["research_quality"]
+    # Only the failing stage re-runs: research twice, planning once
+    assert system.agents["researcher"].calls == 2
+    assert system.agents["planner"].calls == 1
+
+# ==============================================
+# THROUGHPUT UNDER CONCURRENCY
+# ==============================================
+@pytest.mark.parametrize("concurrency", [1, 8])
+def test_batch_throughput(benchmark, make_system, tmp_path, concurrency):
+    system = make_system(MultiAgentSystem, MockScript(task_type="complex"), latency=fixed_latency(CALL_LATENCY_SECONDS))
+    requests = [(str(i), f"{REQUEST} #{i}") for i in range(BATCH_SIZE)]
+    rounds = itertools.count()
+
+    def run():
+        output_path = tmp_path / f"results-{next(rounds)}.jsonl"
+        return asyncio.run(arun_batch(system, requests, str(output_path), concurrency=concurrency, resume=False))
+
+    summary = benchmark.pedantic(run, rounds=3, iterations=1)
+    assert summary["ok"] == BATCH_SIZE
+    benchmark.extra_info["requests_per_second"] = round(BATCH_SIZE / summary["elapsed_seconds"], 2)
+
+# ==============================================
+# STORAGE
+# ==============================================
+def test_workflow_storage_write(benchmark, make_system, repository):
+    result = make_system(MultiAgentSystem, MockScript(task_type="complex")).process_request(REQUEST)
+    ids = itertools.count()
+
+    def write():
+        repository.add_workflow("bench", f"wf-{next(ids)}", REQUEST, result, datetime.now().isoformat())
+
+    benchmark(write)
+    assert repository.count_workflows("bench") == next(ids)
+    benchmark.extra_info["result_bytes"] = len(json.dumps(result, default=str))
+    benchmark.extra_info["stored_bytes"] = len(repository.conn.execute(
+        "SELECT result FROM agent_workflows WHERE workflow_id = 'wf-0'"
+    ).fetchone()[0])
+
+def test_workflow_storage_read(benchmark, make_system, repository):
+    result = make_system(AdvancedMultiAgentSystem, MockScript(task_type="complex")).process_advanced_request(REQUEST)
+    repository.add_workflow("bench", "wf-read", REQUEST, result, datetime.now().isoformat())
+
+    loaded = benchmark(repository.get_workflow_result, "bench", "wf-read")
+    assert loaded == json.loads(json.dumps(result, default=str))
+
+# ==============================================
+# CHECKPOINT RESUME
+# ==============================================
+def test_resume_skips_completed_nodes(tmp_path):
+    # The planner's backend drops the connection once, after the researcher has finished
+    failures = {"planner": 1}
+    factory = mock_llm_factory(MockScript(task_type="complex"))
+
+    def flaky_factory(role, temperature):
+        llm = factory(role, temperature)
+        stream = llm.stream
+
+        def flaky_stream(messages, *args, **kwargs):
+            if failures.get(role):
+                failures[role] -= 1
+                raise APIConnectionError(request=httpx.Request("POST", "http://llm.invalid"))
+            return stream(messages, *args, **kwargs)
+        llm.stream = flaky_stream
+        return llm
+
+    system = MultiAgentSystem("", llm_factory=flaky_factory, checkpointer=create_checkpointer(str(tmp_path / "ckpt.db")))
+    failed = system.run_request(REQUEST, "wf-resume")
+    assert failed["workflow_status"] == "Error occurred"
+    assert system.is_resumable("wf-resume")
+    assert system.agents["researcher"].calls == 1
+
+    result = system.resume_request("wf-resume")
+    assert "reviewer" in result["agent_outputs"]
+    assert not system.is_resumable("wf-resume")
+    # The researcher's checkpointed output was reused, not recomputed
+    assert system.agents["researcher"].calls == 1
+    assert system.agents["planner"].calls == 1
+
+@pytest.mark.parametrize("system_class", [MultiAgentSystem, AdvancedMultiAgentSystem])
+def test_unnamed_runs_leave_no_checkpoints(tmp_path, system_class):
+    # Runs without a workflow_id get a generated thread that nothing could resume
+    checkpointer = create_checkpointer(str(tmp_path / "ckpt.db"))
+    system = system_class("", llm_factory=mock_llm_factory(MockScript(task_type="complex")), checkpointer=checkpointer)
+    assert "reviewer" in system.process_request(REQUEST)["agent_outputs"]
+    assert "reviewer" in asyncio.run(system.aprocess_request(REQUEST))["agent_outputs"]
+    assert list(system.process_request_stream(REQUEST))[-1]["type"] == "result"
+    assert list(checkpointer.list(None)) == []
+
+    # Named runs keep theirs until the caller discards them
+    system.process_request(REQUEST, "wf-named")
+    assert system.checkpoint_state("wf-named") is not None
+
+# ==============================================
+# SPECULATIVE RESEARCH
+# ==============================================
+def speculative_system(system_class, task_type):
+    # Slow enough that the router answers while the speculative research is still streaming
+    factory = mock_llm_factory(MockScript(task_type=task_type), latency=fixed_latency(0.1), tokens_per_second=2000)
+    return system_class("", llm_factory=factory, speculative_research=True)
+
+@pytest.mark.parametrize("system_class", [MultiAgentSystem, AdvancedMultiAgentSystem])
+@pytest.mark.parametrize("task_type", ["research", "complex"])
+def test_speculative_research_is_reused(system_class, task_type):
+    system = speculative_system(system_class, task_type)
+    result = system.run_request(REQUEST)
+    assert result["speculation"] == "hit"
+    assert "researcher" in result["agent_outputs"]
+    # The research node was skipped: only the speculative call reached the researcher
+    assert system.agents["researcher"].calls == 1
+    summary = system.metrics.speculation_summary()
+    assert summary["hits"] == 1 and summary["misses"] == 0 and summary["seconds_saved"] > 0
+
+@pytest.mark.parametrize("system_class", [MultiAgentSystem, AdvancedMultiAgentSystem])
+@pytest.mark.parametrize("task_type", ["chat", "planning"])
+def test_speculative_research_is_cancelled(system_class, task_type):
+    system = speculative_system(system_class, task_type)
+    result = system.run_request(REQUEST)
+    assert result["speculation"] == "miss"
+    assert "researcher" not in result["agent_outputs"]
+    assert system.agents["researcher"].calls == 1
+
+    # The miss is recorded once the cancelled stream has unwound
+    deadline = time.time() + 5
+    while system.metrics.speculation_summary()["misses"] == 0:
+        assert time.time() < deadline, "miss was not recorded"
+        time.sleep(0.01)
+    summary = system.metrics.speculation_summary()
+    assert summary["hits"] == 0 and summary["tokens_wasted"] > 0
+
+def test_failed_speculation_falls_back_to_the_research_node(tmp_path):
+    # The speculative call hits a transient error, which checkpointed runs re-raise
+    failures = {"researcher": 1}
+    factory = mock_llm_factory(MockScript(task_type="research"), latency=fixed_latency(0.05))
+
+    def flaky_factory(role, temperature):
+        llm = factory(role, temperature)
+        stream = llm.stream
+
+        def flaky_stream(messages, *args, **kwargs):
+            if failures.get(role):
+                failures[role] -= 1
+                raise APIConnectionError(request=httpx.Request("POST", "http://llm.invalid"))
+            return stream(messages, *args, **kwargs)
+        llm.stream = flaky_stream
+        return llm
+
+    system = AdvancedMultiAgentSystem("", llm_factory=flaky_factory, speculative_research=True,
+                                      checkpointer=create_checkpointer(str(tmp_path / "ckpt.db")))
+    result = system.run_request(REQUEST, "wf-speculation")
+    assert result["speculation"] == "miss"
+    assert "reviewer" in result["agent_outputs"]
+    # The router's decision was kept and the research node made the call that succeeded
+    assert failures["researcher"] == 0
+    assert system.agents["router"].calls == 1
+    assert system.agents["researcher"].calls == 1
+
+def test_speculative_handoff_uses_the_decided_route():
+    system = speculative_system(AdvancedMultiAgentSystem, "complex")
+    result = system.run_request(REQUEST)
+    assert result["speculation"] == "hit"
+    research_logs = [log for log in result["handoff_logs"] if log["to"] == "researcher"]
+    assert [log["data_passed"] for log in research_logs] == ["Task type: complex, Priority: medium"]
+
+def test_queued_speculation_is_not_waited_on():
+    system = speculative_system(MultiAgentSystem, "research")
+    busy = threading.Event()
+    system.speculation_executor = ThreadPoolExecutor(max_workers=1)
+    system.speculation_executor.submit(busy.wait, 5)
+    try:
+        result = system.run_request(REQUEST)
+    finally:
+        busy.set()
+    assert result["speculation"] == "miss"
+    # The queued speculative research never started; the research node did the work
+    assert "researcher" in result["agent_outputs"]
+    assert system.agents["researcher"].calls == 1
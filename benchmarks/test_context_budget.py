@@ -0,0 +1,62 @@
+"""Context budgets must bound prompt growth without cutting normal-length agent outputs.
+
+    python -m pytest benchmarks/test_context_budget.py
+"""
+# ==============================================
+# IMPORT
+# ==============================================
+import json
+from typing import Any, List
+
+from agents import AdvancedMultiAgentSystem
+from context_budget import ContextBudgeter, count_tokens, load_budgets
+from mock_llm import MockScript
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+REQUEST = "Research the trade-offs of SQLite WAL mode and plan a migration for our chat history store"
+MILESTONES = [
+    "Inventory every writer of chat_history.db",
+    "Enable WAL on a staging copy and replay a week of traffic",
+    "Tune wal_autocheckpoint against the replay",
+    "Roll out behind the SQLITE_WAL flag",
+    "Remove the old rollback-journal code path",
+]
+
+class RecordingScript(MockScript):
+    """MockScript with a realistic multi-step plan that keeps the reviewer's prompt"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.review_prompts: List[str] = []
+
+    def respond(self, role: str, messages: List[Any]) -> str:
+        if role == "planner":
+            steps = "\n\n".join(
+                f"### Step {i}: {milestone}\n{self.filler(f'step {i}')}" for i, milestone in enumerate(MILESTONES, 1)
+            )
+            return f"## Plan\n{steps}\n\n```json\n{json.dumps({'plan_validation': 'PASS'})}\n```"
+        if role == "reviewer":
+            self.review_prompts.append(str(messages[-1].content))
+        return super().respond(role, messages)
+
+# ==============================================
+# BUDGETS
+# ==============================================
+def test_realistic_plan_reaches_the_reviewer(make_system):
+    script = RecordingScript(task_type="complex")
+    system = make_system(AdvancedMultiAgentSystem, script)
+    result = system.process_advanced_request(REQUEST)
+    assert 1000 < count_tokens(result["plan_content"]) <= load_budgets()["reviewer"]["plan"]
+
+    prompt = script.review_prompts[-1]
+    assert "tokens omitted" not in prompt
+    for milestone in MILESTONES:
+        assert milestone in prompt
+
+def test_oversized_sections_are_truncated():
+    budgeter = ContextBudgeter({"reviewer": {"plan": 100}})
+    fitted = budgeter.fit("reviewer", "plan", "word " * 1000)
+    assert "tokens omitted" in fitted
+    assert count_tokens(fitted) < 150
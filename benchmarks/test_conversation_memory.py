@@ -0,0 +1,104 @@
+"""Rolling summaries and the token budget of per-session conversation memory.
+
+    python -m pytest benchmarks/test_conversation_memory.py
+"""
+# ==============================================
+# IMPORT
+# ==============================================
+import threading
+
+import pytest
+
+from context_budget import count_tokens
+from conversation_memory import ConversationMemory, extractive_summary
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+SESSION = "session-1"
+RECENT_TURNS = 2
+
+@pytest.fixture
+def memory(repository):
+    memory = ConversationMemory(repository, recent_turns=RECENT_TURNS, token_budget=200)
+    yield memory
+    memory.executor.shutdown(wait=True)
+
+def add_turns(memory, count: int, summarizer=None, start: int = 1):
+    for i in range(start, start + count):
+        memory.record_turn("bench", SESSION, f"question {i}", f"answer {i}", summarizer).result()
+
+# ==============================================
+# FOLDING
+# ==============================================
+def test_overflow_is_folded_into_the_summary(memory, repository):
+    folded = []
+
+    def summarizer(summary, turns):
+        folded.append([turn["turn"] for turn in turns])
+        return f"{summary} {' '.join(turn['request'] for turn in turns)}".strip()
+
+    add_turns(memory, 5, summarizer)
+    summary, summarized_turns, turns = repository.get_conversation("bench", SESSION)
+    # The recent window is kept, older turns are deleted once they are in the summary
+    assert [turn["turn"] for turn in turns] == [4, 5]
+    assert summarized_turns == 3
+    assert summary == "question 1 question 2 question 3"
+    assert folded == [[1], [2], [3]]
+
+    # Numbering carries on after the folded turns
+    assert repository.add_conversation_turn("bench", SESSION, "question 6", "answer 6", "now") == 6
+
+def test_failed_summarizer_falls_back_to_extractive_summary(memory, repository):
+    def summarizer(summary, turns):
+        raise RuntimeError("summarizer unavailable")
+
+    add_turns(memory, RECENT_TURNS + 1, summarizer)
+    summary, summarized_turns, turns = repository.get_conversation("bench", SESSION)
+    assert summarized_turns == 1
+    assert summary == extractive_summary("", [{"request": "question 1", "response": "answer 1"}])
+    assert len(turns) == RECENT_TURNS
+
+def test_concurrent_folds_keep_the_first_summary(memory, repository):
+    # Stored without folding, so both folds below start from the same unsummarized state
+    for i in range(1, RECENT_TURNS + 2):
+        repository.add_conversation_turn("bench", SESSION, f"question {i}", f"answer {i}", "now")
+
+    slow_read, first_written = threading.Event(), threading.Event()
+
+    def slow_summarizer(summary, turns):
+        slow_read.set()
+        first_written.wait(5)
+        return "second summary"
+
+    slow = threading.Thread(target=memory.fold_overflow, args=("bench", SESSION, slow_summarizer))
+    slow.start()
+    assert slow_read.wait(5)
+    memory.fold_overflow("bench", SESSION, lambda summary, turns: "first summary")
+    first_written.set()
+    slow.join(5)
+
+    summary, summarized_turns, turns = repository.get_conversation("bench", SESSION)
+    assert summary == "first summary"
+    assert summarized_turns == 1
+    assert [turn["turn"] for turn in turns] == [2, 3]
+
+# ==============================================
+# TOKEN BUDGET
+# ==============================================
+def test_context_stays_within_the_token_budget(repository):
+    memory = ConversationMemory(repository, recent_turns=RECENT_TURNS, token_budget=800)
+    assert memory.context("bench", SESSION) == ""
+    long_answer = "WAL mode lets readers continue while a writer appends. " * 200
+    for i in range(1, 7):
+        memory.record_turn("bench", SESSION, f"question {i}", long_answer).result()
+
+    context = memory.context("bench", SESSION)
+    assert count_tokens(context) <= memory.token_budget + 20  # truncation marker
+    assert "Summary of earlier conversation" in context
+    # The oldest recent turn is dropped before the summary or the latest turn is cut
+    assert "question 6" in context and "question 5" not in context
+    memory.executor.shutdown(wait=True)
+
+    memory.token_budget = 200
+    assert count_tokens(memory.context("bench", SESSION)) <= 200 + 20
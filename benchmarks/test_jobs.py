@@ -0,0 +1,89 @@
+"""Single-flight coalescing of identical workflow submissions in JobManager.
+
+    python -m pytest benchmarks/test_jobs.py
+"""
+# ==============================================
+# IMPORT
+# ==============================================
+import time
+
+import pytest
+
+from agents import MultiAgentSystem
+from jobs import JobManager, DONE, FAILED, QUEUED, RUNNING, coalesce_key
+from mock_llm import MockScript, fixed_latency
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+REQUEST = "Research the trade-offs of SQLite WAL mode and plan a migration for our chat history store"
+SUBMISSIONS = 5
+CALL_LATENCY_SECONDS = 0.05
+
+def wait_for_jobs(manager: JobManager, usernames, timeout: float = 10.0):
+    deadline = time.time() + timeout
+    while any(job["status"] in (QUEUED, RUNNING) for username in usernames for job in manager.user_jobs(username)):
+        assert time.time() < deadline, "jobs did not finish"
+        time.sleep(0.01)
+
+@pytest.fixture
+def manager():
+    manager = JobManager(max_workers=SUBMISSIONS)
+    yield manager
+    manager.executor.shutdown(wait=True)
+
+# ==============================================
+# COALESCING
+# ==============================================
+def test_identical_submissions_run_once(make_system, manager):
+    system = make_system(MultiAgentSystem, MockScript(task_type="research"), latency=fixed_latency(CALL_LATENCY_SECONDS))
+    key = coalesce_key(REQUEST, "basic")
+    finished = []
+    usernames = [f"user-{i}" for i in range(SUBMISSIONS)]
+    jobs = [
+        manager.submit(username, f"job-{i}", REQUEST, lambda emit: system.run_request(REQUEST, emit=emit),
+                       on_finish=finished.append, coalesce_key=key)
+        for i, username in enumerate(usernames)
+    ]
+    wait_for_jobs(manager, usernames)
+
+    # One graph run: each agent on the research route made a single LLM call
+    assert system.agents["router"].calls == 1
+    assert system.agents["researcher"].calls == 1
+    assert sorted(job.job_id for job in finished) == sorted(job.job_id for job in jobs)
+    assert all(job.status == DONE and job.result["final_output"] == jobs[0].result["final_output"] for job in jobs)
+    assert all(job.leader_id == "job-0" for job in jobs[1:])
+    assert manager.stats()["coalesced"] == SUBMISSIONS - 1
+
+def test_failing_leader_fails_followers(manager):
+    key = coalesce_key(REQUEST)
+    finished = []
+
+    def failing_run(emit):
+        time.sleep(CALL_LATENCY_SECONDS)
+        raise RuntimeError("backend down")
+
+    jobs = [
+        manager.submit(f"user-{i}", f"job-{i}", REQUEST, failing_run, on_finish=finished.append, coalesce_key=key)
+        for i in range(3)
+    ]
+    wait_for_jobs(manager, [f"user-{i}" for i in range(3)])
+
+    assert all(job.status == FAILED for job in jobs)
+    assert all("backend down" in job.result["final_output"] for job in jobs)
+    # Followers still get their on_finish (e.g. to persist the error result)
+    assert {"job-1", "job-2"} <= {job.job_id for job in finished}
+
+def test_submission_after_leader_finishes_runs_fresh(make_system, manager):
+    system = make_system(MultiAgentSystem, MockScript(task_type="research"))
+    key = coalesce_key(REQUEST, "basic")
+
+    first = manager.submit("alice", "job-1", REQUEST, lambda emit: system.run_request(REQUEST, emit=emit), coalesce_key=key)
+    wait_for_jobs(manager, ["alice"])
+    second = manager.submit("bob", "job-2", REQUEST, lambda emit: system.run_request(REQUEST, emit=emit), coalesce_key=key)
+    wait_for_jobs(manager, ["bob"])
+
+    assert first.status == DONE and second.status == DONE
+    assert second.leader_id is None
+    assert system.agents["router"].calls == 2
+    assert manager.stats()["coalesced"] == 0
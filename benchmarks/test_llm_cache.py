@@ -0,0 +1,114 @@
+"""Expiry, eviction and the semantic tier of the LLM response cache.
+
+    python -m pytest benchmarks/test_llm_cache.py
+"""
+# ==============================================
+# IMPORT
+# ==============================================
+import math
+
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+
+import llm_cache
+from llm_cache import ResponseCache
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+MODEL = "mock-llm"
+
+class FakeClock:
+    """Stands in for the time module inside llm_cache"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_cache, "time", clock)
+    return clock
+
+def prompt(text: str, system: str = "You are a researcher") -> list:
+    return [SystemMessage(content=system), HumanMessage(content=text)]
+
+# Unit vectors at a chosen angle from "base", so similarities are exact
+ANGLES = {"sqlite wal": 0.0, "sqlite wal mode": 0.2, "sqlite journal": 0.6, "tomato soup": 1.5}
+
+def angle_embedding(text: str) -> list:
+    # The cache embeds the normalized final message, e.g. "human: sqlite wal"
+    angle = ANGLES[text.split(": ", 1)[1]]
+    return [math.cos(angle), math.sin(angle)]
+
+# ==============================================
+# EXACT TIER
+# ==============================================
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.db"), ttl_seconds=60)
+    cache.put("researcher", MODEL, 0.3, prompt("sqlite wal"), "cached answer")
+    # Case and whitespace do not change the key
+    assert cache.get("researcher", MODEL, 0.3, prompt("  SQLite   WAL ")) == "cached answer"
+
+    clock.advance(61)
+    assert cache.get("researcher", MODEL, 0.3, prompt("sqlite wal")) is None
+    assert cache.stats["researcher"] == {"exact_hits": 1, "semantic_hits": 0, "misses": 1}
+    # The next write also removes the expired row
+    cache.put("researcher", MODEL, 0.3, prompt("tomato soup"), "other answer")
+    assert cache.size() == 1
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.db"), max_entries=2)
+    cache.put("researcher", MODEL, 0.3, prompt("first"), "1")
+    clock.advance(1)
+    cache.put("researcher", MODEL, 0.3, prompt("second"), "2")
+    clock.advance(1)
+    assert cache.get("researcher", MODEL, 0.3, prompt("first")) == "1"  # now the most recently used
+    clock.advance(1)
+    cache.put("researcher", MODEL, 0.3, prompt("third"), "3")
+
+    assert cache.size() == 2
+    assert cache.get("researcher", MODEL, 0.3, prompt("second")) is None
+    assert cache.get("researcher", MODEL, 0.3, prompt("first")) == "1"
+    assert cache.get("researcher", MODEL, 0.3, prompt("third")) == "3"
+
+def test_key_includes_role_model_and_temperature(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    cache.put("researcher", MODEL, 0.3, prompt("sqlite wal"), "cached answer")
+    assert cache.get("planner", MODEL, 0.3, prompt("sqlite wal")) is None
+    assert cache.get("researcher", "other-model", 0.3, prompt("sqlite wal")) is None
+    assert cache.get("researcher", MODEL, 0.7, prompt("sqlite wal")) is None
+
+# ==============================================
+# SEMANTIC TIER
+# ==============================================
+@pytest.fixture
+def semantic_cache(tmp_path, clock):
+    # cos(0.2) ~ 0.98 clears the threshold, cos(0.6) ~ 0.83 does not
+    cache = ResponseCache(str(tmp_path / "cache.db"), semantic=True, embed_fn=angle_embedding, similarity_threshold=0.9)
+    cache.put("researcher", MODEL, 0.3, prompt("sqlite wal"), "cached answer")
+    return cache
+
+def test_similar_prompt_above_threshold_hits(semantic_cache):
+    assert semantic_cache.get("researcher", MODEL, 0.3, prompt("sqlite wal mode")) == "cached answer"
+    assert semantic_cache.stats["researcher"]["semantic_hits"] == 1
+
+def test_prompt_below_threshold_misses(semantic_cache):
+    assert semantic_cache.get("researcher", MODEL, 0.3, prompt("sqlite journal")) is None
+    assert semantic_cache.get("researcher", MODEL, 0.3, prompt("tomato soup")) is None
+    assert semantic_cache.stats["researcher"] == {"exact_hits": 0, "semantic_hits": 0, "misses": 2}
+
+def test_semantic_matches_need_the_same_preceding_messages(semantic_cache):
+    # Same final message, different system prompt or role: never served from the semantic tier
+    assert semantic_cache.get("researcher", MODEL, 0.3, prompt("sqlite wal mode", system="You are a planner")) is None
+    assert semantic_cache.get("planner", MODEL, 0.3, prompt("sqlite wal mode")) is None
+
+def test_semantic_entries_expire_too(semantic_cache, clock):
+    clock.advance(llm_cache.DEFAULT_TTL_SECONDS + 1)
+    assert semantic_cache.get("researcher", MODEL, 0.3, prompt("sqlite wal mode")) is None
@@ -0,0 +1,101 @@
+"""Latency routing, hedging and failover of ModelPool against local OpenAI-compatible stub servers.
+
+    python -m pytest benchmarks/test_llm_pool.py
+"""
+# ==============================================
+# IMPORT
+# ==============================================
+import time
+
+import pytest
+
+pytest.importorskip("langchain_openai")
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from llm_pool import ModelPool
+from mock_llm import MockScript, fixed_latency, serve_openai_stub
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+MESSAGES = [SystemMessage(content="You are a research specialist."), HumanMessage(content="Research request: solar")]
+FAST_SECONDS = 0.01
+SLOW_SECONDS = 0.3
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(latency_seconds: float, fail_rate: float = 0.0) -> dict:
+        server, base_url = serve_openai_stub(MockScript(), fixed_latency(latency_seconds), fail_rate)
+        servers.append(server)
+        return {"name": f"stub-{len(servers)}", "provider": "openai", "model": "researcher", "base_url": base_url}
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+# ==============================================
+# ROUTING
+# ==============================================
+def test_routes_to_lowest_latency_backend(benchmark, stub):
+    pool = ModelPool.from_specs("researcher", [stub(SLOW_SECONDS), stub(FAST_SECONDS)], 0.3, hedge_after_seconds=5)
+    # Warm up: each untried backend is called once, then latency decides
+    pool.invoke(MESSAGES)
+    pool.invoke(MESSAGES)
+    response = benchmark(pool.invoke, MESSAGES)
+    assert "quality_score" in response.content
+    slow, fast = pool.backends
+    assert slow.calls == 1
+    assert fast.calls > 1
+
+def test_hedges_slow_backend(benchmark, stub):
+    pool = ModelPool.from_specs("researcher", [stub(SLOW_SECONDS), stub(FAST_SECONDS)], 0.3, hedge_after_seconds=0.05)
+
+    def first_call():
+        # Reset the latency estimates so every round starts on the slow backend
+        for backend in pool.backends:
+            backend.latency_ewma = None
+        start = time.perf_counter()
+        pool.invoke(MESSAGES)
+        return time.perf_counter() - start
+
+    elapsed = benchmark.pedantic(first_call, rounds=3, iterations=1)
+    assert elapsed < SLOW_SECONDS
+    assert pool.hedge_wins >= 1
+
+def test_hedges_stream_on_time_to_first_chunk(stub):
+    pool = ModelPool.from_specs("researcher", [stub(SLOW_SECONDS), stub(FAST_SECONDS)], 0.3, hedge_after_seconds=0.05)
+    start = time.perf_counter()
+    stream = pool.stream(MESSAGES)
+    first = next(stream)
+    time_to_first_chunk = time.perf_counter() - start
+    text = first.content + "".join(chunk.content for chunk in stream)
+    assert time_to_first_chunk < SLOW_SECONDS
+    assert "quality_score" in text
+    assert pool.hedges == 1 and pool.hedge_wins == 1
+    slow, fast = pool.backends
+    assert fast.calls == 1 and slow.failures == 0
+
+# ==============================================
+# FAILOVER
+# ==============================================
+def test_fails_over_and_marks_backend_unhealthy(stub):
+    pool = ModelPool.from_specs("researcher", [stub(FAST_SECONDS, fail_rate=1.0), stub(FAST_SECONDS)], 0.3)
+    for _ in range(3):
+        assert pool.invoke(MESSAGES).content
+    failing, healthy = pool.backends
+    assert failing.failures >= 1
+    assert healthy.calls == 3
+
+    # Streaming fails over before the first chunk too
+    failing.latency_ewma, failing.consecutive_failures, failing.unhealthy_until = None, 0, 0.0
+    text = "".join(chunk.content for chunk in pool.stream(MESSAGES))
+    assert "quality_score" in text
+    assert failing.failures >= 2
+
+def test_all_backends_failing_raises(stub):
+    pool = ModelPool.from_specs("researcher", [stub(FAST_SECONDS, fail_rate=1.0), stub(FAST_SECONDS, fail_rate=1.0)], 0.3)
+    with pytest.raises(Exception):
+        pool.invoke(MESSAGES)
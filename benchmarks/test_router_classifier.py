@@ -0,0 +1,30 @@
+"""Keyword rules and confidence of the local router classifier.
+
+    python -m pytest benchmarks/test_router_classifier.py
+"""
+# ==============================================
+# IMPORT
+# ==============================================
+import pytest
+
+from router_classifier import LocalRouterClassifier
+
+# ==============================================
+# RULES
+# ==============================================
+@pytest.mark.parametrize("text", ["hello", "Hello there!", "hey", "thanks, bye", "Good morning", "How are you doing today?"])
+def test_pleasantries_route_to_chat(text):
+    decision = LocalRouterClassifier().rule_scores(text)
+    assert decision is not None and decision.task_type == "chat"
+
+@pytest.mark.parametrize("text, expected", [
+    ("hello what is quantum computing", "research"),
+    ("hey explain black holes", "research"),
+    ("hi, plan my week", "planning"),
+    ("thanks! now research solar panels and create a plan", "complex"),
+])
+def test_questions_after_a_greeting_are_not_chat(text, expected):
+    classifier = LocalRouterClassifier()
+    assert classifier.rule_scores(text).task_type == expected
+    decision = classifier.classify(text)
+    assert decision is None or decision.task_type != "chat"
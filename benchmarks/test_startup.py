@@ -0,0 +1,21 @@
+"""The login page must render without loading the agent modules.
+
+    python -m pytest benchmarks/test_startup.py
+"""
+# ==============================================
+# IMPORT
+# ==============================================
+import pytest
+
+pytest.importorskip("streamlit.testing.v1")
+
+from startup_benchmark import measure_cold_start
+
+# ==============================================
+# COLD START
+# ==============================================
+def test_login_page_defers_agent_imports():
+    result = measure_cold_start()
+    assert result["login_errors"] == []
+    assert not result["agents_loaded_at_login"]
+    assert result["login_rss_mb"] < result["agents_rss_mb"]
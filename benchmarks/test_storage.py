@@ -0,0 +1,80 @@
+"""One-time import of the legacy users.json into the SQLite store.
+
+    python -m pytest benchmarks/test_storage.py
+"""
+# ==============================================
+# IMPORT
+# ==============================================
+import json
+
+import pytest
+
+from storage import UserRepository
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+LEGACY_USERS = {
+    # Oldest format: the password stored directly as a string
+    "alice": "alice-password",
+    # Later format: a dict with the password, profile fields and saved workflows
+    "bob": {
+        "password": "bob-password",
+        "sessions": {"s1": {"title": "WAL questions"}},
+        "agent_workflows": {
+            "wf-bob": {
+                "request": "Research SQLite WAL mode",
+                "result": {"final_output": "WAL lets readers run during writes", "task_type": "research"},
+                "timestamp": "2024-05-01T12:00:00"
+            }
+        }
+    },
+}
+
+@pytest.fixture
+def users_file(tmp_path):
+    path = tmp_path / "users.json"
+    path.write_text(json.dumps(LEGACY_USERS))
+    return str(path)
+
+def user_count(repository: UserRepository) -> int:
+    return repository.conn.execute("SELECT count(*) FROM users").fetchone()[0]
+
+# ==============================================
+# MIGRATION
+# ==============================================
+def test_users_json_is_imported_once(tmp_path, users_file):
+    db_path = str(tmp_path / "users.db")
+    repository = UserRepository(db_path, legacy_users_file=users_file)
+
+    assert repository.get_password("alice") == "alice-password"
+    assert repository.get_password("bob") == "bob-password"
+    profile = json.loads(repository.conn.execute("SELECT profile FROM users WHERE username = 'bob'").fetchone()[0])
+    assert profile == {"sessions": {"s1": {"title": "WAL questions"}}}
+    assert repository.list_workflows("alice") == {}
+    result = repository.get_workflow_result("bob", "wf-bob")
+    assert result["final_output"] == "WAL lets readers run during writes"
+    assert repository.conn.execute(
+        "SELECT value FROM storage_meta WHERE key = 'users_json_migrated'"
+    ).fetchone() is not None
+
+    # Changes made in the database after the import must survive a restart
+    repository.conn.execute("UPDATE users SET password = 'changed' WHERE username = 'alice'")
+    repository.delete_workflow("bob", "wf-bob")
+    with open(users_file, "w") as f:
+        json.dump({**LEGACY_USERS, "carol": "carol-password"}, f)
+
+    restarted = UserRepository(db_path, legacy_users_file=users_file)
+    assert user_count(restarted) == 2
+    assert restarted.get_password("alice") == "changed"
+    assert restarted.get_password("carol") is None
+    assert restarted.get_workflow_result("bob", "wf-bob") is None
+
+def test_missing_or_corrupt_users_json(tmp_path):
+    assert user_count(UserRepository(str(tmp_path / "none.db"), legacy_users_file=str(tmp_path / "missing.json"))) == 0
+
+    corrupt = tmp_path / "corrupt.json"
+    corrupt.write_text("{not json")
+    repository = UserRepository(str(tmp_path / "corrupt.db"), legacy_users_file=str(corrupt))
+    assert user_count(repository) == 0
+    assert repository.create_user("alice", "secret")
@@ -0,0 +1,119 @@
+"""Parsing, validation and repair of the agents' structured replies.
+
+    python -m pytest benchmarks/test_structured_output.py
+"""
+# ==============================================
+# IMPORT
+# ==============================================
+from typing import Any, List
+
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from agents import MultiAgentSystem
+from mock_llm import MockScript
+from structured_output import (
+    RouterDecision,
+    ResearchAssessment,
+    PlanAssessment,
+    StructuredOutputError,
+    normalize_label,
+    parse_structured,
+    strip_json_block
+)
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+class ReplyScript(MockScript):
+    """MockScript whose router answers with the given replies in turn (the last one repeats)"""
+
+    def __init__(self, replies: List[str]):
+        super().__init__()
+        self.replies = replies
+        self.prompts: List[List[Any]] = []
+
+    def respond(self, role: str, messages: List[Any]) -> str:
+        if role != "router":
+            return super().respond(role, messages)
+        self.prompts.append(messages)
+        return self.replies[min(len(self.prompts), len(self.replies)) - 1]
+
+def route(make_system, replies: List[str]):
+    script = ReplyScript(replies)
+    system = make_system(MultiAgentSystem, script)
+    messages = [SystemMessage(content="Classify the request"), HumanMessage(content="plan my week")]
+    _, decision = system.invoke_structured("router", messages, RouterDecision)
+    outcomes = {row["agent"]: row for row in system.metrics.structured_output_summary()}
+    return decision, outcomes["router"], script
+
+# ==============================================
+# LABELS
+# ==============================================
+@pytest.mark.parametrize("raw, expected", [
+    ("Planning.", "planning"),
+    (" research\n", "research"),
+    ('"CHAT"', "chat"),
+    ("**complex**", "complex"),
+    (3, 3),
+])
+def test_normalize_label(raw, expected):
+    assert normalize_label(raw) == expected
+
+def test_router_labels_are_normalized():
+    decision = parse_structured(RouterDecision, '{"task_type": "Planning.", "priority": " HIGH\\n"}')
+    assert (decision.task_type, decision.priority, decision.complexity) == ("planning", "high", "moderate")
+
+@pytest.mark.parametrize("reply", [
+    '{"task_type": "brainstorm"}',
+    '{"priority": "high"}',
+    "planning",
+])
+def test_unknown_or_missing_labels_are_rejected(reply):
+    with pytest.raises(StructuredOutputError):
+        parse_structured(RouterDecision, reply)
+
+def test_plan_validation_is_upper_cased():
+    assert parse_structured(PlanAssessment, '{"plan_validation": "pass."}').plan_validation == "PASS"
+    with pytest.raises(StructuredOutputError):
+        parse_structured(ResearchAssessment, '{"quality_score": 140}')
+
+# ==============================================
+# JSON EXTRACTION
+# ==============================================
+def test_last_fenced_block_wins():
+    reply = 'Example: ```json\n{"quality_score": 10}\n```\nFindings...\n```json\n{"quality_score": 82}\n```'
+    assert parse_structured(ResearchAssessment, reply).quality_score == 82
+
+def test_object_wrapped_in_prose():
+    reply = 'Sure! Here is the routing: {"task_type": "research", "reasoning": "needs {facts}"} Hope that helps.'
+    assert parse_structured(RouterDecision, reply).task_type == "research"
+
+def test_strip_json_block_keeps_the_prose():
+    reply = '## Findings\nWAL helps readers.\n\n```json\n{"quality_score": 90}\n```'
+    assert strip_json_block(reply) == "## Findings\nWAL helps readers."
+    assert strip_json_block("no block here") == "no block here"
+
+# ==============================================
+# REPAIR RETRY AND METRICS
+# ==============================================
+def test_valid_reply_is_ok(make_system):
+    decision, outcome, script = route(make_system, ['{"task_type": "planning"}'])
+    assert decision.task_type == "planning"
+    assert (outcome["ok"], outcome["repaired"], outcome["failed"]) == (1, 0, 0)
+    assert len(script.prompts) == 1
+
+def test_invalid_reply_is_repaired(make_system):
+    decision, outcome, script = route(make_system, ["I think this is planning.", '{"task_type": "planning"}'])
+    assert decision.task_type == "planning"
+    assert (outcome["ok"], outcome["repaired"], outcome["failed"]) == (0, 1, 0)
+    # The repair call sends back the invalid reply and the validation error
+    repair_prompt = script.prompts[1]
+    assert repair_prompt[-2].content == "I think this is planning."
+    assert "no JSON object found" in repair_prompt[-1].content
+
+def test_unrepairable_reply_fails(make_system):
+    decision, outcome, script = route(make_system, ['{"task_type": "brainstorm"}'])
+    assert decision is None
+    assert (outcome["ok"], outcome["repaired"], outcome["failed"], outcome["parse_failures"]) == (0, 0, 1, 1)
+    assert len(script.prompts) == 2
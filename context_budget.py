@@ -0,0 +1,113 @@
+# ==============================================
+# IMPORT
+# ==============================================
+import json
+import math
+import os
+from collections import Counter
+from typing import Dict, Any, List, Optional
+
+from metrics import MetricsRegistry
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+# Token budgets per agent and prompt section
+DEFAULT_BUDGETS: Dict[str, Dict[str, int]] = {
+    "researcher": {"previous": 1500, "critique": 400},
+    "planner": {"research": 1500, "previous": 1500, "critique": 400},
+    "reviewer": {"router": 60, "research": 1500, "plan": 1500, "handoff": 150},
+}
+# Overrides, e.g. {"planner": {"research": 3000}}; single values can also be set as CONTEXT_BUDGET_PLANNER_RESEARCH=3000
+CONTEXT_BUDGETS_FILE = os.getenv("CONTEXT_BUDGETS_FILE")
+CHARS_PER_TOKEN = 4
+
+# ==============================================
+# HELPERS
+# ==============================================
+def load_budgets(path: Optional[str] = CONTEXT_BUDGETS_FILE,
+                 overrides: Optional[Dict[str, Dict[str, int]]] = None) -> Dict[str, Dict[str, int]]:
+    """DEFAULT_BUDGETS with overrides from the JSON file, CONTEXT_BUDGET_<AGENT>_<SECTION> env vars and the caller"""
+    budgets = {agent: dict(sections) for agent, sections in DEFAULT_BUDGETS.items()}
+    layers = []
+    if path:
+        with open(path, "r") as f:
+            layers.append(json.load(f))
+    for agent, sections in DEFAULT_BUDGETS.items():
+        for section in sections:
+            value = os.getenv(f"CONTEXT_BUDGET_{agent.upper()}_{section.upper()}")
+            if value:
+                layers.append({agent: {section: int(value)}})
+    layers.append(overrides or {})
+    for layer in layers:
+        for agent, sections in layer.items():
+            budgets.setdefault(agent, {}).update({section: int(tokens) for section, tokens in sections.items()})
+    return budgets
+
+def count_tokens(text: str) -> int:
+    """Approximate token count (~4 characters per token for English text)"""
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Keep the head and tail of text within max_tokens, marking what was cut"""
+    text = text or ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    keep_chars = max_tokens * CHARS_PER_TOKEN
+    head = text[: keep_chars * 3 // 4]
+    tail = text[-(keep_chars // 4):] if keep_chars >= 4 else ""
+    omitted = count_tokens(text) - count_tokens(head) - count_tokens(tail)
+    return f"{head}\n[... ~{omitted} tokens omitted ...]\n{tail}"
+
+def summarize_handoff_logs(logs: List[Dict[str, Any]], max_recent: int = 4) -> str:
+    """Fixed-size summary of handoff logs: totals per hop plus the most recent hops"""
+    if not logs:
+        return "No handoffs recorded"
+    hops = Counter(f"{log.get('from', '?')}→{log.get('to', '?')}" for log in logs)
+    iterations = hops.get("system→iteration_handler", 0)
+    lines = [f"{len(logs)} handoffs, {iterations} iteration(s): " + ", ".join(f"{hop} x{n}" for hop, n in hops.items())]
+    for log in logs[-max_recent:]:
+        details = [f"{log.get('from', '?')}→{log.get('to', '?')}", log.get("status", "")]
+        if "quality_score" in log:
+            details.append(f"quality {log['quality_score']}")
+        if "validation" in log:
+            details.append(f"validation {log['validation']}")
+        lines.append("- " + ", ".join(str(d) for d in details if d != ""))
+    return "\n".join(lines)
+
+# ==============================================
+# CONTEXT BUDGETER
+# ==============================================
+class ContextBudgeter:
+    """Fits prompt sections into per-agent token budgets and records the tokens saved"""
+
+    def __init__(self, budgets: Optional[Dict[str, Dict[str, int]]] = None,
+                 metrics: Optional[MetricsRegistry] = None):
+        self.budgets = budgets or load_budgets()
+        self.metrics = metrics
+
+    def budget(self, agent: str, section: str) -> Optional[int]:
+        return self.budgets.get(agent, {}).get(section)
+
+    def fit(self, agent: str, section: str, text: str) -> str:
+        """Truncate one prompt section to the agent's budget (unbudgeted sections pass through)"""
+        text = text or ""
+        max_tokens = self.budget(agent, section)
+        fitted = text if max_tokens is None else truncate_to_tokens(text, max_tokens)
+        if self.metrics:
+            self.metrics.record_context(agent, count_tokens(text), count_tokens(fitted))
+        return fitted
+
+    def fit_handoff_logs(self, agent: str, logs: List[Dict[str, Any]], full_text: str) -> str:
+        """Replace the full handoff log dump with a bounded summary"""
+        max_tokens = self.budget(agent, "handoff")
+        if max_tokens is None:
+            return full_text
+        fitted = truncate_to_tokens(summarize_handoff_logs(logs), max_tokens)
+        if self.metrics:
+            self.metrics.record_context(agent, count_tokens(full_text), count_tokens(fitted))
+        return fitted
+
+    def record_prompt(self, agent: str, prompt: str):
+        if self.metrics:
+            self.metrics.record_prompt_size(agent, count_tokens(prompt))
@@ -0,0 +1,117 @@
+"""Per-session conversation memory for multi-turn chats.
+
+Each chat session keeps a rolling summary plus its most recent turns in the
+database. When turns fall out of the recent window they are folded into the
+summary, so the context handed to the agents stays within a fixed token budget
+however long the conversation gets.
+"""
+# ==============================================
+# IMPORT
+# ==============================================
+import logging
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Callable, List, Optional
+
+from context_budget import CHARS_PER_TOKEN, count_tokens, truncate_to_tokens
+from metrics import MetricsRegistry
+from storage import UserRepository
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+MEMORY_RECENT_TURNS = int(os.getenv("MEMORY_RECENT_TURNS", 4))
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", 1200))
+MEMORY_SUMMARY_TOKENS = 400
+MEMORY_TURN_RESPONSE_TOKENS = 300
+MEMORY_SUMMARY_WORKERS = 2
+
+logger = logging.getLogger(__name__)
+
+# (previous summary, turns to fold in) -> new summary
+Summarizer = Callable[[str, List[Dict[str, Any]]], str]
+
+# ==============================================
+# HELPERS
+# ==============================================
+def format_turns(turns: List[Dict[str, Any]], response_tokens: int = MEMORY_TURN_RESPONSE_TOKENS) -> str:
+    """Turns as a User/Assistant transcript, with long answers shortened"""
+    return "\n".join(
+        f"User: {turn['request']}\nAssistant: {truncate_to_tokens(turn['response'], response_tokens)}"
+        for turn in turns
+    )
+
+def extractive_summary(summary: str, turns: List[Dict[str, Any]]) -> str:
+    """Summarizer that needs no LLM: appends shortened turns and keeps the most recent part"""
+    text = "\n".join(filter(None, [summary, format_turns(turns, response_tokens=60)]))
+    max_chars = MEMORY_SUMMARY_TOKENS * CHARS_PER_TOKEN
+    return text if len(text) <= max_chars else "..." + text[-max_chars:]
+
+# ==============================================
+# CONVERSATION MEMORY
+# ==============================================
+class ConversationMemory:
+    """Rolling summary + recent turns per session, stored in the UserRepository database"""
+
+    def __init__(self, repository: UserRepository, recent_turns: int = MEMORY_RECENT_TURNS,
+                 token_budget: int = MEMORY_TOKEN_BUDGET, metrics: Optional[MetricsRegistry] = None):
+        self.repository = repository
+        self.recent_turns = recent_turns
+        self.token_budget = token_budget
+        self.metrics = metrics
+        # Summaries are folded off the job thread so a finished answer is never held up by a summarizer call
+        self.executor = ThreadPoolExecutor(max_workers=MEMORY_SUMMARY_WORKERS, thread_name_prefix="conversation-summary")
+
+    def context(self, username: str, session_id: str) -> str:
+        """Prompt text describing the conversation so far ("" for a new session)"""
+        summary, _, turns = self.repository.get_conversation(username, session_id)
+        turns = turns[-self.recent_turns:]
+        full_text = self.render(summary, turns)
+
+        # Over budget: drop the oldest recent turns first, then shorten what is left
+        text = full_text
+        while turns and count_tokens(text) > self.token_budget:
+            turns = turns[1:]
+            text = self.render(summary, turns)
+        text = truncate_to_tokens(text, self.token_budget)
+        if self.metrics and full_text:
+            self.metrics.record_context("memory", count_tokens(full_text), count_tokens(text))
+        return text
+
+    def render(self, summary: str, turns: List[Dict[str, Any]]) -> str:
+        sections = []
+        if summary:
+            sections.append(f"Summary of earlier conversation:\n{summary}")
+        if turns:
+            sections.append(f"Recent turns:\n{format_turns(turns)}")
+        return "\n\n".join(sections)
+
+    def record_turn(self, username: str, session_id: str, request: str, response: str,
+                    summarizer: Optional[Summarizer] = None) -> Future:
+        """Store a finished turn now; turns beyond the recent window are folded into the summary in the background"""
+        self.repository.add_conversation_turn(username, session_id, request, response, datetime.now().isoformat())
+        future = self.executor.submit(self.fold_overflow, username, session_id, summarizer)
+        future.add_done_callback(self.log_fold_error)
+        return future
+
+    @staticmethod
+    def log_fold_error(future: Future):
+        if future.exception() is not None:
+            logger.warning("Conversation summary update failed: %s", future.exception())
+
+    def fold_overflow(self, username: str, session_id: str, summarizer: Optional[Summarizer] = None):
+        """Fold turns beyond the recent window into the session's rolling summary"""
+        summary, summarized_turns, turns = self.repository.get_conversation(username, session_id)
+        overflow = turns[:-self.recent_turns] if len(turns) > self.recent_turns else []
+        if not overflow:
+            return
+
+        try:
+            new_summary = (summarizer or extractive_summary)(summary, overflow)
+        except Exception:
+            # A failed summary call must not lose the turn; fall back to the extractive summary
+            new_summary = extractive_summary(summary, overflow)
+        new_summary = truncate_to_tokens(new_summary, MEMORY_SUMMARY_TOKENS)
+        # A concurrent turn in the same session may have summarized first; its summary wins
+        self.repository.update_conversation_summary(session_id, new_summary, overflow[-1]["turn"], summarized_turns)
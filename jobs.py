@@ -0,0 +1,255 @@
+"""Background execution of agent workflows.
+
+The Streamlit script thread only submits jobs and polls their progress, so a
+rerun or closed tab no longer kills a running workflow. A fixed-size worker
+pool bounds how many workflows run at once across all sessions; extra jobs
+wait in the pool's in-memory queue.
+
+Submissions with the same coalesce key (normalized request text plus whatever
+else determines the result) are single-flighted: while one is queued or
+running, later ones attach to it as followers that mirror its progress and
+receive its result, so N identical concurrent workflows run the graph once.
+"""
+# ==============================================
+# IMPORT
+# ==============================================
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+MAX_CONCURRENT_JOBS = int(os.getenv("AGENT_MAX_CONCURRENT_JOBS", 4))
+MAX_JOBS_PER_USER = int(os.getenv("AGENT_MAX_JOBS_PER_USER", 3))
+PARTIAL_OUTPUT_CHARS = 4000
+# Finished jobs are normally dismissed by the polling session; this drops those of closed tabs
+FINISHED_JOB_TTL_SECONDS = float(os.getenv("AGENT_FINISHED_JOB_TTL_SECONDS", 3600))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+def coalesce_key(request: str, *scope: Any) -> str:
+    """Single-flight key: the request with case and whitespace normalized, plus the scope that shapes its result"""
+    normalized = " ".join(request.lower().split())
+    return hashlib.sha256(json.dumps([normalized, *scope], default=str).encode("utf-8")).hexdigest()
+
+# ==============================================
+# JOB
+# ==============================================
+class Job:
+    """One submitted workflow and its live progress, updated from the worker thread"""
+
+    def __init__(self, job_id: str, username: str, request: str, metadata: Optional[Dict[str, Any]] = None):
+        self._lock = threading.Lock()
+        self.job_id = job_id
+        self.username = username
+        self.request = request
+        self.metadata = metadata or {}
+        self.status = QUEUED
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.current_agent = ""
+        self.workflow_status = "Queued"
+        self.completed_agents: List[str] = []
+        self.partial_output = ""
+        self.result: Optional[Dict[str, Any]] = None
+        # Job whose run this one shares, when coalesced
+        self.leader_id: Optional[str] = None
+
+    def handle_event(self, event: Dict[str, Any]):
+        """Apply a workflow stream event (token / state / result) or a status change to the job's progress"""
+        with self._lock:
+            if event["type"] == "token":
+                if event["agent"] != self.current_agent:
+                    self.current_agent = event["agent"]
+                    self.partial_output = ""
+                self.partial_output = (self.partial_output + event["content"])[-PARTIAL_OUTPUT_CHARS:]
+            elif event["type"] == "state":
+                state = event["state"]
+                self.workflow_status = state.get("workflow_status", self.workflow_status)
+                self.completed_agents = list(state.get("agent_outputs", {}))
+            elif event["type"] == "result":
+                self.result = event["state"]
+        if event["type"] == "status":
+            self.set_status(event["status"])
+
+    def attach_to(self, leader: "Job"):
+        """Start a coalesced job from the progress its leader has made so far"""
+        progress = leader.snapshot()
+        with self._lock:
+            self.leader_id = leader.job_id
+            self.status = progress["status"]
+            self.started_at = progress["started_at"]
+            self.current_agent = progress["current_agent"]
+            self.workflow_status = progress["workflow_status"]
+            self.completed_agents = progress["completed_agents"]
+            self.partial_output = progress["partial_output"]
+
+    def set_status(self, status: str):
+        with self._lock:
+            self.status = status
+            if status == RUNNING:
+                self.started_at = time.time()
+                self.workflow_status = "Starting workflow..."
+            elif status in (DONE, FAILED):
+                self.finished_at = time.time()
+                self.partial_output = ""
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Consistent copy of the job's fields for rendering"""
+        with self._lock:
+            return {
+                "job_id": self.job_id,
+                "request": self.request,
+                "metadata": dict(self.metadata),
+                "status": self.status,
+                "submitted_at": self.submitted_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "current_agent": self.current_agent,
+                "workflow_status": self.workflow_status,
+                "completed_agents": list(self.completed_agents),
+                "partial_output": self.partial_output,
+                "result": self.result,
+                "leader_id": self.leader_id
+            }
+
+# ==============================================
+# JOB MANAGER
+# ==============================================
+class JobManager:
+    """Process-wide worker pool running agent workflows for every session"""
+
+    def __init__(self, max_workers: int = MAX_CONCURRENT_JOBS, max_jobs_per_user: int = MAX_JOBS_PER_USER,
+                 finished_ttl: float = FINISHED_JOB_TTL_SECONDS):
+        self.max_workers = max_workers
+        self.max_jobs_per_user = max_jobs_per_user
+        self.finished_ttl = finished_ttl
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent-job")
+        self._lock = threading.Lock()
+        self.jobs: Dict[str, Job] = {}
+        # coalesce key -> leader job, and leader job id -> (follower, on_finish) pairs
+        self.leaders: Dict[str, Job] = {}
+        self.followers: Dict[str, List[Tuple[Job, Optional[Callable[[Job], None]]]]] = {}
+        self.coalesced = 0
+
+    def submit(self, username: str, job_id: str, request: str,
+               run_fn: Callable[[Callable[[Dict[str, Any]], None]], Dict[str, Any]],
+               on_finish: Optional[Callable[[Job], None]] = None,
+               metadata: Optional[Dict[str, Any]] = None, coalesce_key: Optional[str] = None) -> Optional[Job]:
+        """Queue run_fn(emit) on the worker pool; None if the user already has too many jobs in flight.
+
+        on_finish runs on the worker thread after the result is in, e.g. to
+        persist it even if no session is polling any more. If coalesce_key
+        matches a queued or running job, run_fn is not run: the new job follows
+        that one and gets its result (on_finish still runs for it).
+        """
+        with self._lock:
+            self._purge_finished_locked()
+            if self._in_flight_locked(username) >= self.max_jobs_per_user:
+                return None
+            job = Job(job_id, username, request, metadata)
+            self.jobs[job_id] = job
+            leader = self.leaders.get(coalesce_key) if coalesce_key else None
+            if leader is not None:
+                job.attach_to(leader)
+                self.followers[leader.job_id].append((job, on_finish))
+                self.coalesced += 1
+                return job
+            if coalesce_key:
+                self.leaders[coalesce_key] = job
+                self.followers[job_id] = []
+        self.executor.submit(self.run, job, run_fn, on_finish, coalesce_key)
+        return job
+
+    def emit(self, job: Job, event: Dict[str, Any]):
+        """Apply a progress event to a job and its followers"""
+        # Under the manager lock so a follower attaching concurrently sees each event exactly once
+        with self._lock:
+            job.handle_event(event)
+            followers = [follower for follower, _ in self.followers.get(job.job_id, ())]
+        for follower in followers:
+            follower.handle_event(event)
+
+    def run(self, job: Job, run_fn, on_finish, coalesce_key: Optional[str] = None):
+        self.emit(job, {"type": "status", "status": RUNNING})
+        status = DONE
+        try:
+            job.handle_event({"type": "result", "state": run_fn(lambda event: self.emit(job, event))})
+            if on_finish:
+                on_finish(job)
+        except Exception as e:
+            if job.result is None:
+                job.handle_event({"type": "result", "state": {
+                    "final_output": f"Job error: {str(e)}",
+                    "workflow_status": "Error occurred",
+                    "agent_outputs": {"error": str(e)}
+                }})
+            status = FAILED
+
+        # From here on an identical submission starts a fresh run
+        with self._lock:
+            if coalesce_key and self.leaders.get(coalesce_key) is job:
+                del self.leaders[coalesce_key]
+            followers = self.followers.pop(job.job_id, [])
+        for follower, follower_finish in followers:
+            self.finish_follower(follower, follower_finish, job.result, status)
+        job.set_status(status)
+
+    def finish_follower(self, follower: Job, on_finish, result: Dict[str, Any], status: str):
+        follower.handle_event({"type": "result", "state": dict(result)})
+        try:
+            if on_finish:
+                on_finish(follower)
+        except Exception:
+            status = FAILED
+        follower.set_status(status)
+
+    def in_flight(self, username: str) -> int:
+        with self._lock:
+            return self._in_flight_locked(username)
+
+    def _in_flight_locked(self, username: str) -> int:
+        return sum(1 for job in self.jobs.values() if job.username == username and job.status in (QUEUED, RUNNING))
+
+    def user_jobs(self, username: str) -> List[Dict[str, Any]]:
+        """Snapshots of a user's jobs, oldest first"""
+        with self._lock:
+            jobs = [job for job in self.jobs.values() if job.username == username]
+        return sorted((job.snapshot() for job in jobs), key=lambda job: job["submitted_at"])
+
+    def dismiss(self, username: str, job_id: str) -> bool:
+        """Forget a finished job once its result has been shown"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.username != username or job.status in (QUEUED, RUNNING):
+                return False
+            del self.jobs[job_id]
+            return True
+
+    def _purge_finished_locked(self):
+        """Forget finished jobs nobody dismissed within finished_ttl (their results are already persisted)"""
+        cutoff = time.time() - self.finished_ttl
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.status in (DONE, FAILED) and job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._purge_finished_locked()
+            statuses = [job.status for job in self.jobs.values()]
+        return {
+            "workers": self.max_workers,
+            "queued": statuses.count(QUEUED),
+            "running": statuses.count(RUNNING),
+            "finished": statuses.count(DONE) + statuses.count(FAILED),
+            "coalesced": self.coalesced
+        }
@@ -0,0 +1,179 @@
+# ==============================================
+# IMPORT
+# ==============================================
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from typing import Dict, Any, List, Optional, Callable
+
+from storage import connect_sqlite
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+CACHE_FILE = "llm_cache.db"
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_SIMILARITY_THRESHOLD = 0.92
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    cache_key TEXT PRIMARY KEY,
+    context_key TEXT NOT NULL,
+    role TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    response TEXT NOT NULL,
+    embedding TEXT,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_llm_cache_context ON llm_cache(context_key);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache(last_access);
+"""
+
+# ==============================================
+# PROMPT NORMALIZATION & EMBEDDING
+# ==============================================
+def normalize_text(text: str) -> str:
+    """Lowercase and collapse whitespace so trivial variations share a key"""
+    return " ".join(str(text).lower().split())
+
+def hashing_embedding(text: str, dims: int = 256) -> List[float]:
+    """Cheap local embedding: hashed unigrams and bigrams, L2-normalized"""
+    tokens = re.findall(r"[a-z0-9]+", text.lower())
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    vector = [0.0] * dims
+    for feature in features:
+        digest = hashlib.md5(feature.encode()).digest()
+        index = int.from_bytes(digest[:4], "little") % dims
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+def cosine_similarity(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+# ==============================================
+# RESPONSE CACHE
+# ==============================================
+class ResponseCache:
+    """Disk-backed cache of agent LLM responses.
+
+    Entries are keyed on (agent role, model, temperature, normalized prompt).
+    The exact tier is a hash lookup; the optional semantic tier compares an
+    embedding of the final user message against entries that share the same
+    role, model, temperature and preceding messages.
+    """
+
+    def __init__(self, db_path: str = CACHE_FILE, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, semantic: bool = False,
+                 embed_fn: Optional[Callable[[str], List[float]]] = None,
+                 similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.semantic = semantic
+        self.embed_fn = embed_fn or hashing_embedding
+        self.similarity_threshold = similarity_threshold
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self.conn.executescript(SCHEMA)
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect_sqlite(self.db_path)
+            self._local.conn = conn
+        return conn
+
+    # ---------- keys ----------
+    def make_keys(self, role: str, model: str, temperature: float, messages: List[Any]):
+        """Return (cache_key, context_key, normalized user prompt)"""
+        parts = [f"{getattr(m, 'type', 'message')}: {normalize_text(getattr(m, 'content', m))}" for m in messages]
+        header = json.dumps([role, model, round(float(temperature or 0.0), 3)])
+        prompt = parts[-1] if parts else ""
+        cache_key = hashlib.sha256("\n".join([header] + parts).encode()).hexdigest()
+        context_key = hashlib.sha256("\n".join([header] + parts[:-1]).encode()).hexdigest()
+        return cache_key, context_key, prompt
+
+    def record(self, role: str, outcome: str):
+        with self._stats_lock:
+            role_stats = self.stats.setdefault(role, {"exact_hits": 0, "semantic_hits": 0, "misses": 0})
+            role_stats[outcome] += 1
+
+    # ---------- lookups ----------
+    def get(self, role: str, model: str, temperature: float, messages: List[Any]) -> Optional[str]:
+        """Return a cached response, or None on a miss"""
+        cache_key, context_key, prompt = self.make_keys(role, model, temperature, messages)
+        now = time.time()
+        expires_before = now - self.ttl_seconds
+
+        row = self.conn.execute(
+            "SELECT response, created_at FROM llm_cache WHERE cache_key = ?", (cache_key,)
+        ).fetchone()
+        if row and row["created_at"] >= expires_before:
+            self.conn.execute("UPDATE llm_cache SET last_access = ? WHERE cache_key = ?", (now, cache_key))
+            self.record(role, "exact_hits")
+            return row["response"]
+
+        if self.semantic:
+            query = self.embed_fn(prompt)
+            best_key, best_response, best_score = None, None, self.similarity_threshold
+            for candidate in self.conn.execute(
+                "SELECT cache_key, response, embedding FROM llm_cache "
+                "WHERE context_key = ? AND embedding IS NOT NULL AND created_at >= ?",
+                (context_key, expires_before)
+            ):
+                score = cosine_similarity(query, json.loads(candidate["embedding"]))
+                if score >= best_score:
+                    best_key, best_response, best_score = candidate["cache_key"], candidate["response"], score
+            if best_key:
+                self.conn.execute("UPDATE llm_cache SET last_access = ? WHERE cache_key = ?", (now, best_key))
+                self.record(role, "semantic_hits")
+                return best_response
+
+        self.record(role, "misses")
+        return None
+
+    def put(self, role: str, model: str, temperature: float, messages: List[Any], response: str):
+        """Store a response, then drop expired and least recently used entries"""
+        if not response:
+            return
+        cache_key, context_key, prompt = self.make_keys(role, model, temperature, messages)
+        embedding = json.dumps(self.embed_fn(prompt)) if self.semantic else None
+        now = time.time()
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO llm_cache "
+            "(cache_key, context_key, role, prompt, response, embedding, created_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (cache_key, context_key, role, prompt, response, embedding, now, now)
+        )
+        self.evict(now)
+
+    def evict(self, now: Optional[float] = None):
+        now = now or time.time()
+        self.conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        overflow = self.conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            self.conn.execute(
+                "DELETE FROM llm_cache WHERE cache_key IN "
+                "(SELECT cache_key FROM llm_cache ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+
+    def clear(self):
+        self.conn.execute("DELETE FROM llm_cache")
+        with self._stats_lock:
+            self.stats = {}
+
+    def size(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
@@ -0,0 +1,305 @@
+"""Per-role pools of chat model backends.
+
+A ModelPool sends each call to the healthy backend with the lowest recent
+latency, starts a hedged request on the next-best backend when the first one
+has not answered (or, when streaming, sent its first chunk) within the hedge
+deadline, and fails over to the next backend on errors. Backends that keep failing are skipped for a cool-down.
+
+Backends are configured in a JSON file (LLM_BACKENDS_FILE) that maps agent
+roles, or "default", to an ordered list of backends:
+
+    {
+      "default": [
+        {"provider": "groq", "model": "llama3-70b-8192"},
+        {"name": "local", "provider": "openai", "model": "llama3",
+         "base_url": "http://localhost:8000/v1", "api_key": "none"}
+      ],
+      "router": [{"provider": "groq", "model": "llama3-8b-8192"}]
+    }
+
+Providers are "groq", "openai" (any OpenAI-compatible server via base_url)
+and "anthropic"; keys come from "api_key" or the env var named in "api_key_env".
+"""
+# ==============================================
+# IMPORT
+# ==============================================
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, Iterator, List, Optional
+
+from langchain_groq import ChatGroq
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+LLM_BACKENDS_FILE = os.getenv("LLM_BACKENDS_FILE")
+LLM_HEDGE_AFTER_SECONDS = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", 10))
+LLM_FAILURE_THRESHOLD = int(os.getenv("LLM_FAILURE_THRESHOLD", 3))
+LLM_COOLDOWN_SECONDS = float(os.getenv("LLM_COOLDOWN_SECONDS", 30))
+LATENCY_EWMA_ALPHA = 0.3
+
+DEFAULT_BACKENDS: List[Dict[str, Any]] = [{"provider": "groq", "model": "llama3-70b-8192"}]
+DEFAULT_API_KEY_ENV = {"groq": "GROQ_API_KEY", "openai": "OPENAI_API_KEY", "anthropic": "ANTHROPIC_API_KEY"}
+
+# ==============================================
+# BACKEND CONFIGURATION
+# ==============================================
+def load_backend_specs(path: Optional[str] = LLM_BACKENDS_FILE) -> Dict[str, List[Dict[str, Any]]]:
+    """Backend lists per role from the JSON config (just the default Groq model without one)"""
+    if not path:
+        return {"default": DEFAULT_BACKENDS}
+    with open(path, "r") as f:
+        specs = json.load(f)
+    specs.setdefault("default", DEFAULT_BACKENDS)
+    return specs
+
+def backend_name(spec: Dict[str, Any]) -> str:
+    return spec.get("name") or f"{spec.get('provider', 'groq')}:{spec['model']}"
+
+def build_chat_model(spec: Dict[str, Any], temperature: float, groq_api_key: Optional[str] = None,
+                     http_client: Any = None):
+    """LangChain chat model for one backend spec"""
+    provider = spec.get("provider", "groq")
+    api_key = spec.get("api_key") or os.getenv(spec.get("api_key_env", DEFAULT_API_KEY_ENV.get(provider, "")))
+    temperature = spec.get("temperature", temperature)
+
+    if provider == "groq":
+        return ChatGroq(groq_api_key=api_key or groq_api_key, model_name=spec["model"],
+                        temperature=temperature, http_client=http_client)
+    if provider == "openai":
+        from langchain_openai import ChatOpenAI
+        # The pool fails over itself, so the client does not retry by default
+        return ChatOpenAI(api_key=api_key or "none", model=spec["model"], base_url=spec.get("base_url"),
+                          temperature=temperature, timeout=spec.get("timeout"), max_retries=spec.get("max_retries", 0))
+    if provider == "anthropic":
+        from langchain_anthropic import ChatAnthropic
+        return ChatAnthropic(api_key=api_key, model=spec["model"], temperature=temperature,
+                             max_retries=spec.get("max_retries", 0))
+    raise ValueError(f"Unknown LLM provider: {provider}")
+
+# ==============================================
+# BACKEND HEALTH
+# ==============================================
+class Backend:
+    """One chat model plus its latency estimate and health"""
+
+    def __init__(self, name: str, llm: Any):
+        self.name = name
+        self.llm = llm
+        self._lock = threading.Lock()
+        self.latency_ewma: Optional[float] = None
+        self.calls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+
+    def healthy(self) -> bool:
+        return time.time() >= self.unhealthy_until
+
+    def record_success(self, latency_seconds: float):
+        with self._lock:
+            self.calls += 1
+            self.consecutive_failures = 0
+            self.unhealthy_until = 0.0
+            if self.latency_ewma is None:
+                self.latency_ewma = latency_seconds
+            else:
+                self.latency_ewma += LATENCY_EWMA_ALPHA * (latency_seconds - self.latency_ewma)
+
+    def record_failure(self):
+        with self._lock:
+            self.calls += 1
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= LLM_FAILURE_THRESHOLD:
+                self.unhealthy_until = time.time() + LLM_COOLDOWN_SECONDS
+
+# ==============================================
+# MODEL POOL
+# ==============================================
+class ModelPool:
+    """Drop-in replacement for a single chat model (invoke/stream) backed by several backends"""
+
+    def __init__(self, role: str, backends: List[Backend], hedge_after_seconds: float = LLM_HEDGE_AFTER_SECONDS):
+        if not backends:
+            raise ValueError(f"No LLM backends configured for {role}")
+        self.role = role
+        self.backends = backends
+        self.hedge_after_seconds = hedge_after_seconds
+        # Identifies the pool's models in response cache keys
+        self.model_name = "|".join(getattr(backend.llm, "model_name", None) or backend.name for backend in backends)
+        self.temperature = getattr(backends[0].llm, "temperature", 0.0)
+        self._lock = threading.Lock()
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix=f"llm-{role}")
+
+    @classmethod
+    def from_specs(cls, role: str, specs: List[Dict[str, Any]], temperature: float,
+                   groq_api_key: Optional[str] = None, http_client: Any = None, **kwargs) -> "ModelPool":
+        backends = [Backend(backend_name(spec), build_chat_model(spec, temperature, groq_api_key, http_client)) for spec in specs]
+        return cls(role, backends, **kwargs)
+
+    def ranked(self) -> List[Backend]:
+        """Healthy backends fastest first (untried ones first, in config order); failing and unhealthy ones last"""
+        order = {id(backend): i for i, backend in enumerate(self.backends)}
+        return sorted(self.backends, key=lambda b: (
+            not b.healthy(), b.consecutive_failures > 0, b.latency_ewma or 0.0, order[id(b)]
+        ))
+
+    def call(self, backend: Backend, messages: List[Any], **kwargs):
+        start = time.perf_counter()
+        try:
+            response = backend.llm.invoke(messages, **kwargs)
+        except Exception:
+            backend.record_failure()
+            raise
+        backend.record_success(time.perf_counter() - start)
+        return response
+
+    def invoke(self, messages: List[Any], *args, **kwargs):
+        """First successful response; hedges once after the deadline and fails over on errors"""
+        candidates = self.ranked()
+        if len(candidates) == 1:
+            return self.call(candidates[0], messages, **kwargs)
+
+        pending: Dict[Any, Backend] = {}
+        next_index = 0
+        hedged = False
+        last_error: Optional[Exception] = None
+
+        def launch():
+            nonlocal next_index
+            backend = candidates[next_index]
+            next_index += 1
+            pending[self.executor.submit(contextvars.copy_context().run, self.call, backend, messages, **kwargs)] = backend
+
+        launch()
+        while pending:
+            can_hedge = not hedged and next_index < len(candidates)
+            done, _ = wait(pending, timeout=self.hedge_after_seconds if can_hedge else None, return_when=FIRST_COMPLETED)
+            if not done:
+                # The first backend is slow: race it against the next-best one
+                hedged = True
+                with self._lock:
+                    self.hedges += 1
+                launch()
+                continue
+            for future in done:
+                backend = pending.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    last_error = e
+                    if next_index < len(candidates):
+                        launch()
+                    continue
+                if hedged and backend is not candidates[0]:
+                    with self._lock:
+                        self.hedge_wins += 1
+                return response
+        raise last_error
+
+    def stream_backend(self, backend: Backend, messages: List[Any], events: queue.Queue,
+                       cancelled: threading.Event, **kwargs):
+        """Producer for stream(): puts (backend, "chunk" | "done" | "error", payload) until finished or cancelled"""
+        start = time.perf_counter()
+        try:
+            for chunk in backend.llm.stream(messages, **kwargs):
+                if cancelled.is_set():
+                    return
+                events.put((backend, "chunk", chunk))
+        except Exception as e:
+            backend.record_failure()
+            events.put((backend, "error", e))
+            return
+        if not cancelled.is_set():
+            backend.record_success(time.perf_counter() - start)
+        events.put((backend, "done", None))
+
+    def stream(self, messages: List[Any], *args, **kwargs) -> Iterator[Any]:
+        """Stream from the first backend to send a chunk.
+
+        If the best backend sends nothing within the hedge deadline, the
+        next-best one is started too and the slower stream is abandoned once
+        either yields. Errors fail over only until the first chunk.
+        """
+        candidates = self.ranked()
+        events: queue.Queue = queue.Queue()
+        cancel: Dict[Backend, threading.Event] = {}
+        running = set()
+        next_index = 0
+        hedged = False
+        winner: Optional[Backend] = None
+        last_error: Optional[Exception] = None
+
+        def launch():
+            nonlocal next_index
+            backend = candidates[next_index]
+            next_index += 1
+            cancel[backend] = threading.Event()
+            running.add(backend)
+            self.executor.submit(contextvars.copy_context().run, self.stream_backend,
+                                 backend, messages, events, cancel[backend], **kwargs)
+
+        launch()
+        try:
+            while True:
+                can_hedge = winner is None and not hedged and next_index < len(candidates)
+                try:
+                    backend, kind, payload = events.get(timeout=self.hedge_after_seconds if can_hedge else None)
+                except queue.Empty:
+                    # No first chunk yet: race the next-best backend
+                    hedged = True
+                    with self._lock:
+                        self.hedges += 1
+                    launch()
+                    continue
+                if winner is not None and backend is not winner:
+                    continue
+                if kind == "error":
+                    if winner is not None:
+                        raise payload
+                    running.discard(backend)
+                    last_error = payload
+                    if next_index < len(candidates):
+                        launch()
+                    elif not running:
+                        raise last_error
+                    continue
+                if winner is None:
+                    winner = backend
+                    for other, event in cancel.items():
+                        if other is not winner:
+                            event.set()
+                    if hedged and winner is not candidates[0]:
+                        with self._lock:
+                            self.hedge_wins += 1
+                if kind == "done":
+                    return
+                yield payload
+        finally:
+            # Consumer finished or stopped early: stop every producer still streaming
+            for event in cancel.values():
+                event.set()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """One row per backend for display"""
+        return [
+            {
+                "role": self.role,
+                "backend": backend.name,
+                "healthy": backend.healthy(),
+                "latency_ms": round(backend.latency_ewma * 1000) if backend.latency_ewma is not None else None,
+                "calls": backend.calls,
+                "failures": backend.failures,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins
+            }
+            for backend in self.backends
+        ]
@@ -0,0 +1,387 @@
+# ==============================================
+# IMPORT
+# ==============================================
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120]
+SAMPLE_WINDOW = 1000
+EXPORT_INTERVAL_SECONDS = 10
+SESSION_MEMORY_TTL_SECONDS = 3600  # sessions not seen for this long drop out of the report
+
+logger = logging.getLogger(__name__)
+
+# ==============================================
+# HELPERS
+# ==============================================
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def token_usage(response: Any) -> Tuple[int, int]:
+    """(prompt tokens, completion tokens) from a LangChain message's metadata"""
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage:
+        return int(usage.get("input_tokens", 0)), int(usage.get("output_tokens", 0))
+    groq_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    return int(groq_usage.get("prompt_tokens", 0)), int(groq_usage.get("completion_tokens", 0))
+
+def approximate_size(value: Any, seen: Optional[set] = None) -> int:
+    """Bytes held by plain data (dicts, lists, strings, numbers); other objects count as 0"""
+    if seen is None:
+        seen = set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, (str, bytes, int, float, bool)) or value is None:
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(approximate_size(k, seen) + approximate_size(v, seen) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, deque)):
+        return sys.getsizeof(value) + sum(approximate_size(item, seen) for item in value)
+    return 0
+
+class CallStats:
+    """LLM usage accumulated while a single agent node runs"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.retries = 0
+        self.cache_hits = 0
+
+    def add(self, llm_calls: int = 0, prompt_tokens: int = 0, completion_tokens: int = 0,
+            retries: int = 0, cache_hits: int = 0):
+        with self._lock:
+            self.llm_calls += llm_calls
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.retries += retries
+            self.cache_hits += cache_hits
+
+# ==============================================
+# METRICS REGISTRY
+# ==============================================
+class MetricsRegistry:
+    """Per-agent latency histograms and token/retry/cache counters.
+
+    Series are labelled by agent node and task type. Percentiles are computed
+    over a sliding window of recent samples; the Prometheus histogram buckets
+    are cumulative over the process lifetime.
+    """
+
+    def __init__(self, export_path: Optional[str] = None):
+        self.export_path = export_path
+        self._lock = threading.Lock()
+        self._last_export = 0.0
+        self.series: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.context: Dict[str, Dict[str, Any]] = {}
+        self.policies: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.structured: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self.speculation = {"hit": 0, "miss": 0, "seconds_saved": 0.0, "tokens_wasted": 0}
+        self.sessions: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, agent: str, task_type: str, latency_seconds: float, stats: CallStats):
+        key = (agent, task_type or "unknown")
+        with self._lock:
+            series = self.series.setdefault(key, {
+                "samples": deque(maxlen=SAMPLE_WINDOW),
+                "buckets": [0] * len(LATENCY_BUCKETS),
+                "count": 0,
+                "latency_sum": 0.0,
+                "llm_calls": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "retries": 0,
+                "cache_hits": 0
+            })
+            series["samples"].append(latency_seconds)
+            series["count"] += 1
+            series["latency_sum"] += latency_seconds
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if latency_seconds <= bound:
+                    series["buckets"][i] += 1
+            series["llm_calls"] += stats.llm_calls
+            series["prompt_tokens"] += stats.prompt_tokens
+            series["completion_tokens"] += stats.completion_tokens
+            series["retries"] += stats.retries
+            series["cache_hits"] += stats.cache_hits
+        self.maybe_export()
+
+    def context_stats(self, agent: str) -> Dict[str, Any]:
+        return self.context.setdefault(agent, {
+            "original_tokens": 0,
+            "budgeted_tokens": 0,
+            "prompt_tokens": deque(maxlen=SAMPLE_WINDOW)
+        })
+
+    def record_context(self, agent: str, original_tokens: int, budgeted_tokens: int):
+        """Tokens of a prompt section before and after context budgeting"""
+        with self._lock:
+            stats = self.context_stats(agent)
+            stats["original_tokens"] += original_tokens
+            stats["budgeted_tokens"] += budgeted_tokens
+
+    def record_prompt_size(self, agent: str, prompt_tokens: int):
+        with self._lock:
+            self.context_stats(agent)["prompt_tokens"].append(prompt_tokens)
+
+    def record_policy(self, policy: str, model: str, latency_seconds: float, prompt_tokens: int,
+                      completion_tokens: int, cost_usd: float):
+        """One LLM call made under a model tiering rule"""
+        with self._lock:
+            stats = self.policies.setdefault((policy, model), {
+                "samples": deque(maxlen=SAMPLE_WINDOW),
+                "calls": 0,
+                "latency_sum": 0.0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "cost_usd": 0.0
+            })
+            stats["samples"].append(latency_seconds)
+            stats["calls"] += 1
+            stats["latency_sum"] += latency_seconds
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+            stats["cost_usd"] += cost_usd
+
+    def policy_summary(self) -> List[Dict[str, Any]]:
+        """Per (tiering rule, model) call latency, tokens and estimated cost"""
+        with self._lock:
+            items = [(key, dict(stats, samples=list(stats["samples"]))) for key, stats in self.policies.items()]
+        return [
+            {
+                "policy": policy,
+                "model": model,
+                "calls": stats["calls"],
+                "mean_s": round(stats["latency_sum"] / stats["calls"], 3),
+                "p50_s": round(percentile(stats["samples"], 50), 3),
+                "p95_s": round(percentile(stats["samples"], 95), 3),
+                "prompt_tokens": stats["prompt_tokens"],
+                "completion_tokens": stats["completion_tokens"],
+                "cost_usd": round(stats["cost_usd"], 6)
+            }
+            for (policy, model), stats in sorted(items)
+        ]
+
+    def record_structured_output(self, agent: str, schema: str, outcome: str):
+        """outcome: "ok" (valid first time), "repaired" (valid after a retry) or "failed" (defaults used)"""
+        with self._lock:
+            counts = self.structured.setdefault((agent, schema), {"ok": 0, "repaired": 0, "failed": 0})
+            counts[outcome] += 1
+
+    def structured_output_summary(self) -> List[Dict[str, Any]]:
+        """Per (agent, schema) structured output validation outcomes"""
+        with self._lock:
+            items = [(key, dict(counts)) for key, counts in self.structured.items()]
+        return [
+            {"agent": agent, "schema": schema, **counts, "parse_failures": counts["repaired"] + counts["failed"]}
+            for (agent, schema), counts in sorted(items)
+        ]
+
+    def record_speculation(self, outcome: str, seconds_saved: float, tokens_wasted: int):
+        """outcome: "hit" (speculative research kept) or "miss" (cancelled or dropped)"""
+        with self._lock:
+            self.speculation[outcome] += 1
+            self.speculation["seconds_saved"] += seconds_saved
+            self.speculation["tokens_wasted"] += tokens_wasted
+
+    def speculation_summary(self) -> Dict[str, Any]:
+        """Speculative research hit rate, latency saved on hits and tokens spent on misses"""
+        with self._lock:
+            stats = dict(self.speculation)
+        total = stats["hit"] + stats["miss"]
+        return {
+            "hits": stats["hit"],
+            "misses": stats["miss"],
+            "hit_rate": round(stats["hit"] / total, 3) if total else 0.0,
+            "seconds_saved": round(stats["seconds_saved"], 3),
+            "tokens_wasted": stats["tokens_wasted"]
+        }
+
+    def record_session_memory(self, session_id: str, username: str, history_entries: int, full_entries: int,
+                              state_bytes: int):
+        """Approximate size of one browser session's state, refreshed on each of its reruns"""
+        now = time.time()
+        with self._lock:
+            self.sessions[session_id] = {
+                "username": username,
+                "history_entries": history_entries,
+                "full_entries": full_entries,
+                "state_bytes": state_bytes,
+                "updated_at": now
+            }
+            for stale in [key for key, stats in self.sessions.items() if now - stats["updated_at"] > SESSION_MEMORY_TTL_SECONDS]:
+                del self.sessions[stale]
+
+    def session_memory_summary(self) -> List[Dict[str, Any]]:
+        """Per-session state size, largest first"""
+        now = time.time()
+        with self._lock:
+            items = [(session_id, dict(stats)) for session_id, stats in self.sessions.items()]
+        return [
+            {
+                "session": session_id[:8],
+                "username": stats["username"],
+                "history_entries": stats["history_entries"],
+                "full_entries": stats["full_entries"],
+                "state_kb": round(stats["state_bytes"] / 1024, 1),
+                "seen_s_ago": round(now - stats["updated_at"])
+            }
+            for session_id, stats in sorted(items, key=lambda item: -item[1]["state_bytes"])
+        ]
+
+    def context_summary(self) -> List[Dict[str, Any]]:
+        """Per-agent prompt size and tokens saved by context budgeting"""
+        with self._lock:
+            items = [(agent, dict(stats, prompt_tokens=list(stats["prompt_tokens"]))) for agent, stats in self.context.items()]
+        return [
+            {
+                "agent": agent,
+                "prompt_tokens_p50": percentile(stats["prompt_tokens"], 50),
+                "prompt_tokens_p95": percentile(stats["prompt_tokens"], 95),
+                "tokens_before_budget": stats["original_tokens"],
+                "tokens_after_budget": stats["budgeted_tokens"],
+                "tokens_saved": stats["original_tokens"] - stats["budgeted_tokens"]
+            }
+            for agent, stats in sorted(items)
+        ]
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """One row per (agent, task type) for display"""
+        with self._lock:
+            items = [(key, dict(series, samples=list(series["samples"]))) for key, series in self.series.items()]
+        rows = []
+        for (agent, task_type), series in sorted(items):
+            rows.append({
+                "agent": agent,
+                "task_type": task_type,
+                "runs": series["count"],
+                "p50_s": round(percentile(series["samples"], 50), 3),
+                "p95_s": round(percentile(series["samples"], 95), 3),
+                "llm_calls": series["llm_calls"],
+                "prompt_tokens": series["prompt_tokens"],
+                "completion_tokens": series["completion_tokens"],
+                "retries": series["retries"],
+                "cache_hits": series["cache_hits"]
+            })
+        return rows
+
+    def render_prometheus(self) -> str:
+        """Metrics in the Prometheus text exposition format"""
+        with self._lock:
+            items = sorted((key, dict(series)) for key, series in self.series.items())
+        lines = [
+            "# HELP agent_node_latency_seconds Agent node execution time",
+            "# TYPE agent_node_latency_seconds histogram"
+        ]
+        for (agent, task_type), series in items:
+            labels = f'agent="{escape_label(agent)}",task_type="{escape_label(task_type)}"'
+            for bound, count in zip(LATENCY_BUCKETS, series["buckets"]):
+                lines.append(f'agent_node_latency_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'agent_node_latency_seconds_bucket{{{labels},le="+Inf"}} {series["count"]}')
+            lines.append(f"agent_node_latency_seconds_sum{{{labels}}} {series['latency_sum']:.6f}")
+            lines.append(f"agent_node_latency_seconds_count{{{labels}}} {series['count']}")
+
+        counters = [
+            ("agent_llm_calls_total", "llm_calls", "LLM requests made by agent nodes"),
+            ("agent_prompt_tokens_total", "prompt_tokens", "Prompt tokens sent"),
+            ("agent_completion_tokens_total", "completion_tokens", "Completion tokens received"),
+            ("agent_llm_retries_total", "retries", "LLM calls retried after rate limiting"),
+            ("agent_cache_hits_total", "cache_hits", "LLM calls served from the response cache")
+        ]
+        for name, field, help_text in counters:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for (agent, task_type), series in items:
+                lines.append(f'{name}{{agent="{escape_label(agent)}",task_type="{escape_label(task_type)}"}} {series[field]}')
+
+        lines.append("# HELP agent_context_tokens_saved_total Prompt tokens removed by context budgeting")
+        lines.append("# TYPE agent_context_tokens_saved_total counter")
+        for row in self.context_summary():
+            lines.append(f'agent_context_tokens_saved_total{{agent="{escape_label(row["agent"])}"}} {row["tokens_saved"]}')
+
+        policy_rows = self.policy_summary()
+        policy_counters = [
+            ("agent_policy_llm_calls_total", "calls", "LLM calls per model tiering rule"),
+            ("agent_policy_cost_usd_total", "cost_usd", "Estimated LLM cost in USD per model tiering rule")
+        ]
+        for name, field, help_text in policy_counters:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for row in policy_rows:
+                lines.append(f'{name}{{policy="{escape_label(row["policy"])}",model="{escape_label(row["model"])}"}} {row[field]}')
+
+        lines.append("# HELP agent_structured_output_total Structured output validation outcomes (ok/repaired/failed)")
+        lines.append("# TYPE agent_structured_output_total counter")
+        for row in self.structured_output_summary():
+            for outcome in ("ok", "repaired", "failed"):
+                lines.append(
+                    f'agent_structured_output_total{{agent="{escape_label(row["agent"])}",'
+                    f'schema="{escape_label(row["schema"])}",outcome="{outcome}"}} {row[outcome]}'
+                )
+
+        speculation = self.speculation_summary()
+        speculation_counters = [
+            ("agent_speculation_total", None, "Speculative research outcomes (hit/miss)"),
+            ("agent_speculation_seconds_saved_total", "seconds_saved", "Router latency overlapped by kept speculative research"),
+            ("agent_speculation_tokens_wasted_total", "tokens_wasted", "Tokens spent on discarded speculative research")
+        ]
+        for name, field, help_text in speculation_counters:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            if field is None:
+                lines.append(f'{name}{{outcome="hit"}} {speculation["hits"]}')
+                lines.append(f'{name}{{outcome="miss"}} {speculation["misses"]}')
+            else:
+                lines.append(f"{name} {speculation[field]}")
+
+        lines.append("# HELP agent_session_state_bytes Approximate Streamlit session state size")
+        lines.append("# TYPE agent_session_state_bytes gauge")
+        with self._lock:
+            sessions = sorted((session_id, stats["state_bytes"]) for session_id, stats in self.sessions.items())
+        for session_id, state_bytes in sessions:
+            lines.append(f'agent_session_state_bytes{{session="{escape_label(session_id[:8])}"}} {state_bytes}')
+        return "\n".join(lines) + "\n"
+
+    def maybe_export(self):
+        """Rewrite the textfile export at most every EXPORT_INTERVAL_SECONDS"""
+        if not self.export_path:
+            return
+        with self._lock:
+            if time.time() - self._last_export < EXPORT_INTERVAL_SECONDS:
+                return
+            self._last_export = time.time()
+        try:
+            self.write_prometheus(self.export_path)
+        except OSError as e:
+            # Called from agent nodes: a failed export must never fail the workflow
+            logger.warning("Metrics export to %s failed: %s", self.export_path, e)
+
+    def write_prometheus(self, path: str):
+        # Write a private temp file then rename, so scrapers never read a half-written file
+        # and concurrent exports never rename each other's file
+        with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(os.path.abspath(path)),
+                                         prefix=f".{os.path.basename(path)}.", suffix=".tmp", delete=False) as f:
+            f.write(self.render_prometheus())
+        try:
+            os.replace(f.name, path)
+        except OSError:
+            os.unlink(f.name)
+            raise
@@ -0,0 +1,208 @@
+"""Offline stand-in for ChatGroq, for benchmarks and local runs without an API key.
+
+    from mock_llm import mock_llm_factory, MockScript, lognormal_latency
+    system = MultiAgentSystem("", llm_factory=mock_llm_factory(
+        script=MockScript(task_type="complex", quality_scores=[40, 90]),
+        latency=lognormal_latency(0.3), tokens_per_second=500
+    ))
+"""
+# ==============================================
+# IMPORT
+# ==============================================
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+# ==============================================
+# LATENCY MODELS
+# ==============================================
+def fixed_latency(seconds: float) -> Callable[[], float]:
+    return lambda: seconds
+
+def normal_latency(mean: float, stddev: float) -> Callable[[], float]:
+    return lambda: max(0.0, random.gauss(mean, stddev))
+
+def lognormal_latency(median: float, sigma: float = 0.5) -> Callable[[], float]:
+    """Right-skewed latency, the usual shape of LLM time-to-first-token"""
+    return lambda: random.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+
+# ==============================================
+# SCRIPTED OUTPUTS
+# ==============================================
+class MockScript:
+    """Canned agent outputs, including the structured JSON the agents parse.
+
+    quality_scores and plan_validations are consumed one per call (the last
+    value repeats), so e.g. quality_scores=[40, 90] fails research validation
+    once and passes on the iteration.
+    """
+
+    def __init__(self, task_type: str = "complex", priority: str = "medium", complexity: str = "moderate",
+                 quality_scores: Optional[List[float]] = None, plan_validations: Optional[List[str]] = None,
+                 response_words: int = 150):
+        self.task_type = task_type
+        self.priority = priority
+        self.complexity = complexity
+        self.quality_scores = list(quality_scores or [85])
+        self.plan_validations = list(plan_validations or ["PASS"])
+        self.response_words = response_words
+        self._lock = threading.Lock()
+        self._calls = {"researcher": 0, "planner": 0}
+
+    def next_value(self, role: str, values: List[Any]) -> Any:
+        with self._lock:
+            index = self._calls[role]
+            self._calls[role] += 1
+        return values[min(index, len(values) - 1)]
+
+    def filler(self, topic: str) -> str:
+        words = itertools.islice(itertools.cycle(f"{topic} analysis covers key points and next steps".split()), self.response_words)
+        return " ".join(words)
+
+    def respond(self, role: str, messages: List[Any]) -> str:
+        system_prompt = str(getattr(messages[0], "content", "")) if messages else ""
+        if role == "router":
+            if '"priority"' in system_prompt:
+                return json.dumps({"task_type": self.task_type, "priority": self.priority,
+                                   "complexity": self.complexity, "reasoning": "scripted mock response"})
+            return json.dumps({"task_type": self.task_type})
+        if role == "researcher":
+            score = self.next_value("researcher", self.quality_scores)
+            return f"## Research Findings\n{self.filler('research')}\n\n```json\n{json.dumps({'quality_score': score})}\n```"
+        if role == "planner":
+            validation = self.next_value("planner", self.plan_validations)
+            return f"## Plan\n1. {self.filler('plan')}\n\n```json\n{json.dumps({'plan_validation': validation})}\n```"
+        if role == "chat":
+            return self.filler("chat")
+        if role == "summarizer":
+            return f"Summary: {self.filler('summary')}"
+        return f"## Final Response\n{self.filler('review')}\n\nFinal Assessment: GOOD"
+
+# ==============================================
+# FAKE CHAT MODEL
+# ==============================================
+class MockChatModel:
+    """Duck-typed replacement for ChatGroq with invoke/stream/ainvoke"""
+
+    def __init__(self, role: str, model_name: str = "mock-llm", temperature: float = 0.0,
+                 script: Optional[MockScript] = None, latency: Callable[[], float] = fixed_latency(0.0),
+                 tokens_per_second: float = 0.0):
+        self.role = role
+        self.model_name = model_name
+        self.temperature = temperature
+        self.script = script or MockScript()
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.calls = 0
+
+    def usage(self, messages: List[Any], text: str) -> dict:
+        prompt_tokens = sum(len(str(getattr(m, "content", ""))) for m in messages) // 4
+        completion_tokens = len(text) // 4
+        return {"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    def generation_time(self, text: str) -> float:
+        return len(text) / 4 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def invoke(self, messages: List[Any], *args, **kwargs) -> AIMessage:
+        self.calls += 1
+        text = self.script.respond(self.role, messages)
+        time.sleep(self.latency() + self.generation_time(text))
+        return AIMessage(content=text, usage_metadata=self.usage(messages, text))
+
+    async def ainvoke(self, messages: List[Any], *args, **kwargs) -> AIMessage:
+        import asyncio
+        self.calls += 1
+        text = self.script.respond(self.role, messages)
+        await asyncio.sleep(self.latency() + self.generation_time(text))
+        return AIMessage(content=text, usage_metadata=self.usage(messages, text))
+
+    def stream(self, messages: List[Any], *args, **kwargs) -> Iterator[AIMessageChunk]:
+        self.calls += 1
+        text = self.script.respond(self.role, messages)
+        time.sleep(self.latency())
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            chunk = word if i == len(words) - 1 else word + " "
+            time.sleep(self.generation_time(chunk))
+            yield AIMessageChunk(content=chunk)
+        yield AIMessageChunk(content="", usage_metadata=self.usage(messages, text))
+
+def mock_llm_factory(script: Optional[MockScript] = None, latency: Callable[[], float] = fixed_latency(0.0),
+                     tokens_per_second: float = 0.0) -> Callable[[str, float], MockChatModel]:
+    """llm_factory for MultiAgentSystem that builds MockChatModels sharing one script"""
+    shared_script = script or MockScript()
+    return lambda role, temperature: MockChatModel(
+        role, temperature=temperature, script=shared_script, latency=latency, tokens_per_second=tokens_per_second
+    )
+
+# ==============================================
+# OPENAI-COMPATIBLE STUB SERVER
+# ==============================================
+def serve_openai_stub(script: Optional[MockScript] = None, latency: Callable[[], float] = fixed_latency(0.0),
+                      fail_rate: float = 0.0, port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Local /v1/chat/completions server for exercising provider="openai" backends.
+
+    The request's model name picks the scripted role (router, researcher,
+    planner or reviewer). Returns the running server and its base_url; call
+    server.shutdown() when done.
+    """
+    script = script or MockScript()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def send_json(self, status: int, payload: dict):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            time.sleep(latency())
+            if random.random() < fail_rate:
+                self.send_json(500, {"error": {"message": "stub failure", "type": "server_error"}})
+                return
+
+            model = request.get("model", "reviewer")
+            messages = [AIMessage(content=m.get("content", "")) for m in request.get("messages", [])]
+            text = script.respond(model, messages)
+            prompt_tokens = sum(len(str(m.content)) for m in messages) // 4
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(text) // 4,
+                     "total_tokens": prompt_tokens + len(text) // 4}
+
+            if not request.get("stream"):
+                self.send_json(200, {
+                    "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                    "usage": usage
+                })
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            words = text.split(" ")
+            for i, word in enumerate(words):
+                chunk = {
+                    "id": "stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "delta": {"content": word if i == len(words) - 1 else word + " "},
+                                 "finish_reason": None}]
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
@@ -0,0 +1,104 @@
+"""Model tiering: which model size and output budget each agent call gets.
+
+Rules map (agent role, task type, complexity, priority) to a tier and a
+max_tokens cap; the first matching rule wins. The "large" tier is each role's
+regular model pool; other tiers get their own pools, configured under the tier
+name in LLM_BACKENDS_FILE (the small tier defaults to Groq llama3-8b-8192).
+MODEL_POLICY_FILE may replace the default rules with a JSON list such as:
+
+    [{"name": "chat-small", "tier": "small", "max_tokens": 1024, "task_types": ["chat"]},
+     {"name": "default", "tier": "large"}]
+"""
+# ==============================================
+# IMPORT
+# ==============================================
+import json
+import os
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+MODEL_POLICY_FILE = os.getenv("MODEL_POLICY_FILE")
+LARGE_TIER = "large"
+
+# Backends for tiers other than "large" when LLM_BACKENDS_FILE does not define them
+TIER_BACKENDS: Dict[str, List[Dict[str, Any]]] = {
+    "small": [{"provider": "groq", "model": "llama3-8b-8192"}],
+}
+
+# USD per million (prompt, completion) tokens, for cost reporting
+MODEL_PRICES_PER_MILLION: Dict[str, Tuple[float, float]] = {
+    "llama3-8b-8192": (0.05, 0.08),
+    "llama3-70b-8192": (0.59, 0.79),
+}
+
+# ==============================================
+# RULES
+# ==============================================
+class PolicyRule(NamedTuple):
+    """Empty match fields match anything"""
+    name: str
+    tier: str
+    max_tokens: Optional[int] = None
+    roles: Tuple[str, ...] = ()
+    task_types: Tuple[str, ...] = ()
+    complexities: Tuple[str, ...] = ()
+    priorities: Tuple[str, ...] = ()
+
+    def matches(self, role: str, task_type: str, complexity: str, priority: str) -> bool:
+        return all(
+            not allowed or value in allowed
+            for allowed, value in (
+                (self.roles, role),
+                (self.task_types, task_type),
+                (self.complexities, complexity),
+                (self.priorities, priority)
+            )
+        )
+
+DEFAULT_RULES: List[PolicyRule] = [
+    PolicyRule("summary-small", "small", 512, roles=("summarizer",)),
+    PolicyRule("chat-small", "small", 1024, task_types=("chat",)),
+    PolicyRule("simple-review-small", "small", 1024, roles=("reviewer",), complexities=("simple",)),
+    PolicyRule("simple-low-priority-small", "small", 2048, complexities=("simple",), priorities=("low", "medium")),
+    PolicyRule("default", LARGE_TIER),
+]
+
+def call_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """USD cost of one call, 0 for models without a known price"""
+    prompt_price, completion_price = MODEL_PRICES_PER_MILLION.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+# ==============================================
+# POLICY
+# ==============================================
+class ModelPolicy:
+    """Picks the tier rule for an agent call from the current task's classification"""
+
+    def __init__(self, rules: Optional[List[PolicyRule]] = None):
+        self.rules = list(rules or DEFAULT_RULES)
+        if not any(rule.matches("", "", "", "") for rule in self.rules):
+            # Calls that match nothing (e.g. the router before classification) use the large tier
+            self.rules.append(PolicyRule("default", LARGE_TIER))
+
+    @classmethod
+    def from_file(cls, path: Optional[str] = MODEL_POLICY_FILE) -> "ModelPolicy":
+        if not path:
+            return cls()
+        with open(path, "r") as f:
+            rules = [
+                PolicyRule(**{key: tuple(value) if isinstance(value, list) else value for key, value in rule.items()})
+                for rule in json.load(f)
+            ]
+        return cls(rules)
+
+    def tiers(self) -> List[str]:
+        """Tiers other than "large" that need their own model pools"""
+        return sorted({rule.tier for rule in self.rules if rule.tier != LARGE_TIER})
+
+    def select(self, role: str, task_type: str = "", complexity: str = "", priority: str = "") -> PolicyRule:
+        for rule in self.rules:
+            if rule.matches(role, task_type, complexity, priority):
+                return rule
+        return self.rules[-1]
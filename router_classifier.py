@@ -0,0 +1,164 @@
+# ==============================================
+# IMPORT
+# ==============================================
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+TASK_TYPES = ["planning", "research", "chat", "complex"]
+DEFAULT_CONFIDENCE_THRESHOLD = 0.8
+
+# Labelled examples used before any workflow history exists
+SEED_EXAMPLES: List[Tuple[str, str]] = [
+    ("Help me plan a vacation to Japan", "planning"),
+    ("Create a weekly study schedule for my exams", "planning"),
+    ("Organize my tasks for the product launch next month", "planning"),
+    ("Set fitness goals and a workout routine for the next 3 months", "planning"),
+    ("Plan a career transition to data science", "planning"),
+    ("Make a budget plan for saving for a house", "planning"),
+    ("What are the benefits of meditation?", "research"),
+    ("Analyze market trends for electric vehicles", "research"),
+    ("Explain how transformers work in machine learning", "research"),
+    ("Compare the pros and cons of solar and wind energy", "research"),
+    ("What is the history of the Roman empire?", "research"),
+    ("Why do interest rates affect inflation?", "research"),
+    ("How are you doing today?", "chat"),
+    ("Hello there!", "chat"),
+    ("Thanks, that was helpful", "chat"),
+    ("Tell me a joke", "chat"),
+    ("Good morning", "chat"),
+    ("Research the best programming languages and create a learning plan", "complex"),
+    ("Research renewable energy and create an implementation plan", "complex"),
+    ("Create a comprehensive business plan for a sustainable energy startup", "complex"),
+    ("Research AI ethics and develop implementation guidelines", "complex"),
+    ("Analyze climate change impacts and propose mitigation strategies", "complex"),
+]
+
+# The whole message must be pleasantries ("hello there!", "thanks, bye"), so "hello what is X" is not chat
+PLEASANTRY = (
+    r"(hi|hii+|hie|hello|hey|yo|thanks|thank you|ok(ay)?|cool|bye|good (morning|afternoon|evening|night)"
+    r"|how are you( doing)?|there|again|everyone|all|so much|very much|today)"
+)
+CHAT_PATTERN = re.compile(rf"^\s*{PLEASANTRY}([\s,!.?]+{PLEASANTRY})*[\s,!.?]*$", re.IGNORECASE)
+# Greeting in front of a real request, stripped before the planning/research rules
+LEADING_PLEASANTRY = re.compile(rf"^\s*{PLEASANTRY}([\s,!.?]+{PLEASANTRY})*[\s,!.?]+", re.IGNORECASE)
+PLANNING_PATTERNS = [
+    r"\bplan(s|ning)?\b", r"\bschedule\b", r"\borganiz(e|ing)\b", r"\broadmap\b", r"\bitinerary\b",
+    r"\btimeline\b", r"\bmilestones?\b", r"\bgoals?\b", r"\bchecklist\b", r"\bstrateg(y|ies)\b",
+    r"\bstep[- ]by[- ]step\b", r"\b(develop|create|build|design|propose)\b.*\b(guidelines|program|routine|budget)\b",
+]
+RESEARCH_PATTERNS = [
+    r"^\s*(what|why|who|when|where|which)\b", r"\bhow (does|do|did|is|are)\b", r"\bresearch\b",
+    r"\banaly[sz](e|is|ing)\b", r"\bexplain\b", r"\bcompare\b", r"\bcomparison\b", r"\bpros and cons\b",
+    r"\bbenefits? of\b", r"\btrends?\b", r"\boverview\b", r"\bimpacts?\b", r"\bhistory of\b",
+]
+PLANNING_REGEX = [re.compile(p, re.IGNORECASE) for p in PLANNING_PATTERNS]
+RESEARCH_REGEX = [re.compile(p, re.IGNORECASE) for p in RESEARCH_PATTERNS]
+
+# ==============================================
+# CLASSIFIER
+# ==============================================
+class RouteDecision(NamedTuple):
+    task_type: str
+    confidence: float
+    source: str  # "rules" or "model"
+
+def tokenize(text: str) -> List[str]:
+    tokens = re.findall(r"[a-z0-9]+", text.lower())
+    return tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+
+class LocalRouterClassifier:
+    """Keyword rules plus a TF-IDF nearest-centroid model for routing requests.
+
+    classify() returns a RouteDecision only when it is confident; callers fall
+    back to the LLM router when it returns None.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_CONFIDENCE_THRESHOLD):
+        self.threshold = threshold
+        self.idf: Dict[str, float] = {}
+        self.centroids: Dict[str, Dict[str, float]] = {}
+        self.train(SEED_EXAMPLES)
+
+    # ---------- training ----------
+    def vectorize(self, text: str) -> Dict[str, float]:
+        counts = Counter(tokenize(text))
+        vector = {t: (1 + math.log(c)) * self.idf.get(t, 0.0) for t, c in counts.items() if t in self.idf}
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {t: v / norm for t, v in vector.items()}
+
+    def train(self, examples: Iterable[Tuple[str, str]]):
+        """Fit IDF weights and per-label centroids on (request, task_type) pairs"""
+        examples = [(text, label) for text, label in examples if label in TASK_TYPES and text]
+        if not examples:
+            return
+        document_frequency = Counter()
+        for text, _ in examples:
+            document_frequency.update(set(tokenize(text)))
+        total = len(examples)
+        self.idf = {t: math.log((1 + total) / (1 + df)) + 1 for t, df in document_frequency.items()}
+
+        sums: Dict[str, Counter] = {label: Counter() for label in TASK_TYPES}
+        for text, label in examples:
+            sums[label].update(self.vectorize(text))
+        self.centroids = {}
+        for label, total_vector in sums.items():
+            norm = math.sqrt(sum(v * v for v in total_vector.values()))
+            if norm:
+                self.centroids[label] = {t: v / norm for t, v in total_vector.items()}
+
+    def train_with_history(self, history: Iterable[Tuple[str, str]]):
+        """Retrain on the seed examples plus historical LLM routing decisions"""
+        self.train(SEED_EXAMPLES + list(history))
+
+    # ---------- inference ----------
+    def rule_scores(self, text: str) -> Optional[RouteDecision]:
+        if CHAT_PATTERN.search(text) and len(text.split()) <= 6:
+            return RouteDecision("chat", 0.95, "rules")
+        text = LEADING_PLEASANTRY.sub("", text)
+        planning_hits = sum(1 for r in PLANNING_REGEX if r.search(text))
+        research_hits = sum(1 for r in RESEARCH_REGEX if r.search(text))
+        if planning_hits and research_hits:
+            return RouteDecision("complex", 0.85 if min(planning_hits, research_hits) > 1 or " and " in text.lower() else 0.6, "rules")
+        if planning_hits:
+            return RouteDecision("planning", 0.9 if planning_hits > 1 else 0.7, "rules")
+        if research_hits:
+            return RouteDecision("research", 0.9 if research_hits > 1 else 0.7, "rules")
+        return None
+
+    def model_scores(self, text: str) -> Optional[RouteDecision]:
+        vector = self.vectorize(text)
+        if not vector or not self.centroids:
+            return None
+        similarities = {
+            label: sum(v * centroid.get(t, 0.0) for t, v in vector.items())
+            for label, centroid in self.centroids.items()
+        }
+        # Softmax over scaled cosine similarities gives a rough confidence
+        exps = {label: math.exp(10 * sim) for label, sim in similarities.items()}
+        total = sum(exps.values())
+        label = max(exps, key=exps.get)
+        return RouteDecision(label, exps[label] / total, "model")
+
+    def classify(self, text: str) -> Optional[RouteDecision]:
+        """Return a confident routing decision, or None to defer to the LLM"""
+        rules = self.rule_scores(text)
+        model = self.model_scores(text)
+
+        if rules and rules.confidence >= self.threshold:
+            if model and model.task_type != rules.task_type and model.confidence >= self.threshold:
+                return None
+            return rules
+        if model and model.confidence >= self.threshold:
+            if rules and rules.task_type != model.task_type:
+                return None
+            return model
+        if rules and model and rules.task_type == model.task_type:
+            combined = 1 - (1 - rules.confidence) * (1 - model.confidence)
+            if combined >= self.threshold:
+                return RouteDecision(rules.task_type, combined, "rules+model")
+        return None
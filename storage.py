@@ -0,0 +1,590 @@
+# ==============================================
+# IMPORT
+# ==============================================
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+DB_FILE = "chat_history.db"
+USERS_FILE = "users.json"
+CHECKPOINT_FILE = "workflow_checkpoints.db"
+
+# Workflow result compaction
+BLOB_MIN_CHARS = 200         # shorter strings stay inline in the result JSON
+COMPRESS_MIN_BYTES = 1024    # blobs at least this large are zlib-compressed
+# Top-level result fields read with json_extract (search, summaries, routing history) stay inline
+INLINE_FIELDS = ("final_output", "task_type", "workflow_status", "router_source", "workflow_mode", "parallel_complex")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS storage_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    profile TEXT NOT NULL DEFAULT '{}',
+    created_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS agent_workflows (
+    workflow_id TEXT PRIMARY KEY,
+    username TEXT NOT NULL REFERENCES users(username) ON DELETE CASCADE,
+    request TEXT NOT NULL DEFAULT '',
+    result TEXT NOT NULL DEFAULT '{}',
+    timestamp TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_agent_workflows_username_timestamp
+    ON agent_workflows(username, timestamp);
+CREATE INDEX IF NOT EXISTS idx_agent_workflows_timestamp
+    ON agent_workflows(timestamp);
+
+-- Large agent outputs, stored once per distinct text (content-addressed)
+CREATE TABLE IF NOT EXISTS workflow_blobs (
+    hash TEXT PRIMARY KEY,
+    encoding TEXT NOT NULL,
+    data BLOB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS workflow_blob_refs (
+    workflow_id TEXT NOT NULL REFERENCES agent_workflows(workflow_id) ON DELETE CASCADE,
+    hash TEXT NOT NULL,
+    PRIMARY KEY (workflow_id, hash)
+);
+
+CREATE INDEX IF NOT EXISTS idx_workflow_blob_refs_hash
+    ON workflow_blob_refs(hash);
+
+-- Conversation memory: a rolling summary per chat session plus the turns not yet folded into it
+CREATE TABLE IF NOT EXISTS conversation_sessions (
+    session_id TEXT PRIMARY KEY,
+    username TEXT NOT NULL REFERENCES users(username) ON DELETE CASCADE,
+    summary TEXT NOT NULL DEFAULT '',
+    summarized_turns INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS conversation_turns (
+    session_id TEXT NOT NULL REFERENCES conversation_sessions(session_id) ON DELETE CASCADE,
+    turn INTEGER NOT NULL,
+    request TEXT NOT NULL,
+    response TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    PRIMARY KEY (session_id, turn)
+);
+"""
+
+# Full-text index over request and final output, kept in sync by triggers
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS agent_workflows_fts USING fts5(request, final_output);
+
+CREATE TRIGGER IF NOT EXISTS agent_workflows_fts_insert AFTER INSERT ON agent_workflows BEGIN
+    INSERT INTO agent_workflows_fts (rowid, request, final_output)
+    VALUES (new.rowid, new.request, coalesce(json_extract(new.result, '$.final_output'), ''));
+END;
+
+CREATE TRIGGER IF NOT EXISTS agent_workflows_fts_update AFTER UPDATE ON agent_workflows BEGIN
+    DELETE FROM agent_workflows_fts WHERE rowid = old.rowid;
+    INSERT INTO agent_workflows_fts (rowid, request, final_output)
+    VALUES (new.rowid, new.request, coalesce(json_extract(new.result, '$.final_output'), ''));
+END;
+
+CREATE TRIGGER IF NOT EXISTS agent_workflows_fts_delete AFTER DELETE ON agent_workflows BEGIN
+    DELETE FROM agent_workflows_fts WHERE rowid = old.rowid;
+END;
+"""
+
+SUMMARY_COLUMNS = """
+    w.workflow_id, w.request, w.timestamp,
+    json_extract(w.result, '$.task_type') AS task_type,
+    json_extract(w.result, '$.workflow_status') AS workflow_status,
+    json_extract(w.result, '$.workflow_mode') AS workflow_mode,
+    json_extract(w.result, '$.parallel_complex') AS parallel_complex,
+    substr(coalesce(json_extract(w.result, '$.final_output'), ''), 1, 300) AS final_output_preview
+"""
+
+# ==============================================
+# RESULT COMPACTION
+# ==============================================
+def chunked(items: List[Any], size: int = 500) -> Iterable[List[Any]]:
+    """Split items into lists that fit in SQLite's bound-parameter limit"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def blob_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def encode_blob(text: str) -> Tuple[str, bytes]:
+    """(encoding, data) for a blob, compressing it when that pays off"""
+    data = text.encode("utf-8")
+    if len(data) >= COMPRESS_MIN_BYTES:
+        compressed = zlib.compress(data, 6)
+        if len(compressed) < len(data):
+            return "zlib", compressed
+    return "utf-8", data
+
+def decode_blob(encoding: str, data: bytes) -> str:
+    if encoding == "zlib":
+        data = zlib.decompress(data)
+    return bytes(data).decode("utf-8")
+
+def compact_result(result: Dict[str, Any], request: str) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """Normalize a workflow result for storage.
+
+    Agent outputs are repeated across fields (final_output, review_feedback and
+    agent_outputs["reviewer"] hold the same text; research_data and plan_content
+    copy the researcher and planner outputs). Long strings equal to the request
+    or to final_output become {"$ref": field}; other long strings become
+    {"$blob": sha256} and are stored once in workflow_blobs. Returns the compact
+    result and the blobs it references.
+    """
+    final_output = result.get("final_output")
+    blobs: Dict[str, str] = {}
+
+    def compact(value):
+        if isinstance(value, str):
+            if len(value) < BLOB_MIN_CHARS:
+                return value
+            if value == request:
+                return {"$ref": "request"}
+            if value == final_output:
+                return {"$ref": "final_output"}
+            digest = blob_hash(value)
+            blobs[digest] = value
+            return {"$blob": digest}
+        if isinstance(value, dict):
+            return {k: compact(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [compact(v) for v in value]
+        return value
+
+    compacted = {key: value if key in INLINE_FIELDS else compact(value) for key, value in result.items()}
+    return compacted, blobs
+
+def expand_result(compacted: Dict[str, Any], request: str, blobs: Dict[str, str]) -> Dict[str, Any]:
+    """Rebuild the full workflow result from its compact form"""
+    refs = {"request": request, "final_output": compacted.get("final_output")}
+
+    def expand(value):
+        if isinstance(value, dict):
+            if len(value) == 1 and "$blob" in value:
+                return blobs.get(value["$blob"], "")
+            if len(value) == 1 and "$ref" in value:
+                return refs.get(value["$ref"], "")
+            return {k: expand(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [expand(v) for v in value]
+        return value
+
+    return expand(compacted)
+
+def connect_sqlite(db_path: str) -> sqlite3.Connection:
+    """Open a WAL-mode connection in autocommit mode"""
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+def create_checkpointer(db_path: str = CHECKPOINT_FILE):
+    """LangGraph SQLite checkpointer in its own WAL-mode database.
+
+    The saver serializes access to its connection with an internal lock, so
+    one instance can be shared by every session's workflow threads.
+    """
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    saver = SqliteSaver(conn)
+    saver.setup()
+    return saver
+
+# ==============================================
+# USER / WORKFLOW REPOSITORY
+# ==============================================
+class UserRepository:
+    """SQLite-backed store for users and their agent workflows.
+
+    Each thread gets its own connection; the database runs in WAL mode so
+    concurrent Streamlit sessions can read while another one writes.
+    """
+
+    def __init__(self, db_path: str = DB_FILE, legacy_users_file: Optional[str] = USERS_FILE):
+        self.db_path = db_path
+        self.legacy_users_file = legacy_users_file
+        self._local = threading.local()
+        self.fts_enabled = False
+        self.initialize_schema()
+        self.migrate_legacy_users()
+        self.compact_stored_results()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Return the connection owned by the calling thread"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect_sqlite(self.db_path)
+            self._local.conn = conn
+        return conn
+
+    def initialize_schema(self):
+        """Create tables and indexes if they do not exist yet"""
+        self.conn.executescript(SCHEMA)
+        try:
+            self.conn.executescript(FTS_SCHEMA)
+            self.fts_enabled = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5; search falls back to LIKE
+            return
+
+        # Index rows written before the full-text table existed
+        self.conn.execute(
+            "INSERT INTO agent_workflows_fts (rowid, request, final_output) "
+            "SELECT rowid, request, coalesce(json_extract(result, '$.final_output'), '') FROM agent_workflows "
+            "WHERE rowid NOT IN (SELECT rowid FROM agent_workflows_fts)"
+        )
+
+    def migrate_legacy_users(self):
+        """Import users.json into the database once"""
+        if not self.legacy_users_file or not os.path.exists(self.legacy_users_file):
+            return
+
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            done = conn.execute(
+                "SELECT value FROM storage_meta WHERE key = 'users_json_migrated'"
+            ).fetchone()
+            if done:
+                conn.execute("COMMIT")
+                return
+
+            with open(self.legacy_users_file, "r") as f:
+                try:
+                    users = json.load(f)
+                except json.JSONDecodeError:
+                    users = {}
+
+            for username, user_data in users.items():
+                # Legacy entries store the password directly as a string
+                if isinstance(user_data, str):
+                    user_data = {"password": user_data}
+                if not isinstance(user_data, dict):
+                    continue
+
+                profile = {
+                    k: v for k, v in user_data.items()
+                    if k not in ("password", "agent_workflows")
+                }
+                conn.execute(
+                    "INSERT OR IGNORE INTO users (username, password, profile, created_at) VALUES (?, ?, ?, ?)",
+                    (username, str(user_data.get("password", "")), json.dumps(profile), datetime.now().isoformat())
+                )
+
+                for workflow_id, workflow in (user_data.get("agent_workflows") or {}).items():
+                    conn.execute(
+                        "INSERT OR IGNORE INTO agent_workflows (workflow_id, username, request, result, timestamp) VALUES (?, ?, ?, ?, ?)",
+                        (
+                            workflow_id,
+                            username,
+                            workflow.get("request", ""),
+                            json.dumps(workflow.get("result", {}), default=str),
+                            workflow.get("timestamp", "")
+                        )
+                    )
+
+            conn.execute(
+                "INSERT INTO storage_meta (key, value) VALUES ('users_json_migrated', ?)",
+                (datetime.now().isoformat(),)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    # ---------- users ----------
+    def create_user(self, username: str, password: str) -> bool:
+        """Insert a new user; returns False if the username is taken"""
+        try:
+            self.conn.execute(
+                "INSERT INTO users (username, password, profile, created_at) VALUES (?, ?, ?, ?)",
+                (username, password, json.dumps({"sessions": {}, "plans": {}}), datetime.now().isoformat())
+            )
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def get_password(self, username: str) -> Optional[str]:
+        """Return the stored password for a user, or None if unknown"""
+        row = self.conn.execute(
+            "SELECT password FROM users WHERE username = ?", (username,)
+        ).fetchone()
+        return row["password"] if row else None
+
+    # ---------- workflows ----------
+    def add_workflow(self, username: str, workflow_id: str, request: str,
+                     result: Dict[str, Any], timestamp: str):
+        """Insert (or overwrite) a single workflow row"""
+        compacted, blobs = compact_result(result, request)
+        encoded = [(digest, *encode_blob(text)) for digest, text in blobs.items()]
+
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.write_workflow(workflow_id, username, request, compacted, encoded, timestamp)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def write_workflow(self, workflow_id: str, username: str, request: str, compacted: Dict[str, Any],
+                       encoded_blobs: List[Tuple[str, str, bytes]], timestamp: str):
+        """Upsert a compacted row and its blob references (inside the caller's transaction)"""
+        conn = self.conn
+        old_hashes = self.referenced_hashes([workflow_id])
+        conn.executemany(
+            "INSERT OR IGNORE INTO workflow_blobs (hash, encoding, data) VALUES (?, ?, ?)",
+            encoded_blobs
+        )
+        conn.execute(
+            "INSERT INTO agent_workflows (workflow_id, username, request, result, timestamp) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(workflow_id) DO UPDATE SET request = excluded.request, result = excluded.result, "
+            "timestamp = excluded.timestamp",
+            (workflow_id, username, request, json.dumps(compacted, default=str), timestamp)
+        )
+        conn.execute("DELETE FROM workflow_blob_refs WHERE workflow_id = ?", (workflow_id,))
+        conn.executemany(
+            "INSERT INTO workflow_blob_refs (workflow_id, hash) VALUES (?, ?)",
+            [(workflow_id, digest) for digest, _, _ in encoded_blobs]
+        )
+        self.prune_blobs(old_hashes)
+
+    # ---------- blobs ----------
+    def referenced_hashes(self, workflow_ids: Iterable[str]) -> Set[str]:
+        hashes = set()
+        for chunk in chunked(list(workflow_ids)):
+            rows = self.conn.execute(
+                f"SELECT hash FROM workflow_blob_refs WHERE workflow_id IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            hashes.update(row["hash"] for row in rows)
+        return hashes
+
+    def load_blobs(self, hashes: Iterable[str]) -> Dict[str, str]:
+        blobs = {}
+        for chunk in chunked(list(hashes)):
+            rows = self.conn.execute(
+                f"SELECT hash, encoding, data FROM workflow_blobs WHERE hash IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            blobs.update((row["hash"], decode_blob(row["encoding"], row["data"])) for row in rows)
+        return blobs
+
+    def prune_blobs(self, hashes: Iterable[str]):
+        """Delete blobs among hashes that no workflow references any more"""
+        for chunk in chunked(list(hashes)):
+            self.conn.execute(
+                f"DELETE FROM workflow_blobs WHERE hash IN ({','.join('?' * len(chunk))}) "
+                "AND NOT EXISTS (SELECT 1 FROM workflow_blob_refs r WHERE r.hash = workflow_blobs.hash)",
+                chunk
+            )
+
+    def expand_rows(self, rows: List[sqlite3.Row]) -> Dict[str, Dict[str, Any]]:
+        """Full results for (workflow_id, request, result) rows, keyed by workflow id"""
+        blobs = self.load_blobs(self.referenced_hashes(row["workflow_id"] for row in rows))
+        return {
+            row["workflow_id"]: expand_result(json.loads(row["result"]), row["request"], blobs)
+            for row in rows
+        }
+
+    def compact_stored_results(self):
+        """Rewrite workflow rows saved before results were compacted, once"""
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            done = conn.execute(
+                "SELECT value FROM storage_meta WHERE key = 'workflow_results_compacted'"
+            ).fetchone()
+            if not done:
+                rows = conn.execute(
+                    "SELECT workflow_id, username, request, result, timestamp FROM agent_workflows"
+                ).fetchall()
+                for row in rows:
+                    compacted, blobs = compact_result(json.loads(row["result"]), row["request"])
+                    encoded = [(digest, *encode_blob(text)) for digest, text in blobs.items()]
+                    self.write_workflow(row["workflow_id"], row["username"], row["request"], compacted, encoded, row["timestamp"])
+                conn.execute(
+                    "INSERT INTO storage_meta (key, value) VALUES ('workflow_results_compacted', ?)",
+                    (datetime.now().isoformat(),)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def list_workflows(self, username: str) -> Dict[str, Dict[str, Any]]:
+        """Return a user's workflows keyed by workflow id, newest first"""
+        rows = self.conn.execute(
+            "SELECT workflow_id, request, result, timestamp FROM agent_workflows "
+            "WHERE username = ? ORDER BY timestamp DESC",
+            (username,)
+        ).fetchall()
+        results = self.expand_rows(rows)
+        return {
+            row["workflow_id"]: {
+                "request": row["request"],
+                "result": results[row["workflow_id"]],
+                "timestamp": row["timestamp"]
+            }
+            for row in rows
+        }
+
+    def search_clause(self, search: Optional[str]) -> Tuple[str, List[Any]]:
+        """SQL filter and parameters for a free-text search"""
+        if not search or not search.strip():
+            return "", []
+        if self.fts_enabled:
+            terms = re.findall(r"\w+", search)
+            if not terms:
+                return "", []
+            query = " ".join(f'"{term}"*' for term in terms)
+            return " AND w.rowid IN (SELECT rowid FROM agent_workflows_fts WHERE agent_workflows_fts MATCH ?)", [query]
+        pattern = f"%{search.strip()}%"
+        return " AND (w.request LIKE ? OR json_extract(w.result, '$.final_output') LIKE ?)", [pattern, pattern]
+
+    def count_workflows(self, username: str, search: Optional[str] = None) -> int:
+        """Number of a user's workflows matching the search"""
+        clause, params = self.search_clause(search)
+        return self.conn.execute(
+            f"SELECT COUNT(*) FROM agent_workflows w WHERE w.username = ?{clause}",
+            [username] + params
+        ).fetchone()[0]
+
+    def list_workflow_summaries(self, username: str, page: int = 1, page_size: int = 20,
+                                search: Optional[str] = None) -> List[Dict[str, Any]]:
+        """One page of workflow summaries, newest first, without the full result payload"""
+        clause, params = self.search_clause(search)
+        rows = self.conn.execute(
+            f"SELECT {SUMMARY_COLUMNS} FROM agent_workflows w WHERE w.username = ?{clause} "
+            "ORDER BY w.timestamp DESC, w.workflow_id DESC LIMIT ? OFFSET ?",
+            [username] + params + [page_size, max(page - 1, 0) * page_size]
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_workflow_result(self, username: str, workflow_id: str) -> Optional[Dict[str, Any]]:
+        """Full result payload for one workflow"""
+        row = self.conn.execute(
+            "SELECT workflow_id, request, result FROM agent_workflows WHERE username = ? AND workflow_id = ?",
+            (username, workflow_id)
+        ).fetchone()
+        return self.expand_rows([row])[workflow_id] if row else None
+
+    # ---------- conversation memory ----------
+    def get_conversation(self, username: str, session_id: str) -> Tuple[str, int, List[Dict[str, Any]]]:
+        """(summary, number of turns folded into it, remaining turns oldest first) for a user's chat session"""
+        session = self.conn.execute(
+            "SELECT summary, summarized_turns FROM conversation_sessions WHERE session_id = ? AND username = ?",
+            (session_id, username)
+        ).fetchone()
+        if session is None:
+            return "", 0, []
+        rows = self.conn.execute(
+            "SELECT turn, request, response, timestamp FROM conversation_turns WHERE session_id = ? ORDER BY turn",
+            (session_id,)
+        ).fetchall()
+        return session["summary"], session["summarized_turns"], [dict(row) for row in rows]
+
+    def add_conversation_turn(self, username: str, session_id: str, request: str, response: str, timestamp: str) -> int:
+        """Append a turn to a chat session (creating it on first use); returns the turn number"""
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.execute(
+                "INSERT INTO conversation_sessions (session_id, username, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET updated_at = excluded.updated_at "
+                "WHERE conversation_sessions.username = excluded.username",
+                (session_id, username, timestamp)
+            )
+            if not cursor.rowcount:
+                raise ValueError(f"Conversation {session_id} belongs to another user")
+            turn = conn.execute(
+                "SELECT max(coalesce((SELECT max(turn) FROM conversation_turns WHERE session_id = ?), 0), summarized_turns) + 1 "
+                "FROM conversation_sessions WHERE session_id = ?",
+                (session_id, session_id)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT INTO conversation_turns (session_id, turn, request, response, timestamp) VALUES (?, ?, ?, ?, ?)",
+                (session_id, turn, request, response, timestamp)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return turn
+
+    def update_conversation_summary(self, session_id: str, summary: str, summarized_turns: int,
+                                    expected_summarized_turns: int) -> bool:
+        """Store a new rolling summary covering turns up to summarized_turns and drop those turns.
+
+        Returns False without changes if another writer updated the summary since
+        expected_summarized_turns was read.
+        """
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.execute(
+                "UPDATE conversation_sessions SET summary = ?, summarized_turns = ? "
+                "WHERE session_id = ? AND summarized_turns = ?",
+                (summary, summarized_turns, session_id, expected_summarized_turns)
+            )
+            if cursor.rowcount:
+                conn.execute(
+                    "DELETE FROM conversation_turns WHERE session_id = ? AND turn <= ?",
+                    (session_id, summarized_turns)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount > 0
+
+    def routing_examples(self, limit: int = 5000) -> List[Tuple[str, str]]:
+        """(request, task_type) pairs from workflows that the LLM router classified"""
+        rows = self.conn.execute(
+            "SELECT request, json_extract(result, '$.task_type') AS task_type FROM agent_workflows "
+            "WHERE request != '' AND json_extract(result, '$.router_source') IS NOT 'local' "
+            "ORDER BY timestamp DESC LIMIT ?",
+            (limit,)
+        ).fetchall()
+        return [(row["request"], row["task_type"]) for row in rows if row["task_type"]]
+
+    def delete_workflow(self, username: str, workflow_id: str) -> bool:
+        """Delete a single workflow row owned by the user, and blobs only it referenced"""
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            hashes = self.referenced_hashes([workflow_id])
+            cursor = conn.execute(
+                "DELETE FROM agent_workflows WHERE username = ? AND workflow_id = ?",
+                (username, workflow_id)
+            )
+            self.prune_blobs(hashes)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount > 0
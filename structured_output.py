@@ -0,0 +1,100 @@
+"""Schema-validated structured fields in agent replies.
+
+The router answers with a JSON object; the researcher and planner write prose
+and end it with a fenced JSON assessment block. Both are validated with the
+pydantic models below, so a reply like "planning." or "Quality Score: high"
+is rejected instead of silently falling back to a default.
+"""
+# ==============================================
+# IMPORT
+# ==============================================
+import json
+import re
+from typing import Any, Literal, Optional, Type, TypeVar
+
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+# ==============================================
+# SCHEMAS
+# ==============================================
+def normalize_label(value: Any) -> Any:
+    """Lower-case a label and strip stray punctuation ("Planning." -> "planning") before Literal validation"""
+    if isinstance(value, str):
+        return value.strip().strip(".\"'`*").strip().lower()
+    return value
+
+class RouterDecision(BaseModel):
+    task_type: Literal["planning", "research", "chat", "complex"]
+    priority: Literal["high", "medium", "low"] = "medium"
+    complexity: Literal["simple", "moderate", "complex"] = "moderate"
+    reasoning: str = ""
+
+    @field_validator("task_type", "priority", "complexity", mode="before")
+    @classmethod
+    def normalize(cls, value):
+        return normalize_label(value)
+
+class ResearchAssessment(BaseModel):
+    quality_score: float = Field(ge=0, le=100)
+
+class PlanAssessment(BaseModel):
+    plan_validation: Literal["PASS", "FAIL"]
+
+    @field_validator("plan_validation", mode="before")
+    @classmethod
+    def normalize(cls, value):
+        value = normalize_label(value)
+        return value.upper() if isinstance(value, str) else value
+
+# Shape shown to the model when asking it to fix an invalid reply
+SCHEMA_EXAMPLES = {
+    RouterDecision: '{"task_type": "planning|research|chat|complex", "priority": "high|medium|low", '
+                    '"complexity": "simple|moderate|complex", "reasoning": "..."}',
+    ResearchAssessment: '{"quality_score": 0-100}',
+    PlanAssessment: '{"plan_validation": "PASS|FAIL"}',
+}
+
+# ==============================================
+# PARSING
+# ==============================================
+Schema = TypeVar("Schema", bound=BaseModel)
+
+JSON_BLOCK_RE = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL)
+
+class StructuredOutputError(ValueError):
+    """A reply did not contain a JSON object matching the expected schema"""
+
+def find_json_object(text: str) -> Optional[str]:
+    """The last fenced JSON block in text, else the last {...} span that parses as JSON"""
+    blocks = JSON_BLOCK_RE.findall(text or "")
+    if blocks:
+        return blocks[-1]
+    decoder = json.JSONDecoder()
+    found, position = None, 0
+    for match in re.finditer(r"\{", text or ""):
+        if match.start() < position:
+            continue  # inside an object already found
+        try:
+            _, end = decoder.raw_decode(text, match.start())
+        except json.JSONDecodeError:
+            continue
+        found, position = text[match.start():end], end
+    return found
+
+def parse_structured(schema: Type[Schema], text: str) -> Schema:
+    """Validate the JSON object in a reply against schema; raises StructuredOutputError"""
+    raw = find_json_object(text)
+    if raw is None:
+        raise StructuredOutputError("no JSON object found")
+    try:
+        return schema.model_validate_json(raw)
+    except ValidationError as e:
+        problems = "; ".join(f"{'.'.join(str(p) for p in err['loc']) or 'value'}: {err['msg']}" for err in e.errors())
+        raise StructuredOutputError(problems) from e
+
+def strip_json_block(text: str) -> str:
+    """Prose part of a reply, without its trailing fenced JSON assessment"""
+    matches = list(JSON_BLOCK_RE.finditer(text or ""))
+    if not matches or text[matches[-1].end():].strip():
+        return text
+    return text[:matches[-1].start()].rstrip()